@@ -75,12 +75,22 @@ def index():
 def api_stats():
     db = get_db()
     
-    # Estatísticas dos últimos 7 dias
+    # Estatísticas dos últimos 7 dias (uma consulta por faixa de created_at, usa o índice status+created_at)
+    inicio = (datetime.now() - timedelta(days=6)).strftime('%Y-%m-%d')
+    rows = db.execute("""
+        SELECT DATE(created_at) as date, COUNT(*) as count, SUM(amount) as total
+        FROM payments
+        WHERE status = 'completed' AND created_at >= ?
+        GROUP BY DATE(created_at)
+    """, (inicio,)).fetchall()
+    por_dia = {row['date']: row for row in rows}
+
     stats = []
     for i in range(7):
         date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-        count = db.execute("SELECT COUNT(*) as count FROM payments WHERE DATE(created_at) = ? AND status = 'completed'", (date,)).fetchone()['count']
-        valor = db.execute("SELECT SUM(amount) as total FROM payments WHERE DATE(created_at) = ? AND status = 'completed'", (date,)).fetchone()['total'] or 0
+        row = por_dia.get(date)
+        count = row['count'] if row else 0
+        valor = (row['total'] if row else 0) or 0
         stats.append({'date': date, 'count': count, 'valor': float(valor)})
     
     db.close()
@@ -0,0 +1,109 @@
+"""
+Benchmark das funções do database.py: conexão por chamada vs conexão persistente.
+
+A versão "antiga" abre um sqlite3.connect() em cada operação (como era antes);
+a versão nova reaproveita a conexão da thread com WAL e PRAGMAs de desempenho.
+
+Uso:
+    python benchmarks/bench_db.py [--ops 2000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# IMPLEMENTAÇÃO ANTIGA (UMA CONEXÃO POR CHAMADA)
+# ════════════════════════════════════════════════════════════════════════════
+
+def legacy_get_balance(user_id: int) -> float:
+    conn = sqlite3.connect(database.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0] if result else 0
+
+def legacy_add_balance(user_id: int, amount: float, description: str = "Adição de saldo") -> bool:
+    conn = sqlite3.connect(database.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("INSERT OR IGNORE INTO users (user_id, balance) VALUES (?, 0)", (user_id,))
+    cursor.execute("UPDATE users SET balance = balance + ? WHERE user_id = ?", (amount, user_id))
+    cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)",
+                   (user_id, "add", amount, description))
+    conn.commit()
+    conn.close()
+    return True
+
+def legacy_safe_add_balance(user_id: int, amount: float, description: str = "Adição de saldo") -> bool:
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("INSERT OR IGNORE INTO users (user_id, balance) VALUES (?, 0)", (user_id,))
+    cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
+    current_balance = cursor.fetchone()[0]
+    cursor.execute("UPDATE users SET balance = ?, updated_at = ? WHERE user_id = ?",
+                   (current_balance + amount, datetime.now().isoformat(), user_id))
+    cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)",
+                   (user_id, "add", amount, description))
+    cursor.execute("INSERT INTO transaction_history (user_id, type, amount, description, status) VALUES (?, ?, ?, ?, 'completed')",
+                   (user_id, "add", amount, description))
+    cursor.execute("COMMIT")
+    conn.close()
+    return True
+
+# ════════════════════════════════════════════════════════════════════════════
+# EXECUÇÃO
+# ════════════════════════════════════════════════════════════════════════════
+
+def _fresh_db(directory: str, name: str, wal: bool):
+    database.close_connection()
+    database.DB_PATH = os.path.join(directory, name)
+    database.init_db()
+    if not wal:
+        # Base "antiga": sem WAL, como o arquivo criado antes desta mudança
+        database.get_connection().execute("PRAGMA journal_mode=DELETE")
+        database.close_connection()
+
+def _measure(func, ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i % 100)
+    elapsed = time.perf_counter() - start
+    return ops / elapsed
+
+def run(ops: int):
+    cases = [
+        ("get_balance", legacy_get_balance, database.get_balance),
+        ("add_balance", lambda uid: legacy_add_balance(uid, 1.0), lambda uid: database.add_balance(uid, 1.0)),
+        ("safe_add_balance", lambda uid: legacy_safe_add_balance(uid, 1.0), lambda uid: database.safe_add_balance(uid, 1.0)),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"📊 Benchmark database.py ({ops} operações por caso)\n")
+        print(f"{'operação':<20}{'antes (ops/s)':>16}{'depois (ops/s)':>16}{'ganho':>10}")
+        print("─" * 62)
+        for index, (name, legacy, pooled) in enumerate(cases):
+            _fresh_db(tmp, f"legacy_{index}.db", wal=False)
+            before = _measure(legacy, ops)
+
+            _fresh_db(tmp, f"pooled_{index}.db", wal=True)
+            after = _measure(pooled, ops)
+
+            print(f"{name:<20}{before:>16,.0f}{after:>16,.0f}{after / before:>9.1f}x")
+        database.close_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de conexões do database.py")
+    parser.add_argument("--ops", type=int, default=2000, help="operações por caso")
+    args = parser.parse_args()
+    run(args.ops)
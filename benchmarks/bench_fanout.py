@@ -0,0 +1,139 @@
+"""
+Benchmark do envio de DMs de aprovação: sequencial (fetch_user + send por
+aprovador, fetch_message + delete na limpeza) vs. utils/fanout.py (paralelo,
+mensagens parciais).
+
+Usa um cliente falso com latência fixa por chamada à API do Discord.
+
+Uso:
+    python benchmarks/bench_fanout.py [--approvers 6] [--latency-ms 120] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.fanout import DmFanout
+
+
+class FakeApi:
+    """Simula as chamadas HTTP do Discord (cada uma custa latency segundos)."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._ids = itertools.count(1000)
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+
+class FakeMessage:
+    def __init__(self, api: FakeApi, channel, message_id: int):
+        self.api = api
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        await self.api.call()
+
+    async def delete(self):
+        await self.api.call()
+
+
+class FakeChannel:
+    def __init__(self, api: FakeApi, channel_id: int):
+        self.api = api
+        self.id = channel_id
+
+    async def send(self, **kwargs):
+        await self.api.call()
+        return FakeMessage(self.api, self, next(self.api._ids))
+
+    async def fetch_message(self, message_id: int):
+        await self.api.call()
+        return FakeMessage(self.api, self, message_id)
+
+    def get_partial_message(self, message_id: int):
+        return FakeMessage(self.api, self, message_id)
+
+
+class FakeUser:
+    def __init__(self, api: FakeApi, user_id: int):
+        self.api = api
+        self.id = user_id
+
+    async def send(self, **kwargs):
+        await self.api.call()  # discord.py abre o canal de DM antes de enviar
+        return await FakeChannel(self.api, self.id).send(**kwargs)
+
+
+class FakeClient:
+    def __init__(self, api: FakeApi):
+        self.api = api
+
+    async def fetch_user(self, user_id: int):
+        await self.api.call()
+        return FakeUser(self.api, user_id)
+
+    async def create_dm(self, user):
+        await self.api.call()
+        return FakeChannel(self.api, user.id)
+
+    def get_partial_messageable(self, channel_id: int):
+        return FakeChannel(self.api, channel_id)
+
+
+async def sequencial(client: FakeClient, approvers: list):
+    refs = []
+    for approver_id in approvers:
+        user = await client.fetch_user(approver_id)
+        msg = await user.send(content="aprovação")
+        refs.append({'channel_id': msg.channel.id, 'message_id': msg.id})
+    send_done = time.perf_counter()
+    for ref in refs:
+        user = await client.fetch_user(ref['channel_id'])
+        msg = await FakeChannel(client.api, user.id).fetch_message(ref['message_id'])
+        await msg.delete()
+    return send_done
+
+
+async def paralelo(client: FakeClient, approvers: list, concurrency: int):
+    fanout = DmFanout(max_concurrency=concurrency)
+    refs = await fanout.send(client, approvers, content="aprovação")
+    send_done = time.perf_counter()
+    await fanout.delete(client, refs)
+    return send_done
+
+
+async def medir(nome: str, latency: float, fn, *args):
+    api = FakeApi(latency)
+    client = FakeClient(api)
+    start = time.perf_counter()
+    send_done = await fn(client, *args)
+    end = time.perf_counter()
+    print(f"{nome:<12} envio {(send_done - start) * 1000:7.0f} ms   limpeza {(end - send_done) * 1000:7.0f} ms   "
+          f"chamadas à API: {api.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do fan-out de DMs de aprovação")
+    parser.add_argument("--approvers", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=120)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    approvers = [100 + i for i in range(args.approvers)]
+    latency = args.latency_ms / 1000
+    print(f"📨 {args.approvers} aprovadores, {args.latency_ms:.0f} ms por chamada à API\n")
+    asyncio.run(medir("sequencial", latency, sequencial, approvers))
+    asyncio.run(medir("fan-out", latency, paralelo, approvers, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
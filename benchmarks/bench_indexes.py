@@ -0,0 +1,138 @@
+"""
+Benchmark dos índices gerenciados (database.MANAGED_INDEXES).
+
+Gera bases sintéticas de tamanhos crescentes e mede a latência das consultas
+quentes com e sem os índices. Com índices a latência deve ficar estável
+conforme as tabelas crescem; sem índices ela cresce junto com a tabela.
+
+Uso:
+    python benchmarks/bench_indexes.py [--rows 100000,1000000,3000000] [--queries 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+USERS = 10_000
+STATUSES = ["pending", "completed", "completed", "completed", "aprovado", "rejeitado"]
+
+
+def _populate(rows: int):
+    """Preenche a base com `rows` transações e proporções realistas nas demais tabelas."""
+    conn = database.get_connection()
+    rnd = random.Random(42)
+    base_ts = 1_600_000_000
+
+    def ts(i):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(base_ts + i * 7))
+
+    with database.transaction() as cursor:
+        cursor.executemany("INSERT INTO users (user_id, balance) VALUES (?, ?)",
+                           ((uid, rnd.random() * 1000) for uid in range(USERS)))
+        cursor.executemany(
+            "INSERT INTO transactions (user_id, type, amount, description, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((rnd.randrange(USERS), "add", 10.0, "Pagamento recebido", ts(i)) for i in range(rows))
+        )
+        cursor.executemany(
+            "INSERT INTO transaction_history (user_id, type, amount, description, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((rnd.randrange(USERS), "add", 10.0, "Pagamento recebido", ts(i)) for i in range(rows))
+        )
+        cursor.executemany(
+            "INSERT INTO payments (payment_id, receiver_id, amount, status, internal_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            ((f"discord_{i}", rnd.randrange(USERS), 10.0, rnd.choice(STATUSES[:2]), str(500000 + i), ts(i))
+             for i in range(rows // 2))
+        )
+        cursor.executemany(
+            "INSERT INTO refunds (user_id, amount, reason, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            # Fila de pendentes de tamanho fixo: o resultado não cresce junto com a tabela
+            ((rnd.randrange(USERS), 5.0, "teste", "pending" if i >= rows // 10 - 50 else rnd.choice(STATUSES[2:]), ts(i))
+             for i in range(rows // 10))
+        )
+    conn.execute("ANALYZE")
+
+
+def _queries(rows: int):
+    """Consultas quentes medidas: nome -> função sem argumentos."""
+    rnd = random.Random(7)
+    conn = database.get_connection()
+    return {
+        "get_transaction_history": lambda: database.get_transaction_history(rnd.randrange(USERS)),
+        "history_detailed": lambda: database.get_transaction_history_detailed(rnd.randrange(USERS)),
+        "get_payment_receiver": lambda: database.get_payment_receiver(str(500000 + rnd.randrange(rows // 2))),
+        "get_pending_refunds": lambda: database.get_pending_refunds(),
+        "admin status filter": lambda: conn.execute(
+            "SELECT * FROM payments WHERE status = ? ORDER BY created_at DESC LIMIT 50", ("pending",)
+        ).fetchall(),
+        "admin refunds filter": lambda: conn.execute(
+            "SELECT * FROM refunds WHERE status = ? ORDER BY created_at DESC", ("pending",)
+        ).fetchall(),
+    }
+
+
+def _median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _drop_indexes():
+    conn = database.get_connection()
+    for name, _, _ in database.MANAGED_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute("ANALYZE")
+
+
+def run(sizes, repeat: int, compare: bool):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            database.close_connection()
+            database.DB_PATH = os.path.join(tmp, f"bench_{rows}.db")
+            database.init_db()
+            # Popular sem índices (carga mais rápida) e criá-los depois
+            _drop_indexes()
+
+            print(f"⏳ Gerando {rows:,} transações...")
+            _populate(rows)
+            with database.transaction() as cursor:
+                database.ensure_indexes(cursor)
+
+            for name, func in _queries(rows).items():
+                results.setdefault(name, {})[(rows, True)] = _median_ms(func, repeat)
+
+            if compare:
+                _drop_indexes()
+                for name, func in _queries(rows).items():
+                    # Sem índice cada consulta é um full scan; menos repetições bastam
+                    results[name][(rows, False)] = _median_ms(func, max(3, repeat // 10))
+
+            database.close_connection()
+            os.remove(database.DB_PATH)
+
+    print("\n📊 Latência mediana (ms) por tamanho da tabela transactions\n")
+    header = f"{'consulta':<26}" + "".join(f"{rows:>14,}" for rows in sizes)
+    for with_index in ([True, False] if compare else [True]):
+        print(f"── {'com índices' if with_index else 'sem índices'} " + "─" * 40)
+        print(header)
+        for name, values in results.items():
+            print(f"{name:<26}" + "".join(f"{values[(rows, with_index)]:>14.3f}" for rows in sizes))
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos índices do banco")
+    parser.add_argument("--rows", default="100000,1000000,3000000", help="tamanhos separados por vírgula")
+    parser.add_argument("--queries", type=int, default=50, help="repetições por consulta")
+    parser.add_argument("--no-compare", action="store_true", help="não medir a base sem índices")
+    args = parser.parse_args()
+    run([int(r) for r in args.rows.split(",")], args.queries, not args.no_compare)
@@ -0,0 +1,80 @@
+"""
+Benchmark do escritor único do ledger (group commit) vs caminho direto.
+
+100 chamadores concorrentes (threads, como o webhook e o bot) creditam saldo
+ao mesmo tempo. No caminho direto cada crédito pega o lock global e faz o
+seu próprio BEGIN IMMEDIATE/COMMIT; no group commit o LedgerWriter junta os
+créditos da fila e faz um COMMIT por lote.
+
+Uso:
+    python benchmarks/bench_ledger.py [--callers 100] [--credits 20] [--synchronous NORMAL|FULL]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+def _run_mode(group_commit: bool, callers: int, credits: int) -> float:
+    database.LEDGER_GROUP_COMMIT = group_commit
+    barrier = threading.Barrier(callers)
+    errors = []
+
+    def caller(index):
+        barrier.wait()
+        for _ in range(credits):
+            if not database.safe_add_balance(index % 50, 1.0, "Benchmark"):
+                errors.append(index)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = callers * credits
+    saldo = database.get_total_balance()
+    if errors or round(saldo) != total:
+        print(f"❌ Inconsistência: saldo total {saldo}, esperado {total}, falhas {len(errors)}")
+    return total / elapsed
+
+
+def run(callers: int, credits: int, synchronous: str):
+    print(f"📊 {callers} chamadores concorrentes x {credits} créditos (synchronous={synchronous})\n")
+    print(f"{'modo':<28}{'créditos/s':>14}")
+    print("─" * 42)
+    # Vale para todas as conexões abertas a partir daqui (inclusive a do escritor)
+    database.SQLITE_SYNCHRONOUS = synchronous
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, group_commit in (("atual (lock + commit/op)", False), ("group commit", True)):
+            database.close_connection()
+            database.DB_PATH = os.path.join(tmp, f"ledger_{int(group_commit)}.db")
+            database.init_db()
+            batches_before = database.ledger_writer.batches
+            results[name] = _run_mode(group_commit, callers, credits)
+            extra = ""
+            if group_commit:
+                batches = database.ledger_writer.batches - batches_before
+                extra = f"   ({callers * credits / max(batches, 1):.1f} créditos/commit)"
+            print(f"{name:<28}{results[name]:>14,.0f}{extra}")
+        database.close_connection()
+    before, after = results.values()
+    print(f"\nGanho: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do group commit do ledger")
+    parser.add_argument("--callers", type=int, default=100)
+    parser.add_argument("--credits", type=int, default=20, help="créditos por chamador")
+    parser.add_argument("--synchronous", default="NORMAL", choices=["NORMAL", "FULL"])
+    args = parser.parse_args()
+    run(args.callers, args.credits, args.synchronous)
@@ -0,0 +1,187 @@
+"""
+Benchmark do agendador de saída (utils/outbound_scheduler.py) contra um Discord simulado.
+
+O Discord simulado aplica limites por rota (N mensagens por janela) e um
+limite global, responde 429 com Retry-After quando estourados e devolve os
+cabeçalhos X-RateLimit-* em toda resposta (repassados ao agendador como o
+trace_config faria no bot).
+
+Cenário: uma rajada de notificações de pagamento em poucos canais e, logo em
+seguida, DMs de aprovação e de clientes. Sem agendador cada chamada vai direto
+e espera o Retry-After ao levar 429 (como o discord.py); com o agendador as
+aprovações passam na frente e as notificações do mesmo canal são agrupadas.
+
+Uso:
+    python benchmarks/bench_outbound.py [--notifications 150] [--channels 3] [--approvals 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+
+from utils.outbound_scheduler import (PRIORITY_APPROVAL, PRIORITY_CUSTOMER, PRIORITY_NOTIFICATION,
+                                      OutboundScheduler)
+
+ROUTE_LIMIT = 5
+ROUTE_WINDOW = 1.0
+GLOBAL_RATE = 50
+LATENCY = 0.03
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"429 (retry_after={retry_after:.2f}s)")
+        self.retry_after = retry_after
+
+
+class FakeDiscord:
+    """Limites por rota (janela fixa) e global (por segundo), como a API do Discord."""
+
+    def __init__(self, scheduler: OutboundScheduler = None):
+        self.scheduler = scheduler
+        self.routes = {}
+        self.global_window = (0.0, 0)
+        self.requests = 0
+        self.rate_limited = 0
+        self.messages = 0
+
+    async def request(self, route: str, messages: int = 1):
+        await asyncio.sleep(LATENCY)
+        now = time.monotonic()
+        self.requests += 1
+
+        start, used = self.global_window
+        if now - start >= 1.0:
+            start, used = now, 0
+        if used >= GLOBAL_RATE:
+            self._reject(route, start + 1.0 - now, scope="global")
+        self.global_window = (start, used + 1)
+
+        start, used = self.routes.get(route, (now, 0))
+        if now - start >= ROUTE_WINDOW:
+            start, used = now, 0
+        if used >= ROUTE_LIMIT:
+            self._reject(route, start + ROUTE_WINDOW - now)
+        self.routes[route] = (start, used + 1)
+        self.messages += messages
+
+        if self.scheduler is not None:
+            self.scheduler.observe(route, 200, {
+                'X-RateLimit-Limit': str(ROUTE_LIMIT),
+                'X-RateLimit-Remaining': str(ROUTE_LIMIT - used - 1),
+                'X-RateLimit-Reset-After': f"{start + ROUTE_WINDOW - now:.3f}"
+            })
+
+    def _reject(self, route: str, retry_after: float, scope: str = "user"):
+        self.rate_limited += 1
+        if self.scheduler is not None:
+            self.scheduler.observe(route, 429, {'Retry-After': f"{retry_after:.3f}", 'X-RateLimit-Scope': scope})
+        raise RateLimited(retry_after)
+
+
+async def _with_retry(call):
+    """Tenta de novo após o Retry-After (o que o discord.py faz por baixo de cada chamada)"""
+    while True:
+        try:
+            return await call()
+        except RateLimited as e:
+            await asyncio.sleep(e.retry_after)
+
+
+class FakeChannel:
+    def __init__(self, discord_api: FakeDiscord, channel_id: int):
+        self.api = discord_api
+        self.id = channel_id
+
+    async def send(self, **kwargs):
+        embeds = kwargs.get('embeds') or [kwargs.get('embed')]
+        route = f"POST /channels/{self.id}/messages"
+        await _with_retry(lambda: self.api.request(route, messages=len(embeds)))
+        return kwargs
+
+
+async def _scenario(args, scheduler: OutboundScheduler = None) -> dict:
+    api = FakeDiscord(scheduler)
+    channels = [FakeChannel(api, 1000 + i) for i in range(args.channels)]
+    latencies = {'approval': [], 'customer': [], 'notification': []}
+
+    async def timed(kind: str, call):
+        start = time.perf_counter()
+        await call
+        latencies[kind].append(time.perf_counter() - start)
+
+    def notification(i: int):
+        channel = channels[i % len(channels)]
+        embed = discord.Embed(title="✅ Pagamento Recebido", description=f"R$ {i},00")
+        if scheduler is None:
+            return channel.send(embed=embed)
+        return scheduler.send(channel, PRIORITY_NOTIFICATION, coalesce=True, embed=embed)
+
+    def dm(user_id: int, priority: int):
+        route = f"POST /channels/{user_id}/messages"
+        if scheduler is None:
+            return _with_retry(lambda: api.request(route))
+        return scheduler.run(route, lambda: _with_retry(lambda: api.request(route)), priority)
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(timed('notification', notification(i))) for i in range(args.notifications)]
+    await asyncio.sleep(0.05)
+    tasks += [asyncio.create_task(timed('approval', dm(5000 + i, PRIORITY_APPROVAL))) for i in range(args.approvals)]
+    tasks += [asyncio.create_task(timed('customer', dm(9000 + i, PRIORITY_CUSTOMER))) for i in range(args.approvals)]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    return {'elapsed': elapsed, 'latencies': latencies, 'requests': api.requests,
+            'rate_limited': api.rate_limited, 'messages': api.messages}
+
+
+def _report(name: str, result: dict):
+    lat = result['latencies']
+    print(f"{name}")
+    for kind in ('approval', 'customer', 'notification'):
+        values = sorted(lat[kind])
+        print(f"   {kind:<13} mediana {statistics.median(values) * 1000:7.0f} ms   "
+              f"máx {values[-1] * 1000:7.0f} ms")
+    print(f"   requisições {result['requests']:>5}   429 {result['rate_limited']:>4}   "
+          f"notificações entregues {result['messages']}   total {result['elapsed']:.2f}s\n")
+
+
+async def _main(args):
+    naive = await _scenario(args)
+    _report("Sem agendador (retry em 429)", naive)
+
+    scheduler = OutboundScheduler(global_rate=GLOBAL_RATE, route_limit=ROUTE_LIMIT, route_window=ROUTE_WINDOW,
+                                  max_concurrency=args.concurrency)
+    scheduled = await _scenario(args, scheduler)
+    _report("Com agendador (prioridades + agrupamento)", scheduled)
+    print(f"   agendador: {scheduler.get_stats()}")
+
+    expected = args.notifications + 2 * args.approvals
+    ok = scheduled['messages'] == expected and \
+        max(scheduled['latencies']['approval']) < max(naive['latencies']['approval'])
+    print(f"\n{'✅' if ok else '❌'} aprovações mais rápidas e todas as {expected} mensagens entregues")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agendador de saída vs. envios diretos (Discord simulado)")
+    parser.add_argument("--notifications", type=int, default=150)
+    parser.add_argument("--channels", type=int, default=3)
+    parser.add_argument("--approvals", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"📨 {args.notifications} notificações em {args.channels} canais + {args.approvals} aprovações "
+          f"+ {args.approvals} DMs de clientes (limite {ROUTE_LIMIT}/{ROUTE_WINDOW:.0f}s por rota, "
+          f"{GLOBAL_RATE}/s global)\n")
+    sys.exit(0 if asyncio.run(_main(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark do cache de QR Codes (utils/qr_cache.py).
+
+Compara o custo por QR Code de renderizar (qrcode/Pillow), decodificar o
+base64 da MisticPay, ler do disco e acertar o LRU em memória, e mede quanto
+o event loop fica travado quando N cliques chegam juntos: renderizando no
+próprio loop (como antes) versus pelo cache (pool fora do loop).
+
+Uso:
+    python benchmarks/bench_qr.py [--codes 200]
+"""
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.qr_cache import QrCodeCache, render_png
+
+
+def _pix(i: int) -> str:
+    return f"00020126580014br.gov.bcb.pix0136{i:036d}5204000053039865406{i % 900 + 10:.2f}6304ABCD"
+
+
+async def _loop_lag(work) -> float:
+    """Maior atraso (ms) de um tick de 1 ms enquanto `work` roda."""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - start) * 1000 - 1)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await work()
+    done.set()
+    await tick
+    return max(lags)
+
+
+async def _measure(name: str, count: int, work):
+    start = time.perf_counter()
+    await work()
+    per_item = (time.perf_counter() - start) / count * 1_000_000
+    print(f"   {name:<28} {per_item:>10,.0f} µs/QR")
+
+
+async def main_async(count: int):
+    codes = [_pix(i) for i in range(count)]
+    encoded = {code: base64.b64encode(render_png(code)).decode() for code in codes}
+
+    print(f"🔳 {count} QR Codes PIX distintos\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = QrCodeCache(disk_dir=tmp, workers=4)
+
+        async def render_all():
+            await asyncio.gather(*(cache.get_png(code) for code in codes))
+        await _measure("renderização (pool)", count, render_all)
+
+        async def memory_hits():
+            for code in codes:
+                await cache.get_png(code)
+        await _measure("acerto em memória", count, memory_hits)
+
+        cold = QrCodeCache(disk_dir=tmp, workers=4)
+
+        async def disk_hits():
+            await asyncio.gather(*(cold.get_png(code) for code in codes))
+        await _measure("acerto em disco", count, disk_hits)
+
+        decoder = QrCodeCache(workers=4)
+
+        async def decode_all():
+            await asyncio.gather(*(decoder.get_png(code, encoded[code]) for code in codes))
+        await _measure("base64 da MisticPay", count, decode_all)
+
+        for executor_cache in (cache, cold, decoder):
+            executor_cache.shutdown()
+
+    print(f"\n⏱️ Maior travamento do event loop com {count} cliques simultâneos")
+
+    async def inline():
+        for code in codes:
+            base64.b64decode(base64.b64encode(render_png(code)))
+            await asyncio.sleep(0)
+    print(f"   {'no loop (antes)':<28} {await _loop_lag(inline):>10,.1f} ms")
+
+    pooled = None
+    for label, use_processes in (("threads", False), ("processos", True)):
+        pooled = QrCodeCache(workers=4, use_processes=use_processes)
+
+        async def off_loop():
+            await asyncio.gather(*(pooled.get_png(code) for code in codes))
+        print(f"   {'qr_cache (' + label + ')':<28} {await _loop_lag(off_loop):>10,.1f} ms")
+        if not use_processes:
+            pooled.shutdown()
+
+    async def cached():
+        await asyncio.gather(*(pooled.get_png(code) for code in codes))
+    print(f"   {'qr_cache (em memória)':<28} {await _loop_lag(cached):>10,.1f} ms")
+    pooled.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do cache de QR Codes")
+    parser.add_argument("--codes", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.codes))
+
+
+if __name__ == "__main__":
+    main()
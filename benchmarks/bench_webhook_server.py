@@ -0,0 +1,153 @@
+"""
+Benchmark do servidor de webhook: Flask em thread (werkzeug) vs. aiohttp no
+event loop (webhook_server.start_aiohttp_webhook).
+
+Cada servidor roda em um processo próprio, com banco temporário e os workers
+da caixa de entrada ligados. O gerador de carga (aiohttp, neste processo)
+envia webhooks COMPLETO de cobranças registradas, com concorrência fixa, e
+mede requisições/s e latência (mediana e p99) do POST /webhook. Ao final
+espera a caixa de entrada esvaziar e confere um crédito por cobrança.
+
+Uso:
+    python benchmarks/bench_webhook_server.py [--requests 3000] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+AMOUNT = 10.0
+RECEIVER = 4242
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(kind: str, db_path: str, port: int):
+    """Processo filho: sobe o servidor pedido (logs descartados)."""
+    sys.stdout = io.StringIO()
+    database.DB_PATH = db_path
+    import webhook_server
+
+    if kind == "flask":
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        webhook_server.inbox_workers.start(webhook_server.processar_webhook)
+        make_server("127.0.0.1", port, webhook_server.app, threaded=True).serve_forever()
+    else:
+        async def run():
+            await webhook_server.start_aiohttp_webhook("127.0.0.1", port)
+            await asyncio.Event().wait()
+        asyncio.run(run())
+
+
+async def _load(port: int, prefix: str, requests: int, concurrency: int) -> tuple:
+    import aiohttp
+    url = f"http://127.0.0.1:{port}"
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Espera o servidor aceitar conexões
+        for _ in range(200):
+            try:
+                async with session.get(f"{url}/health") as response:
+                    if response.status == 200:
+                        break
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.05)
+
+        latencies, errors = [], 0
+        queue = iter(range(requests))
+
+        async def worker():
+            nonlocal errors
+            for i in queue:
+                payload = {"transactionId": f"{prefix}{i}", "status": "COMPLETO", "value": AMOUNT,
+                           "transactionType": "DEPOSITO", "id": i}
+                start = time.perf_counter()
+                async with session.post(f"{url}/webhook", json=payload) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies, errors
+
+
+def _settled(prefix: str, timeout: float = 120) -> int:
+    """Espera as cobranças da fase serem liquidadas pelos workers."""
+    conn = database.get_connection()
+    deadline = time.monotonic() + timeout
+    count = 0
+    while time.monotonic() < deadline:
+        count = conn.execute("SELECT COUNT(*) FROM payments WHERE status = 'completed' AND payment_id LIKE ?",
+                             (f"{prefix}%",)).fetchone()[0]
+        pending = conn.execute("SELECT COUNT(*) FROM webhook_inbox WHERE status IN ('pending', 'processing')"
+                               ).fetchone()[0]
+        if pending == 0:
+            break
+        time.sleep(0.1)
+    return count
+
+
+def _phase(kind: str, db_path: str, requests: int, concurrency: int) -> bool:
+    prefix = f"bench_{kind}_"
+    for i in range(requests):
+        database.register_payment(f"{prefix}{i}", RECEIVER, AMOUNT, 1, str(i))
+
+    database.close_connection()  # o filho abre as próprias conexões
+
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(kind, db_path, port), daemon=True)
+    server.start()
+    try:
+        elapsed, latencies, errors = asyncio.run(_load(port, prefix, requests, concurrency))
+        settled = _settled(prefix)
+    finally:
+        server.terminate()
+        server.join()
+
+    latencies.sort()
+    ok = errors == 0 and settled == requests
+    print(f"{kind:<8} {requests / elapsed:8,.0f} req/s   mediana {statistics.median(latencies):6.1f} ms   "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:6.1f} ms   erros {errors}   "
+          f"liquidadas {settled}/{requests} {'✅' if ok else '❌'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flask (thread) vs. aiohttp no servidor de webhook")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "webhook.db")
+        database.DB_PATH = db_path
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.init_db()
+
+        print(f"🌐 {args.requests:,} webhooks por servidor, {args.concurrency} conexões simultâneas\n")
+        ok = all([_phase(kind, db_path, args.requests, args.concurrency) for kind in ("flask", "aiohttp")])
+        database.close_connection()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Teste de carga do fluxo completo de cobrança, sem a MisticPay real.
+
+Sobe o simulador (misticpay_simulator.py) e o servidor de webhook (Flask, em
+uma thread) em portas locais, com banco temporário. Cria cobranças em
+paralelo pelo cliente assíncrono (como o /cobrar), registra cada uma no banco
+e espera os webhooks do simulador liquidarem todas.
+
+Mede a latência de criação (com retries e circuit breaker sob erros e 429
+injetados) e o tempo até a última liquidação, e confere que cada cobrança
+paga foi creditada exatamente uma vez, mesmo com webhooks reentregues.
+
+Uso:
+    python benchmarks/load_pipeline.py [--charges 500] [--concurrency 50] [--latency-ms 80]
+                                       [--error-rate 0.02] [--rate-limit-rate 0.05]
+                                       [--duplicate-rate 0.2] [--pay-delay 0.5]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+RECEIVERS = 20
+
+
+def _report(*args):
+    """Imprime no terminal mesmo com a saída dos servidores redirecionada."""
+    print(*args, file=sys.__stdout__, flush=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_webhook_server(port: int):
+    """Servidor de webhook real (Flask + caixa de entrada) em uma thread."""
+    import logging
+    from werkzeug.serving import make_server
+    import webhook_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", port, webhook_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _run(args, sim_port: int, webhook_port: int) -> bool:
+    from aiohttp import web
+    from misticpay_simulator import MisticPaySimulator
+    from misticpay_client import AsyncMisticPayClient
+
+    simulator = MisticPaySimulator(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.latency_ms / 2,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        pay_delay=args.pay_delay,
+        duplicate_rate=args.duplicate_rate,
+        webhook_url=f"http://127.0.0.1:{webhook_port}/webhook"
+    )
+    runner = web.AppRunner(simulator.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", sim_port).start()
+
+    client = AsyncMisticPayClient(base_url=f"http://127.0.0.1:{sim_port}/api", pool_size=args.concurrency)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, created = [], []
+
+    async def create(i: int):
+        receiver = 1000 + i % RECEIVERS
+        async with semaphore:
+            start = time.perf_counter()
+            result = await client.create_payment_link(receiver, 10.0, "Carga", channel_id=1)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if result:
+            # Mesmo registro feito pelo /cobrar depois da resposta da API
+            await asyncio.to_thread(database.register_payment, result["payment_id"], receiver, 10.0,
+                                    1, str(result["internal_id"]))
+            created.append(result["payment_id"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(create(i) for i in range(args.charges)))
+    create_elapsed = time.perf_counter() - start
+
+    _report(f"🧾 {len(created):,}/{args.charges:,} cobranças criadas em {create_elapsed:.2f}s "
+             f"({args.charges / create_elapsed:,.0f}/s)")
+    if latencies:
+        latencies.sort()
+        _report(f"   latência: mediana {statistics.median(latencies):,.0f} ms   "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1]:,.0f} ms")
+    _report(f"   cliente: {client.get_stats()}")
+
+    # Espera os webhooks (atraso de pagamento + reentregas + retentativas da caixa de entrada)
+    conn = database.get_connection()
+    deadline = time.monotonic() + args.timeout
+    completed = 0
+    while time.monotonic() < deadline:
+        completed = conn.execute("SELECT COUNT(*) FROM payments WHERE status = 'completed'").fetchone()[0]
+        if completed >= len(created) and not simulator._callbacks:
+            break
+        await asyncio.sleep(0.1)
+    settle_elapsed = time.perf_counter() - start
+    await asyncio.sleep(1.5)  # reentregas atrasadas
+
+    balances = conn.execute("SELECT COALESCE(SUM(balance), 0) FROM users").fetchone()[0]
+    history = conn.execute("SELECT COUNT(*) FROM transaction_history WHERE type = 'payment'").fetchone()[0]
+    expected = 10.0 * len(created)
+    ok = completed == len(created) and history == len(created) and abs(balances - expected) < 0.001
+
+    _report(f"\n💸 {completed:,} cobranças liquidadas em {settle_elapsed:.2f}s desde o início")
+    _report(f"   simulador: {simulator.get_stats()}")
+    from utils.webhook_inbox import webhook_inbox
+    _report(f"   caixa de entrada: {webhook_inbox.get_stats()}")
+    _report(f"\n{'✅' if ok else '❌'} saldos: R$ {balances:,.2f} (esperado R$ {expected:,.2f})   "
+            f"créditos: {history} (esperado {len(created)})")
+
+    await client.close()
+    await runner.cleanup()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga do fluxo completo contra o simulador MisticPay")
+    parser.add_argument("--charges", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05)
+    parser.add_argument("--duplicate-rate", type=float, default=0.2)
+    parser.add_argument("--pay-delay", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "pipeline.db")
+        database.init_db()
+
+        webhook_port, sim_port = _free_port(), _free_port()
+        # Os logs detalhados do cliente e do servidor de webhook não interessam aqui
+        with contextlib.redirect_stdout(io.StringIO()):
+            server = _start_webhook_server(webhook_port)
+            try:
+                ok = asyncio.run(_run(args, sim_port, webhook_port))
+            finally:
+                server.shutdown()
+                from utils.webhook_inbox import inbox_workers
+                inbox_workers.stop()
+                database.close_connection()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
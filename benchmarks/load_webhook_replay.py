@@ -0,0 +1,127 @@
+"""
+Teste de carga da idempotência dos webhooks (webhook_events + cache LRU).
+
+Registra um pagamento e reenvia o mesmo webhook milhares de vezes em paralelo
+(várias threads, cada uma com seu cliente Flask), como a MisticPay faz ao
+repetir entregas. Ao final verifica que houve exatamente um crédito.
+
+Duas fases:
+- fria: cache LRU vazio, as entregas vão para a caixa de entrada e os workers
+  disputam a restrição única de webhook_events;
+- quente: o transactionId já está no cache e a resposta não toca o banco.
+
+Uso:
+    python benchmarks/load_webhook_replay.py [--deliveries 5000] [--threads 32]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+AMOUNT = 25.0
+RECEIVER = 4242
+
+
+def _replay(client_factory, payload: dict, deliveries: int, threads: int) -> tuple:
+    """Envia `deliveries` cópias do payload; retorna (status por resposta, latências em µs)."""
+    statuses, latencies = [], []
+    lock = threading.Lock()
+    per_thread = deliveries // threads
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        client = client_factory()
+        local_status, local_lat = [], []
+        barrier.wait()
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            response = client.post("/webhook", json=payload)
+            local_lat.append((time.perf_counter() - start) * 1_000_000)
+            local_status.append(response.get_json()["status"])
+        with lock:
+            statuses.extend(local_status)
+            latencies.extend(local_lat)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return statuses, latencies
+
+
+def _drain(timeout: float = 120) -> bool:
+    """Espera os workers esvaziarem a caixa de entrada."""
+    from utils.webhook_inbox import webhook_inbox
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = webhook_inbox.get_stats()
+        if stats["pending"] == 0 and stats["processing"] == 0:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reenvio concorrente do mesmo webhook")
+    parser.add_argument("--deliveries", type=int, default=5000, help="entregas por fase")
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "replay.db")
+        database.init_db()
+        database.register_payment(f"discord_{RECEIVER}_1", RECEIVER, AMOUNT, channel_id=1, internal_id="900001")
+
+        import webhook_server
+        from utils.webhook_dedupe import webhook_dedupe
+        payload = {"transactionId": "900001", "status": "COMPLETO", "value": AMOUNT}
+
+        print(f"🔁 {args.deliveries:,} entregas do mesmo webhook por fase, {args.threads} threads\n")
+        ok = True
+        for phase in ("fria", "quente"):
+            if phase == "fria":
+                webhook_dedupe.clear()
+            # Os logs detalhados do servidor não interessam aqui
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                statuses, latencies = _replay(webhook_server.app.test_client, payload,
+                                              args.deliveries, args.threads)
+                elapsed = time.perf_counter() - start
+                drained = _drain()
+
+            counts = {status: statuses.count(status) for status in sorted(set(statuses))}
+            print(f"── fase {phase}: {len(statuses) / elapsed:,.0f} req/s   "
+                  f"mediana {statistics.median(latencies):,.0f} µs   p99 "
+                  f"{sorted(latencies)[int(len(latencies) * 0.99) - 1]:,.0f} µs")
+            print(f"   respostas: {counts}")
+            ok = ok and drained
+            if phase == "quente":
+                ok = ok and set(statuses) == {"duplicate"}
+
+        conn = database.get_connection()
+        balance = database.get_balance(RECEIVER)
+        history = conn.execute("SELECT COUNT(*) FROM transaction_history WHERE user_id = ?", (RECEIVER,)).fetchone()[0]
+        events = conn.execute("SELECT COUNT(*) FROM webhook_events").fetchone()[0]
+        from utils.webhook_inbox import webhook_inbox
+        inbox = webhook_inbox.get_stats()
+        ok = ok and balance == AMOUNT and history == 1 and events == 1 and inbox["dead"] == 0
+
+        print(f"\n{'✅' if ok else '❌'} saldo: R$ {balance:.2f} (esperado R$ {AMOUNT:.2f})   "
+              f"histórico: {history}   webhook_events: {events}")
+        print(f"   caixa de entrada: {inbox}   cache: {webhook_dedupe.get_stats()}")
+        database.close_connection()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
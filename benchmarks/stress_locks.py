@@ -0,0 +1,152 @@
+"""
+Teste de contenção dos locks por conta (utils/lock_manager.py).
+
+Muitos vendedores operando em paralelo, por threads (webhook/Flask) e por
+corrotinas (cogs) ao mesmo tempo: créditos, saques e transferências cruzadas
+A->B / B->A (o cenário clássico de deadlock). Ao final verifica:
+- nenhuma thread/corrotina travou (deadlock);
+- nenhum saldo ficou negativo;
+- a soma dos saldos bate com créditos - débitos confirmados.
+
+Roda com 1 faixa (equivalente ao antigo lock global) e com lock striping.
+
+Uso:
+    python benchmarks/stress_locks.py [--sellers 200] [--threads 32] [--tasks 32] [--ops 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import database_async
+from utils import lock_manager
+
+
+class Totals:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.credited = 0.0
+        self.debited = 0.0
+        self.ops = 0
+
+    def add(self, credited=0.0, debited=0.0):
+        with self.lock:
+            self.credited += credited
+            self.debited += debited
+            self.ops += 1
+
+
+def _thread_worker(seed: int, sellers: int, ops: int, totals: Totals):
+    rnd = random.Random(seed)
+    for _ in range(ops):
+        a, b = rnd.randrange(sellers), rnd.randrange(sellers)
+        choice = rnd.random()
+        if choice < 0.4:
+            if database.safe_add_balance(a, 10.0, "stress"):
+                totals.add(credited=10.0)
+        elif choice < 0.7:
+            if database.safe_remove_balance(a, 7.0, "stress"):
+                totals.add(debited=7.0)
+        elif a != b:
+            database.safe_transfer_balance(a, b, 3.0, "stress")
+            database.safe_transfer_balance(b, a, 3.0, "stress")
+            totals.add()
+
+
+async def _task_worker(seed: int, sellers: int, ops: int, totals: Totals):
+    rnd = random.Random(seed)
+    for _ in range(ops):
+        a, b = rnd.randrange(sellers), rnd.randrange(sellers)
+        choice = rnd.random()
+        if choice < 0.4:
+            if await database_async.safe_add_balance(a, 10.0, "stress"):
+                totals.add(credited=10.0)
+        elif choice < 0.7:
+            if await database_async.safe_remove_balance(a, 7.0, "stress"):
+                totals.add(debited=7.0)
+        elif a != b:
+            await asyncio.gather(
+                database_async.safe_transfer_balance(a, b, 3.0, "stress"),
+                database_async.safe_transfer_balance(b, a, 3.0, "stress"),
+            )
+            totals.add()
+
+
+def run_case(name: str, stripes: int, args, tmp: str) -> bool:
+    # Sem group commit: é o caminho que realmente usa os locks por conta
+    database.LEDGER_GROUP_COMMIT = False
+    locks = lock_manager.StripedLockManager(stripes)
+    database.account_locks = locks
+    database_async.account_locks = locks
+
+    database.close_connection()
+    database.DB_PATH = os.path.join(tmp, f"stress_{stripes}.db")
+    database.init_db()
+
+    totals = Totals()
+    threads = [
+        threading.Thread(target=_thread_worker, args=(i, args.sellers, args.ops, totals), daemon=True)
+        for i in range(args.threads)
+    ]
+
+    async def tasks():
+        await database_async.close()
+        await asyncio.gather(*[
+            _task_worker(1000 + i, args.sellers, args.ops, totals) for i in range(args.tasks)
+        ])
+        await database_async.close()
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        asyncio.run(asyncio.wait_for(tasks(), timeout=args.timeout))
+        deadlock = False
+    except asyncio.TimeoutError:
+        deadlock = True
+    for thread in threads:
+        thread.join(timeout=args.timeout)
+        deadlock = deadlock or thread.is_alive()
+    elapsed = time.perf_counter() - start
+
+    conn = database.get_connection()
+    total_balance = conn.execute("SELECT COALESCE(SUM(balance), 0) FROM users").fetchone()[0]
+    negatives = conn.execute("SELECT COUNT(*) FROM users WHERE balance < 0").fetchone()[0]
+    expected = totals.credited - totals.debited
+    consistent = abs(total_balance - expected) < 0.01 and negatives == 0
+
+    stats = locks.get_stats()
+    status = "✅" if consistent and not deadlock else "❌"
+    print(f"{status} {name:<22} {totals.ops / elapsed:>10,.0f} ops/s   "
+          f"contenções: {stats['contended']:>6}   saldo: {total_balance:.2f} (esperado {expected:.2f})   "
+          f"negativos: {negatives}   deadlock: {'sim' if deadlock else 'não'}")
+    database.close_connection()
+    return consistent and not deadlock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de contenção dos locks por conta")
+    parser.add_argument("--sellers", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--tasks", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=200, help="operações por thread/corrotina")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    print(f"🔒 {args.sellers} vendedores, {args.threads} threads + {args.tasks} corrotinas, "
+          f"{args.ops} operações cada\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = run_case("lock global (1 faixa)", 1, args, tmp)
+        ok = run_case("lock striping (256)", 256, args, tmp) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
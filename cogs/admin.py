@@ -12,9 +12,9 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import os
-from database import (
-    add_user, get_balance, add_balance, remove_balance,
-    add_cargo_permission, remove_cargo_permission, has_cargo_permission,
+from database_async import (
+    add_user, get_balance, add_balance, debit_balance,
+    add_cargo_permission, remove_cargo_permission, has_any_cargo_permission,
     get_all_cargo_permissions, add_transaction_history, 
     get_transaction_history_detailed, create_refund, get_pending_refunds,
     process_refund, set_pix_key, get_pix_key, is_financeiro,
@@ -24,6 +24,7 @@ from config import is_owner, get_owner_ids
 from wallet_components import CarteiraView, ConfirmarAcaoView, SacarView, criar_embed_carteira
 from validador_pix import ValidadorPIX
 from embed_utils import padronizar_embed
+from utils.outbound_scheduler import PRIORITY_CUSTOMER, PRIORITY_NOTIFICATION, outbound_scheduler
 
 TAXA_RECEBIMENTO = float(os.getenv("TAXA_RECEBIMENTO", "0.65"))  # R$ 0,65
 TAXA_SAQUE = float(os.getenv("TAXA_SAQUE", "5.00"))  # R$ 5,00
@@ -59,7 +60,7 @@ class AdminCog(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
-        if add_cargo_permission(cargo.id):
+        if await add_cargo_permission(cargo.id):
             embed = discord.Embed(
                 title="✅ Permissão Adicionada",
                 description=f"O cargo **{cargo.name}** agora pode cobrar",
@@ -95,7 +96,7 @@ class AdminCog(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
-        if remove_cargo_permission(cargo.id):
+        if await remove_cargo_permission(cargo.id):
             embed = discord.Embed(
                 title="✅ Permissão Removida",
                 description=f"O cargo **{cargo.name}** não pode mais cobrar",
@@ -131,7 +132,7 @@ class AdminCog(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
-        role_ids = get_all_cargo_permissions()
+        role_ids = await get_all_cargo_permissions()
         
         if not role_ids:
             embed = discord.Embed(
@@ -168,12 +169,12 @@ class AdminCog(commands.Cog):
         Pode apagar seus dados ou sacar saldo.
         """
         
-        add_user(interaction.user.id)
-        saldo = get_balance(interaction.user.id)
-        pix_key = get_pix_key(interaction.user.id)
+        await add_user(interaction.user.id)
+        saldo = await get_balance(interaction.user.id)
+        pix_key = await get_pix_key(interaction.user.id)
         
         # Buscar histórico detalhado
-        historico = get_transaction_history_detailed(interaction.user.id, limit=10)
+        historico = await get_transaction_history_detailed(interaction.user.id, limit=10)
         
         # Criar embed da carteira
         embed = criar_embed_carteira(
@@ -249,8 +250,8 @@ class AdminCog(commands.Cog):
     
     async def iniciar_saque(self, interaction: discord.Interaction, mensagem_anterior):
         """Inicia o processo de saque."""
-        saldo = get_balance(interaction.user.id)
-        pix_key = get_pix_key(interaction.user.id)
+        saldo = await get_balance(interaction.user.id)
+        pix_key = await get_pix_key(interaction.user.id)
         
         if not pix_key:
             embed = discord.Embed(
@@ -313,8 +314,8 @@ class AdminCog(commands.Cog):
         if view.action == "confirmar":
             # Processar saque
             # TODO: Integrar com MisticPay para transferência
-            if remove_balance(interaction.user.id, saldo, f"Saque - Valor final: R$ {valor_final:.2f}"):
-                add_transaction_history(
+            if await debit_balance(interaction.user.id, saldo, f"Saque - Valor final: R$ {valor_final:.2f}"):
+                await add_transaction_history(
                     interaction.user.id,
                     "withdrawal",
                     valor_final,
@@ -371,8 +372,7 @@ class AdminCog(commands.Cog):
         """
         
         # Verifica se o usuário tem um cargo com permissão de cobrar
-        from database import has_cargo_permission
-        tem_permissao = any(has_cargo_permission(role.id) for role in interaction.user.roles)
+        tem_permissao = await has_any_cargo_permission(role.id for role in interaction.user.roles)
         
         if not tem_permissao:
             embed = discord.Embed(
@@ -421,9 +421,9 @@ class AdminCog(commands.Cog):
             return
         
         # Descontar o valor total (sem taxa) do saldo de quem solicitou
-        from database import get_balance, remove_balance
-        saldo_solicitante = get_balance(interaction.user.id)
-        if saldo_solicitante < valor:
+        # (débito condicional atômico: só desconta se houver saldo suficiente)
+        if not await debit_balance(interaction.user.id, valor, f"Reembolso solicitado - ID pendente"):
+            saldo_solicitante = await get_balance(interaction.user.id)
             embed = discord.Embed(
                 title="❌ Saldo Insuficiente",
                 description=f"Você precisa de **R$ {valor:.2f}** para solicitar este reembolso.\n**Seu saldo:** R$ {saldo_solicitante:.2f}",
@@ -432,13 +432,8 @@ class AdminCog(commands.Cog):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
         
-        # Remover o valor total do saldo do solicitante
-        if not remove_balance(interaction.user.id, valor, f"Reembolso solicitado - ID pendente"):
-            await interaction.followup.send("❌ Erro ao descontar valor do saldo", ephemeral=True)
-            return
-        
         # Criar reembolso pendente (valor já é o final que o usuário receberá)
-        refund_id = create_refund(usuario.id, valor_final, motivo)
+        refund_id = await create_refund(usuario.id, valor_final, motivo)
         if not refund_id:
             await interaction.followup.send("❌ Erro ao criar reembolso", ephemeral=True)
             return
@@ -462,6 +457,11 @@ class AdminCog(commands.Cog):
         from ui_components import AprovacaoReembolsoView
         view = AprovacaoReembolsoView(refund_id, usuario.id, valor_final, chave_pix, motivo, APROVADORES_REEMBOLSO, timeout=None)
         
+        # Persistir a aprovação (a view é recriada se o bot reiniciar)
+        from database_async import create_approval, add_approval_messages
+        approval_id = await create_approval("refund", refund_id, usuario.id, valor_final, chave_pix,
+                                            reason=motivo, approver_ids=APROVADORES_REEMBOLSO)
+        
         # Enviar para o canal (visível para todos)
         try:
             embed_canal = discord.Embed(
@@ -472,29 +472,18 @@ class AdminCog(commands.Cog):
             )
             embed_canal.set_footer(text="⏳ Aguardando aprovação")
             padronizar_embed(embed_canal, interaction, user=usuario)
-            await interaction.channel.send(embed=embed_canal)
+            await outbound_scheduler.send(interaction.channel, PRIORITY_NOTIFICATION, embed=embed_canal)
         except:
             pass
         
-        # Enviar para cada aprovador no privado
-        aprovadores_notificados = []
-        for aprovador_id in APROVADORES_REEMBOLSO:
-            try:
-                aprovador = await self.bot.fetch_user(aprovador_id)
-                msg = await aprovador.send(embed=embed_solicitacao, view=view)
-                aprovadores_notificados.append(aprovador.name)
-                
-                # Registrar message_id para poder deletar depois
-                from ui_components import AprovacaoReembolsoView
-                if refund_id not in AprovacaoReembolsoView._refund_messages:
-                    AprovacaoReembolsoView._refund_messages[refund_id] = []
-                AprovacaoReembolsoView._refund_messages[refund_id].append({
-                    'user_id': aprovador_id,
-                    'message_id': msg.id,
-                    'channel_id': msg.channel.id
-                })
-            except Exception as e:
-                print(f"Erro ao enviar DM para aprovador {aprovador_id}: {e}")
+        # Enviar para todos os aprovadores no privado (em paralelo, sem fetch_user)
+        from utils.fanout import dm_fanout
+        enviados = await dm_fanout.send(self.bot, APROVADORES_REEMBOLSO, embed=embed_solicitacao, view=view)
+        aprovadores_notificados = [f"<@{ref['recipient_id']}>" for ref in enviados]
+        
+        # Registrar as DMs para poder editar/deletar depois
+        if enviados:
+            await add_approval_messages(approval_id, enviados)
         
         if aprovadores_notificados:
             embed_confirmacao = discord.Embed(
@@ -517,7 +506,7 @@ class AdminCog(commands.Cog):
                 )
                 embed_user.set_footer(text="⏳ Aguardando aprovação")
                 padronizar_embed(embed_user, interaction, user=usuario)
-                await usuario.send(embed=embed_user)
+                await outbound_scheduler.send_dm(self.bot, usuario, PRIORITY_CUSTOMER, embed=embed_user)
             except:
                 pass
         else:
@@ -540,7 +529,7 @@ class AdminCog(commands.Cog):
             await interaction.response.send_message(embed=embed)
             return
         
-        refunds = get_pending_refunds()
+        refunds = await get_pending_refunds()
         
         if not refunds:
             embed = discord.Embed(
@@ -598,9 +587,9 @@ class AdminCog(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
-        add_user(usuario.id)
-        add_balance(usuario.id, valor, f"Adição manual por {interaction.user.name}")
-        add_transaction_history(
+        await add_user(usuario.id)
+        await add_balance(usuario.id, valor, f"Adição manual por {interaction.user.name}")
+        await add_transaction_history(
             usuario.id,
             "manual_add",
             valor,
@@ -654,8 +643,8 @@ class AdminCog(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
-        saldo = get_balance(usuario.id)
-        if saldo < valor:
+        if not await debit_balance(usuario.id, valor, f"Remoção manual por {interaction.user.name}"):
+            saldo = await get_balance(usuario.id)
             embed = discord.Embed(
                 title="❌ Saldo Insuficiente",
                 description=f"Saldo disponível: R$ {saldo:.2f}",
@@ -664,8 +653,7 @@ class AdminCog(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
-        remove_balance(usuario.id, valor, f"Remoção manual por {interaction.user.name}")
-        add_transaction_history(
+        await add_transaction_history(
             usuario.id,
             "manual_remove",
             valor,
@@ -847,8 +835,8 @@ class AdminCog(commands.Cog):
         
         await interaction.response.defer(ephemeral=True)
         
-        usuarios = get_all_users_with_balance()
-        total = get_total_balance()
+        usuarios = await get_all_users_with_balance()
+        total = await get_total_balance()
         
         if not usuarios:
             embed = discord.Embed(
@@ -5,7 +5,7 @@ Cog para gerenciar financeiros e aprovar saques/reembolsos
 import discord
 from discord.ext import commands
 from discord import app_commands
-from database import (
+from database_async import (
     add_financeiro, remove_financeiro, is_financeiro, 
     get_all_financeiros, get_financeiro_info
 )
@@ -66,7 +66,7 @@ class Financeiro(commands.Cog):
             return
         
         # Verificar se já é financeiro
-        if is_financeiro(usuario.id):
+        if await is_financeiro(usuario.id):
             embed = discord.Embed(
                 title="⚠️ Já é Financeiro",
                 description=f"{usuario.mention} já tem permissão de financeiro!",
@@ -76,7 +76,7 @@ class Financeiro(commands.Cog):
             return
         
         # Adicionar financeiro
-        if add_financeiro(usuario.id, interaction.user.id):
+        if await add_financeiro(usuario.id, interaction.user.id):
             embed = discord.Embed(
                 title="✅ Financeiro Adicionado",
                 description=f"{usuario.mention} agora pode aprovar saques e reembolsos!",
@@ -122,7 +122,7 @@ class Financeiro(commands.Cog):
             return
         
         # Verificar se é financeiro
-        if not is_financeiro(usuario.id):
+        if not await is_financeiro(usuario.id):
             embed = discord.Embed(
                 title="⚠️ Não é Financeiro",
                 description=f"{usuario.mention} não é financeiro!",
@@ -132,7 +132,7 @@ class Financeiro(commands.Cog):
             return
         
         # Remover financeiro
-        if remove_financeiro(usuario.id):
+        if await remove_financeiro(usuario.id):
             embed = discord.Embed(
                 title="✅ Financeiro Removido",
                 description=f"{usuario.mention} não pode mais aprovar saques e reembolsos!",
@@ -164,7 +164,7 @@ class Financeiro(commands.Cog):
     async def listar_financeiros(self, interaction: discord.Interaction):
         """Lista todos os usuários que são financeiros"""
         
-        financeiros = get_all_financeiros()
+        financeiros = await get_all_financeiros()
         
         if not financeiros:
             embed = discord.Embed(
@@ -185,7 +185,7 @@ class Financeiro(commands.Cog):
         for user_id in financeiros:
             try:
                 user = await self.bot.fetch_user(user_id)
-                info = get_financeiro_info(user_id)
+                info = await get_financeiro_info(user_id)
                 mensagem += f"• {user.mention} ({user.id})\n"
                 if info and info['added_at']:
                     mensagem += f"  Adicionado em: {info['added_at'][:10]}\n"
@@ -3,15 +3,19 @@ from discord.ext import commands
 from discord import app_commands
 import os
 from io import BytesIO
-import base64
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from database import (
-    get_balance, get_total_balance, add_balance, 
-    remove_balance, withdraw_balance, get_transaction_history, 
+from database_async import (
+    get_balance, get_total_balance, credit_balance, 
+    debit_balance, get_transaction_history, create_withdrawal_request, 
     add_user, set_pix_key, get_pix_key, get_balance_by_user,
-    register_payment, has_cargo_permission
+    register_payment, get_payment, has_any_cargo_permission, get_all_financeiros,
+    create_approval, add_approval_messages
 )
-from payment_handler import MisticPayHandler
+from misticpay_client import misticpay_client
+from utils.qr_cache import qr_cache
+from utils.fanout import dm_fanout
+from utils.outbound_scheduler import PRIORITY_CUSTOMER, outbound_scheduler
 from ui_components import PagamentoView
 from validador_pix import ValidadorPIX
 from embed_utils import padronizar_embed
@@ -37,112 +41,144 @@ EMOJI_VENDEDOR = os.getenv("EMOJI_VENDEDOR", "👤")
 EMOJI_VALOR = os.getenv("EMOJI_VALOR", "💰")
 EMOJI_PAGAMENTO = os.getenv("EMOJI_PAGAMENTO", "💳")
 
-class PagamentoViewClienteOnly(discord.ui.View):
-    """View com botão de pagamento que só o cliente pode clicar."""
+# Botão "Pagar Agora" sem estado: o custom_id carrega o ID da cobrança e o
+# clique é atendido por PaymentCog.on_interaction, que lê o PIX do banco.
+# Nenhuma View fica em memória e o botão continua funcionando após reinícios.
+PAGAR_PREFIX = "pagar:"
+PIX_VALIDADE = timedelta(minutes=29)
+
+def criar_view_pagar(payment_id: str) -> discord.ui.View:
+    """View só para enviar o botão (chamar view.stop() depois de enviar)."""
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(
+        label="💳 Pagar Agora",
+        style=discord.ButtonStyle.success,
+        custom_id=f"{PAGAR_PREFIX}{payment_id}"
+    ))
+    return view
+
+async def enviar_pix(interaction: discord.Interaction, payment_id: str):
+    """Clique em "Pagar Agora": envia o código PIX e o QR Code ao cliente."""
     
-    def __init__(self, cliente_id: int, pix_code: str, qr_code_base64: str = None):
-        super().__init__(timeout=3600)  # 1 hora
-        self.cliente_id = cliente_id
-        self.pix_code = pix_code
-        self.qr_code_base64 = qr_code_base64
+    payment = await get_payment(payment_id)
+    if not payment or not payment['qr_code']:
+        await interaction.response.send_message("❌ Cobrança não encontrada!", ephemeral=True)
+        return
     
-    @discord.ui.button(label="💳 Pagar Agora", style=discord.ButtonStyle.success, custom_id="btn_pagar")
-    async def btn_pagar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Botão para cliente obter código PIX."""
-        
-        if interaction.user.id != self.cliente_id:
-            await interaction.response.send_message(
-                "❌ Apenas o cliente mencionado pode usar este botão!",
-                ephemeral=True
-            )
-            return
-        
-        # Calcular tempo de expiração (29 minutos)
-        from datetime import datetime, timedelta
-        agora = datetime.now()
-        expira_em = agora + timedelta(minutes=29)
-        tempo_expiracao = f"<t:{int(expira_em.timestamp())}:R>"  # Formato Discord relativo
-        
-        # Enviar código PIX puro (SEM markdown de link)
-        embed = discord.Embed(
-            title="💳 Código PIX Copia e Cola",
-            description="**Copie o código abaixo:**",
-            color=discord.Color.green(),
+    if payment['payer_id'] and interaction.user.id != payment['payer_id']:
+        await interaction.response.send_message(
+            "❌ Apenas o cliente mencionado pode usar este botão!",
+            ephemeral=True
+        )
+        return
+    
+    if payment['status'] == 'completed':
+        await interaction.response.send_message("✅ Esta cobrança já foi paga!", ephemeral=True)
+        return
+    
+    # Expiração do PIX: 29 minutos a partir da criação (created_at é UTC)
+    criado_em = datetime.strptime(payment['created_at'], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    expira_em = criado_em + PIX_VALIDADE
+    if datetime.now(timezone.utc) >= expira_em:
+        await interaction.response.send_message(
+            "⏳ Este código PIX expirou. Peça uma nova cobrança ao vendedor.",
+            ephemeral=True
+        )
+        return
+    
+    pix_code = payment['qr_code']
+    tempo_expiracao = f"<t:{int(expira_em.timestamp())}:R>"  # Formato Discord relativo
+    
+    # Enviar código PIX puro (SEM markdown de link)
+    embed = discord.Embed(
+        title="💳 Código PIX Copia e Cola",
+        description="**Copie o código abaixo:**",
+        color=discord.Color.green(),
+        timestamp=interaction.created_at
+    )
+    embed.add_field(
+        name="📱 Como pagar",
+        value="1️⃣ Copie o código (enviado logo abaixo)\n2️⃣ Abra seu app de banco\n3️⃣ Escolha **PIX Copia e Cola**\n4️⃣ Cole o código e confirme",
+        inline=False
+    )
+    embed.add_field(
+        name="⏱️ Tempo de Processamento",
+        value="Geralmente alguns segundos\nMáximo 5 minutos",
+        inline=False
+    )
+    embed.add_field(
+        name="⏳ Código PIX Expira",
+        value=f"Válido por 29 minutos\nExpira {tempo_expiracao}",
+        inline=False
+    )
+    embed.set_footer(text="✅ Pagamento será confirmado automaticamente")
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+    
+    # Enviar código PIX separadamente em mensagem de texto puro para facilitar cópia (ephemeral - apenas cliente vê)
+    await interaction.followup.send(f"{pix_code}", ephemeral=True)
+    
+    # Notificar publicamente que o pagamento está em andamento
+    try:
+        embed_aguardando = discord.Embed(
+            title="⏳ Aguardando Pagamento",
+            description=f"{interaction.user.mention} iniciou o processo de pagamento via PIX\n\nAguardando confirmação...",
+            color=discord.Color.gold(),
             timestamp=interaction.created_at
         )
-        embed.add_field(
-            name="📱 Como pagar",
-            value="1️⃣ Copie o código (enviado logo abaixo)\n2️⃣ Abra seu app de banco\n3️⃣ Escolha **PIX Copia e Cola**\n4️⃣ Cole o código e confirme",
+        embed_aguardando.add_field(
+            name="⏱️ Tempo Limite",
+            value="29 minutos",
             inline=False
         )
-        embed.add_field(
-            name="⏱️ Tempo de Processamento",
-            value="Geralmente alguns segundos\nMáximo 5 minutos",
-            inline=False
+        embed_aguardando.set_footer(text="Será confirmado automaticamente após o pagamento")
+        await outbound_scheduler.send(interaction.channel, PRIORITY_CUSTOMER, embed=embed_aguardando)
+    except Exception as e:
+        print(f"[AVISO] Erro ao enviar notificação pública: {e}")
+    
+    # Enviar QR Code (cache; renderizado/decodificado fora do event loop)
+    try:
+        qr_data = await qr_cache.get_png(pix_code)
+        file = discord.File(
+            BytesIO(qr_data),
+            filename="qr_code.png"
         )
-        embed.add_field(
-            name="⏳ Código PIX Expira",
-            value=f"Válido por 29 minutos\nExpira {tempo_expiracao}",
+        
+        embed_qr = discord.Embed(
+            title="📱 QR Code PIX",
+            description="Escaneie com a câmera do seu app de banco",
+            color=discord.Color.blue(),
+            timestamp=interaction.created_at
+        )
+        embed_qr.add_field(
+            name="⏳ Válido por",
+            value=f"29 minutos\nExpira {tempo_expiracao}",
             inline=False
         )
-        embed.set_footer(text="✅ Pagamento será confirmado automaticamente")
-        
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-        
-        # Enviar código PIX separadamente em mensagem de texto puro para facilitar cópia (ephemeral - apenas cliente vê)
-        await interaction.followup.send(f"{self.pix_code}", ephemeral=True)
-        
-        # Notificar publicamente que o pagamento está em andamento
-        try:
-            embed_aguardando = discord.Embed(
-                title="⏳ Aguardando Pagamento",
-                description=f"{interaction.user.mention} iniciou o processo de pagamento via PIX\n\nAguardando confirmação...",
-                color=discord.Color.gold(),
-                timestamp=interaction.created_at
-            )
-            embed_aguardando.add_field(
-                name="⏱️ Tempo Limite",
-                value="29 minutos",
-                inline=False
-            )
-            embed_aguardando.set_footer(text="Será confirmado automaticamente após o pagamento")
-            await interaction.channel.send(embed=embed_aguardando)
-        except Exception as e:
-            print(f"[AVISO] Erro ao enviar notificação pública: {e}")
+        embed_qr.set_footer(text="Escaneie rápido para pagar com PIX")
         
-        # Enviar QR Code se disponível
-        if self.qr_code_base64:
-            try:
-                qr_base64 = self.qr_code_base64
-                if qr_base64.startswith('data:image'):
-                    qr_base64 = qr_base64.split(',')[1]
-                qr_data = base64.b64decode(qr_base64)
-                file = discord.File(
-                    BytesIO(qr_data),
-                    filename="qr_code.png"
-                )
-                
-                embed_qr = discord.Embed(
-                    title="📱 QR Code PIX",
-                    description="Escaneie com a câmera do seu app de banco",
-                    color=discord.Color.blue(),
-                    timestamp=interaction.created_at
-                )
-                embed_qr.add_field(
-                    name="⏳ Válido por",
-                    value=f"29 minutos\nExpira {tempo_expiracao}",
-                    inline=False
-                )
-                embed_qr.set_footer(text="Escaneie rápido para pagar com PIX")
-                
-                await interaction.followup.send(embed=embed_qr, file=file, ephemeral=True)
-            except Exception as e:
-                print(f"Erro ao enviar QR code: {e}")
+        await interaction.followup.send(embed=embed_qr, file=file, ephemeral=True)
+    except Exception as e:
+        print(f"Erro ao enviar QR code: {e}")
 
 class PaymentCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.payment_handler = MisticPayHandler()
+        self.payment_handler = misticpay_client
+    
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        """Atende os botões "Pagar Agora" (custom_id pagar:<payment_id>)."""
+        if interaction.type != discord.InteractionType.component:
+            return
+        custom_id = (interaction.data or {}).get("custom_id", "")
+        if custom_id.startswith(PAGAR_PREFIX):
+            await enviar_pix(interaction, custom_id[len(PAGAR_PREFIX):])
+    
+    async def cog_unload(self):
+        # Fecha as conexões keep-alive com a MisticPay e o pool de QR Codes
+        await self.payment_handler.close()
+        qr_cache.shutdown()
     
     def is_vendedor(self, user: discord.User, guild: discord.Guild = None):
         """Verifica se o usuário é vendedor (tem o cargo ou é dono)."""
@@ -163,7 +199,7 @@ class PaymentCog(commands.Cog):
         ⚠️ Aviso: Verifique cuidadosamente a chave PIX!
         Não nos responsabilizamos por erros de digitação.
         """
-        add_user(interaction.user.id)
+        await add_user(interaction.user.id)
         
         # Validar PIX
         valido, chave_limpa, tipo = ValidadorPIX.validar_pix(pix_key)
@@ -205,7 +241,7 @@ class PaymentCog(commands.Cog):
             return
         
         # Salvar PIX após confirmação
-        set_pix_key(interaction.user.id, chave_limpa)
+        await set_pix_key(interaction.user.id, chave_limpa)
         
         embed = discord.Embed(
             title="✅ Chave PIX Salva",
@@ -229,8 +265,8 @@ class PaymentCog(commands.Cog):
         
         Resposta é visual (apenas você vê).
         """
-        add_user(interaction.user.id)
-        balance = get_balance(interaction.user.id)
+        await add_user(interaction.user.id)
+        balance = await get_balance(interaction.user.id)
         
         from embed_utils import criar_separador, formatar_valor
         
@@ -272,8 +308,8 @@ class PaymentCog(commands.Cog):
     @app_commands.command(name="historico", description="Mostra seu histórico de transações")
     async def transaction_history(self, interaction: discord.Interaction):
         """Mostra seu histórico de transações."""
-        add_user(interaction.user.id)
-        history = get_transaction_history(interaction.user.id, limit=10)
+        await add_user(interaction.user.id)
+        history = await get_transaction_history(interaction.user.id, limit=10)
         
         if not history:
             embed = discord.Embed(
@@ -377,8 +413,8 @@ class PaymentCog(commands.Cog):
             
             repassar_taxa = repassar_taxa_lower in ["sim", "s"]
             
-            add_user(interaction.user.id)
-            add_user(cliente.id)
+            await add_user(interaction.user.id)
+            await add_user(cliente.id)
             
             # Calcular taxas (tax_config["taxa_recebimento"] é um valor fixo em reais, não porcentagem)
             if repassar_taxa:
@@ -400,7 +436,7 @@ class PaymentCog(commands.Cog):
             loading_msg = await interaction.followup.send(embed=loading_embed)
             
             try:
-                result = self.payment_handler.create_payment_link(
+                result = await self.payment_handler.create_payment_link(
                     cliente.id, 
                     total,
                     f"Cobrança de {interaction.user.name}",
@@ -421,7 +457,11 @@ class PaymentCog(commands.Cog):
                 )
                 embed_erro.add_field(
                     name="ℹ️ Detalhes",
-                    value="Erro ao conectar com o serviço de pagamento",
+                    value=(
+                        "Serviço de pagamento instável no momento"
+                        if self.payment_handler.breaker.state != "closed"
+                        else "Erro ao conectar com o serviço de pagamento"
+                    ),
                     inline=False
                 )
                 embed_erro.set_footer(text="Tente novamente em instantes")
@@ -488,30 +528,32 @@ class PaymentCog(commands.Cog):
                 inline=False
             )
             
-            embed.set_footer(text="💡 Clique no botão para obter o código PIX | Válido por 1 hora")
+            embed.set_footer(text="💡 Clique no botão para obter o código PIX | Válido por 29 minutos")
             
             padronizar_embed(embed, interaction, user=cliente, icone_tipo="payment")
             
-            # Registrar pagamento no banco com canal e ID interno da MisticPay
-            register_payment(
+            # Registrar pagamento no banco com canal, ID interno da MisticPay,
+            # cliente e código PIX (o botão "Pagar Agora" lê tudo daqui)
+            await register_payment(
                 payment_id=result['payment_id'],
                 receiver_id=interaction.user.id,  # CORREÇÃO: receiver é o vendedor, não o cliente
                 amount=total,
                 channel_id=interaction.channel.id,
-                internal_id=result.get('internal_id')  # ID interno da MisticPay (ex: 505520)
+                internal_id=result.get('internal_id'),  # ID interno da MisticPay (ex: 505520)
+                payer_id=cliente.id,
+                pix_code=result['url']
             )
             
-            await loading_msg.delete()
+            # Prepara o PNG do QR Code enquanto o cliente lê a cobrança
+            if result.get('url'):
+                qr_cache.warm(result['url'], result.get('qr_code_base64'))
             
-            # Criar view com botão "Pagar Agora"
-            view = PagamentoViewClienteOnly(
-                cliente_id=cliente.id,
-                pix_code=result['url'],
-                qr_code_base64=result.get('qr_code_base64')
-            )
+            await loading_msg.delete()
             
-            # Enviar embed COM botão
+            # Enviar embed COM botão "Pagar Agora" (persistente, sem View em memória)
+            view = criar_view_pagar(result['payment_id'])
             msg = await interaction.followup.send(embed=embed, view=view)
+            view.stop()
         
         except Exception as e:
             print(f"Erro geral no /cobrar: {e}")
@@ -548,7 +590,7 @@ class PaymentCog(commands.Cog):
         
         # Verificar se é o dono ou vendedor
         is_owner = interaction.user.id == OWNER_ID
-        is_seller = any(has_cargo_permission(role.id) for role in interaction.user.roles) if not is_owner else True
+        is_seller = await has_any_cargo_permission(role.id for role in interaction.user.roles) if not is_owner else True
         
         if not is_owner and not is_seller:
             embed = discord.Embed(
@@ -560,10 +602,10 @@ class PaymentCog(commands.Cog):
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
         
-        add_user(interaction.user.id)
+        await add_user(interaction.user.id)
         
         # Se não informar valor, saca tudo
-        saldo_atual = get_balance(interaction.user.id)
+        saldo_atual = await get_balance(interaction.user.id)
         if amount is None:
             amount = saldo_atual
         
@@ -580,7 +622,7 @@ class PaymentCog(commands.Cog):
             await interaction.response.send_message(f"❌ Saldo insuficiente. Você tem R$ {saldo_atual:.2f}", ephemeral=True)
             return
         
-        pix_key = get_pix_key(interaction.user.id)
+        pix_key = await get_pix_key(interaction.user.id)
         if not pix_key:
             embed = discord.Embed(
                 title="❌ PIX não configurado",
@@ -674,9 +716,9 @@ class PaymentCog(commands.Cog):
             return
         
         # DEBITAR SALDO IMEDIATAMENTE (bloqueado para aprovação)
-        saldo_atual = get_balance(interaction.user.id)
-        
-        if saldo_atual < amount:
+        # Débito condicional atômico: se o saldo mudou desde a confirmação, nada é debitado
+        if not await debit_balance(interaction.user.id, amount, f"Saque solicitado - Aguardando aprovação"):
+            saldo_atual = await get_balance(interaction.user.id)
             embed_saldo = discord.Embed(
                 title="❌ Saldo Insuficiente",
                 description=f"Seu saldo mudou. Você tem R$ {saldo_atual:.2f}",
@@ -686,16 +728,8 @@ class PaymentCog(commands.Cog):
             await msg.edit(embed=embed_saldo, view=None)
             return
         
-        # Debitar o saldo (fica bloqueado até aprovação)
-        if not remove_balance(interaction.user.id, amount, f"Saque solicitado - Aguardando aprovação"):
-            embed_erro = discord.Embed(
-                title="❌ Erro ao Bloquear Saldo",
-                description="Erro ao processar o saque",
-                color=discord.Color.red()
-            )
-            padronizar_embed(embed_erro, interaction, user=interaction.user)
-            await msg.edit(embed=embed_erro, view=None)
-            return
+        # Registro do saque: dá a chave de idempotência da transferência PIX
+        withdrawal_id = await create_withdrawal_request(interaction.user.id, total_saque, pix_key)
         
         # ENVIAR PARA APROVAÇÃO NO PRIVADO DO DONO
         loading_embed = discord.Embed(
@@ -757,62 +791,27 @@ class PaymentCog(commands.Cog):
         
         # Criar view de aprovação de saque sem timeout
         from ui_components import AprovacaoSaqueView
-        from database import get_all_financeiros
         
-        view_aprovacao = AprovacaoSaqueView(interaction.user.id, amount, total_saque, pix_key, self.payment_handler, timeout=None)
+        view_aprovacao = AprovacaoSaqueView(interaction.user.id, amount, total_saque, pix_key, self.payment_handler,
+                                            timeout=None, withdrawal_id=withdrawal_id)
         
-        # Enviar para o dono e todos os financeiros no privado
-        aprovadores_notificados = []
-        try:
-            # Enviar para o dono
-            if OWNER_ID > 0:
-                owner = await self.bot.fetch_user(OWNER_ID)
-                msg = await owner.send(embed=embed_aprovacao, view=view_aprovacao)
-                view_aprovacao.message = msg
-                aprovadores_notificados.append(owner.name)
-                print(f"[SAQUE] Enviado para DONO: {owner.name} ({OWNER_ID})")
-                
-                # Registrar message_id para poder deletar depois
-                if interaction.user.id not in AprovacaoSaqueView._withdrawal_messages:
-                    AprovacaoSaqueView._withdrawal_messages[interaction.user.id] = []
-                AprovacaoSaqueView._withdrawal_messages[interaction.user.id].append({
-                    'user_id': OWNER_ID,
-                    'message_id': msg.id,
-                    'channel_id': msg.channel.id
-                })
-            else:
-                print(f"[SAQUE] AVISO: OWNER_ID inválido ({OWNER_ID})")
-            
-            # Enviar para todos os financeiros
-            financeiros = get_all_financeiros()
-            print(f"[SAQUE] Total de financeiros configurados: {len(financeiros)}")
-            for financeiro in financeiros:
-                try:
-                    financeiro_user = await self.bot.fetch_user(financeiro['user_id'])
-                    msg = await financeiro_user.send(embed=embed_aprovacao, view=view_aprovacao)
-                    aprovadores_notificados.append(financeiro_user.name)
-                    print(f"[SAQUE] Enviado para FINANCEIRO: {financeiro_user.name} ({financeiro['user_id']})")
-                    
-                    # Registrar message_id para poder deletar depois
-                    if interaction.user.id not in AprovacaoSaqueView._withdrawal_messages:
-                        AprovacaoSaqueView._withdrawal_messages[interaction.user.id] = []
-                    AprovacaoSaqueView._withdrawal_messages[interaction.user.id].append({
-                        'user_id': financeiro['user_id'],
-                        'message_id': msg.id,
-                        'channel_id': msg.channel.id
-                    })
-                except Exception as e:
-                    print(f"[SAQUE] ERRO ao enviar para financeiro {financeiro['user_id']}: {e}")
-            
-            if not aprovadores_notificados:
-                print(f"[SAQUE] AVISO: Nenhum aprovador foi notificado!")
-        except Exception as e:
-            print(f"[SAQUE] ERRO ao enviar para aprovação: {e}")
-            import traceback
-            traceback.print_exc()
-            # Devolver saldo se falhar ao enviar
-            from database import add_balance
-            add_balance(interaction.user.id, amount)
+        # Persistir a aprovação (a view é recriada se o bot reiniciar)
+        approval_id = None
+        if withdrawal_id:
+            approval_id = await create_approval("withdrawal", withdrawal_id, interaction.user.id, amount, pix_key,
+                                                amount_final=total_saque)
+        
+        if not await self._enviar_aprovacao_saque(interaction.user.id, amount, approval_id,
+                                                  embed_aprovacao, view_aprovacao):
+            embed_cancelado = discord.Embed(
+                title="❌ Saque Cancelado",
+                description="Não foi possível enviar o saque para aprovação. O valor voltou para o seu saldo.",
+                color=discord.Color.red()
+            )
+            padronizar_embed(embed_cancelado, interaction, user=interaction.user)
+            await loading_msg.delete()
+            await interaction.followup.send(embed=embed_cancelado, ephemeral=True)
+            return
         
         embed_pendente = discord.Embed(
             title="⏳ Saque em Análise",
@@ -856,6 +855,57 @@ class PaymentCog(commands.Cog):
         await loading_msg.delete()
         await interaction.followup.send(embed=embed_pendente, ephemeral=True)
     
+    async def _enviar_aprovacao_saque(self, user_id: int, amount: float, approval_id: int,
+                                      embed: discord.Embed, view) -> bool:
+        """Envia o saque para o dono e todos os financeiros no privado (em paralelo, sem fetch_user).
+        
+        Se o envio falhar, encerra a aprovação antes de devolver o saldo e
+        retorna False. Em aberto, ela seria restaurada no próximo início e um
+        aprovador ainda poderia pagar um saque já devolvido.
+        """
+        enviados = []
+        try:
+            if OWNER_ID <= 0:
+                print(f"[SAQUE] AVISO: OWNER_ID inválido ({OWNER_ID})")
+            financeiros = await get_all_financeiros()
+            print(f"[SAQUE] Total de financeiros configurados: {len(financeiros)}")
+            
+            destinatarios = ([OWNER_ID] if OWNER_ID > 0 else []) + financeiros
+            enviados = await dm_fanout.send(self.bot, destinatarios, embed=embed, view=view)
+            for ref in enviados:
+                papel = "DONO" if ref['recipient_id'] == OWNER_ID else "FINANCEIRO"
+                print(f"[SAQUE] Enviado para {papel}: {ref['recipient_id']}")
+                if ref['recipient_id'] == OWNER_ID:
+                    view.message = ref['message']
+            
+            if not enviados:
+                raise RuntimeError("nenhum aprovador foi notificado")
+            
+            # Registrar as DMs para poder deletar depois
+            if approval_id:
+                await add_approval_messages(approval_id, enviados)
+            return True
+        except Exception as e:
+            print(f"[SAQUE] ERRO ao enviar para aprovação: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        # Desativar os botões já entregues e encerrar a aprovação no banco
+        view.processado = True
+        view.stop()
+        if not await view._encerrar("failed"):
+            # Um aprovador já reivindicou o saque pelas DMs entregues: segue o fluxo dele
+            print(f"[SAQUE] Aprovação já reivindicada, saldo não devolvido")
+            return True
+        
+        for ref in enviados:
+            try:
+                await ref['message'].delete()
+            except discord.HTTPException:
+                pass
+        await credit_balance(user_id, amount, "Saque cancelado - Saldo devolvido")
+        return False
+    
     # COMANDOS APENAS PARA DONO
 
 async def setup(bot):
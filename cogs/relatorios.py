@@ -1,16 +1,13 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import os
-import sqlite3
 from datetime import datetime, timedelta
-from database import get_balance, get_total_balance, get_transaction_history
+from database_async import get_balance, get_transaction_history, get_transaction_totals
 from embed_utils import padronizar_embed
 
 class RelatoriosCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db_path = os.getenv("DATABASE_PATH", "./data/bot.db")
     
     @app_commands.command(name="dashboard", description="Mostra um dashboard com resumo de saldos e transações")
     async def dashboard(self, interaction: discord.Interaction):
@@ -18,35 +15,13 @@ class RelatoriosCog(commands.Cog):
         user_id = interaction.user.id
         
         # Obter saldo
-        saldo = get_balance(user_id)
+        saldo = await get_balance(user_id)
         
         # Obter histórico
-        historico = get_transaction_history(user_id, limit=5)
+        historico = await get_transaction_history(user_id, limit=5)
         
         # Obter total de ganhos (sum de transações de entrada)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Verificar se tabela transactions existe, senão usar valores padrão
-        try:
-            cursor.execute("""
-                SELECT 
-                    SUM(CASE WHEN tipo IN ('add', 'payment', 'deposit') THEN valor ELSE 0 END) as ganhos,
-                    COUNT(CASE WHEN tipo = 'withdraw' THEN 1 END) as num_saques,
-                    SUM(CASE WHEN tipo = 'withdraw' THEN valor ELSE 0 END) as total_sacado
-                FROM transactions
-                WHERE user_id = ?
-            """, (user_id,))
-        except sqlite3.OperationalError:
-            # Tabela não existe, usar valores padrão
-            cursor.execute("SELECT 0, 0, 0")
-        
-        resultado = cursor.fetchone()
-        ganhos = resultado[0] or 0
-        num_saques = resultado[1] or 0
-        total_sacado = resultado[2] or 0
-        
-        conn.close()
+        ganhos, num_saques, total_sacado = await get_transaction_totals(user_id)
         
         from embed_utils import criar_separador, formatar_valor, criar_barra_progresso
         
@@ -1,405 +1,407 @@
 import sqlite3
+import json
 import os
+import queue
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
 import threading
 
+from utils.lock_manager import account_locks
+
 DB_PATH = os.getenv("DATABASE_PATH", "./data/bot.db")
 
-# Lock para evitar race conditions em transações
-_transaction_lock = threading.Lock()
+# ════════════════════════════════════════════════════════════════════════════
+# CONEXÕES PERSISTENTES (UMA POR THREAD)
+# ════════════════════════════════════════════════════════════════════════════
+
+# Configuração das conexões (aplicada uma única vez, quando a conexão é aberta)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))  # 16 MB por conexão
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))  # 128 MB
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL é seguro com WAL
+
+# Cada thread (event loop do bot, thread do Flask, backup...) mantém a sua conexão.
+# sqlite3.Connection não pode ser compartilhada entre threads sem lock, então
+# a conexão fica em um threading.local e é reaproveitada em todas as chamadas.
+_local = threading.local()
+_connections_lock = threading.Lock()
+_open_connections = set()
+
+def _configure_connection(conn: sqlite3.Connection):
+    """Aplica os PRAGMAs de desempenho na conexão recém-aberta."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+def get_connection() -> sqlite3.Connection:
+    """Retorna a conexão persistente da thread atual, abrindo-a se necessário.
+
+    A conexão fica em modo autocommit (isolation_level=None): comandos isolados
+    são confirmados na hora e operações com várias escritas usam transaction().
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_PATH and _local.pid == os.getpid():
+        return conn
+
+    # DB_PATH mudou (scripts/benchmarks) ou o processo foi "forkado": abrir outra
+    if conn is not None and _local.pid == os.getpid():
+        close_connection()
 
-def init_db():
-    """Inicializa o banco de dados com as tabelas."""
     os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Tabela de usuários e saldos (cada pessoa tem seu próprio saldo)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            balance REAL DEFAULT 0,
-            pix_key TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Tabela de transações
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            type TEXT NOT NULL,
-            amount REAL NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
-    
-    # Tabela de pagamentos MisticPay
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS payments (
-            payment_id TEXT PRIMARY KEY,
-            receiver_id INTEGER NOT NULL,
-            payer_id INTEGER,
-            amount REAL NOT NULL,
-            status TEXT DEFAULT 'pending',
-            qr_code TEXT,
-            misticpay_id TEXT,
-            channel_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(receiver_id) REFERENCES users(user_id)
-        )
-    """)
-    
-    # Tabela de saques
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS withdrawals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            amount REAL NOT NULL,
-            status TEXT DEFAULT 'pending',
-            pix_key TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            processed_at TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
-    
-    # Tabela de permissões de cargos para cobrar
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cargo_permissions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            role_id INTEGER UNIQUE NOT NULL,
-            can_charge BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Tabela de histórico detalhado de transações
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transaction_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            type TEXT NOT NULL,
-            amount REAL NOT NULL,
-            gross_amount REAL,
-            description TEXT,
-            sender_id INTEGER,
-            sender_name TEXT,
-            misticpay_ref TEXT,
-            status TEXT DEFAULT 'completed',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
-    
-    # Tabela de reembolsos
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS refunds (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            payment_id TEXT,
-            user_id INTEGER NOT NULL,
-            amount REAL NOT NULL,
-            reason TEXT,
-            misticpay_ref TEXT,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            processed_at TIMESTAMP,
-            approved_by INTEGER,
-            approved_at TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(user_id)
-        )
-    """)
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        cached_statements=256
+    )
+    _configure_connection(conn)
 
-    # Migração leve: garantir colunas de aprovação em bases antigas
+    _local.conn = conn
+    _local.path = DB_PATH
+    _local.pid = os.getpid()
+    with _connections_lock:
+        _open_connections.add(conn)
+    return conn
+
+def close_connection():
+    """Fecha a conexão persistente da thread atual (se existir)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        return
+    _local.conn = None
+    with _connections_lock:
+        _open_connections.discard(conn)
     try:
-        cursor.execute("PRAGMA table_info(refunds)")
-        refund_columns = {row[1] for row in cursor.fetchall()}
-        if "approved_by" not in refund_columns:
-            cursor.execute("ALTER TABLE refunds ADD COLUMN approved_by INTEGER")
-        if "approved_at" not in refund_columns:
-            cursor.execute("ALTER TABLE refunds ADD COLUMN approved_at TIMESTAMP")
+        conn.close()
     except Exception as e:
-        print(f"Erro ao verificar/migrar colunas de reembolso: {e}")
-    
-    # Tabela de financeiros (usuários com permissão para aprovar saques/reembolsos)
+        print(f"Erro ao fechar conexão: {e}")
+
+def close_all_connections():
+    """Fecha as conexões de todas as threads (usar no desligamento do bot)."""
+    with _connections_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+    _local.conn = None
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception:
+            # Conexões de outras threads podem recusar o close; o processo está encerrando
+            pass
+
+@contextmanager
+def transaction(immediate: bool = True):
+    """Abre uma transação na conexão da thread e entrega um cursor.
+
+    Faz COMMIT ao sair normalmente e ROLLBACK se ocorrer qualquer exceção.
+    BEGIN IMMEDIATE reserva o lock de escrita já no início da transação.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
     try:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS financeiros (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER UNIQUE NOT NULL,
-                role TEXT DEFAULT 'financeiro',
-                permissions TEXT DEFAULT 'approve_withdrawals,approve_refunds',
-                added_by INTEGER,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(user_id) REFERENCES users(user_id)
-            )
-        """)
-    except Exception as e:
-        print(f"Erro ao criar tabela financeiros: {e}")
-    
-    conn.commit()
-    conn.close()
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+# ════════════════════════════════════════════════════════════════════════════
+# ÍNDICES
+# ════════════════════════════════════════════════════════════════════════════
+
+# Índices secundários atuais: (nome, tabela, colunas). Cada índice é criado
+# pela migração que o introduziu, com a DDL congelada nela (migrations.py);
+# mudar esta lista não altera nenhuma base. Índices obsoletos saem por uma
+# migração com DROP INDEX explícito. A lista documenta o conjunto vigente e
+# serve a ensure_indexes() (benchmarks e bases montadas à mão).
+MANAGED_INDEXES = [
+    # get_transaction_history: WHERE user_id = ? ORDER BY created_at DESC
+    ("idx_transactions_user_created", "transactions", ("user_id", "created_at")),
+    # get_transaction_history_detailed: WHERE user_id = ? ORDER BY created_at DESC
+    ("idx_transaction_history_user_created", "transaction_history", ("user_id", "created_at")),
+    # get_payment_receiver: WHERE internal_id = ? (ID numérico da MisticPay)
+    ("idx_payments_internal_id", "payments", ("internal_id",)),
+    # admin_panel: filtro de status + ORDER BY created_at, estatísticas por dia
+    ("idx_payments_status_created", "payments", ("status", "created_at")),
+    ("idx_payments_created", "payments", ("created_at",)),
+    # get_pending_refunds e admin_panel: WHERE status = ? ORDER BY created_at DESC
+    ("idx_refunds_status_created", "refunds", ("status", "created_at")),
+    ("idx_refunds_created", "refunds", ("created_at",)),
+    # get_all_users_with_balance e admin_panel: ORDER BY balance DESC
+    ("idx_users_balance", "users", ("balance",)),
+    # WebhookInbox.claim: WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id
+    ("idx_webhook_inbox_fila", "webhook_inbox", ("status", "next_attempt_at", "id")),
+    # get_unfinished_payouts: WHERE status IN ('pending', 'unknown')
+    ("idx_payouts_status", "payouts", ("status",)),
+    # get_open_approvals: WHERE status = 'pending'
+    ("idx_approvals_status", "approvals", ("status",)),
+    # get_approval_messages: WHERE approval_id = ?
+    ("idx_approval_messages_approval", "approval_messages", ("approval_id",)),
+    # claim_bot_events: WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id
+    ("idx_bot_events_pronto", "bot_events", ("status", "next_attempt_at", "id")),
+]
+
+def ensure_indexes(cursor):
+    """Cria os índices de MANAGED_INDEXES que faltam (nunca remove nenhum).
+
+    Não é usada pelas migrações: elas trazem a própria DDL.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+    existing = {row[0] for row in cursor.fetchall()}
+
+    for name, table, columns in MANAGED_INDEXES:
+        if name in existing:
+            continue
+        cursor.execute(f"PRAGMA table_info({table})")
+        table_columns = {row[1] for row in cursor.fetchall()}
+        if not set(columns) <= table_columns:
+            # Coluna ainda não existe nesta base (ex: internal_id antes da migração)
+            continue
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+def init_db():
+    """Inicializa o banco de dados aplicando as migrações pendentes (ver migrations.py).
+
+    Em uma base já migrada custa apenas a leitura de PRAGMA user_version.
+    """
+    from migrations import migrate
+    migrate()
 
 def add_user(user_id: int, pix_key: str = None) -> bool:
     """Adiciona um novo usuário se não existir."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("INSERT OR IGNORE INTO users (user_id, balance, pix_key) VALUES (?, ?, ?)", 
-                      (user_id, 0, pix_key))
-        conn.commit()
+        conn.execute("INSERT OR IGNORE INTO users (user_id, balance, pix_key) VALUES (?, ?, ?)",
+                     (user_id, 0, pix_key))
         return True
     except Exception as e:
         print(f"Erro ao adicionar usuário: {e}")
         return False
-    finally:
-        conn.close()
 
 def set_pix_key(user_id: int, pix_key: str) -> bool:
     """Define a chave PIX de um usuário."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("UPDATE users SET pix_key = ? WHERE user_id = ?", (pix_key, user_id))
-        conn.commit()
+        conn.execute("UPDATE users SET pix_key = ? WHERE user_id = ?", (pix_key, user_id))
         return True
     except Exception as e:
         print(f"Erro ao definir chave PIX: {e}")
         return False
-    finally:
-        conn.close()
 
 def get_pix_key(user_id: int) -> str:
     """Retorna a chave PIX de um usuário."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT pix_key FROM users WHERE user_id = ?", (user_id,))
+    cursor = get_connection().execute("SELECT pix_key FROM users WHERE user_id = ?", (user_id,))
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result and result[0] else None
 
 def get_balance(user_id: int) -> float:
     """Retorna o saldo de um usuário."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
+    cursor = get_connection().execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result else 0
 
 def get_total_balance() -> float:
     """Retorna o saldo total de todos os usuários."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT SUM(balance) FROM users")
+    cursor = get_connection().execute("SELECT SUM(balance) FROM users")
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result[0] else 0
 
 def get_all_users_with_balance() -> list:
     """Retorna lista de todos os usuários com saldo (ordenado pelo maior saldo)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id, balance FROM users WHERE balance > 0 ORDER BY balance DESC")
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    cursor = get_connection().execute("SELECT user_id, balance FROM users WHERE balance > 0 ORDER BY balance DESC")
+    return cursor.fetchall()
 
 def get_balance_by_user(user_id: int) -> dict:
     """Retorna info completa do usuário."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id, balance, pix_key FROM users WHERE user_id = ?", (user_id,))
+    cursor = get_connection().execute("SELECT user_id, balance, pix_key FROM users WHERE user_id = ?", (user_id,))
     result = cursor.fetchone()
-    conn.close()
     if result:
         return {"user_id": result[0], "balance": result[1], "pix_key": result[2]}
     return None
 
-def add_balance(user_id: int, amount: float, description: str = "Adição de saldo") -> bool:
-    """Adiciona saldo a um usuário."""
-    add_user(user_id)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# ════════════════════════════════════════════════════════════════════════════
+# PRIMITIVAS ATÔMICAS DE DÉBITO/CRÉDITO
+# ════════════════════════════════════════════════════════════════════════════
+
+# Um único UPDATE condicional: o próprio SQLite garante a atomicidade, inclusive
+# entre processos (bot, webhook, scripts), sem nenhum lock em Python.
+
+_DEBIT_SQL = "UPDATE users SET balance = balance - ?, updated_at = ? WHERE user_id = ? AND balance >= ?"
+_CREDIT_SQL = """
+    INSERT INTO users (user_id, balance, updated_at) VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance, updated_at = excluded.updated_at
+"""
+
+def _debit(cursor, user_id: int, amount: float) -> bool:
+    """Debita se houver saldo suficiente. Retorna False (sem alterar nada) caso contrário."""
+    if amount <= 0:
+        return False
+    cursor.execute(_DEBIT_SQL, (amount, datetime.now().isoformat(), user_id, amount))
+    return cursor.rowcount == 1
+
+def _credit(cursor, user_id: int, amount: float):
+    """Credita o valor, criando o usuário se ainda não existir."""
+    cursor.execute(_CREDIT_SQL, (user_id, amount, datetime.now().isoformat()))
+
+def debit_balance(user_id: int, amount: float, description: str = "Remoção de saldo",
+                  transaction_type: str = "remove") -> bool:
+    """Debita saldo atomicamente (UPDATE ... WHERE balance >= ?). Nunca deixa saldo negativo."""
     try:
-        cursor.execute("UPDATE users SET balance = balance + ? WHERE user_id = ?", (amount, user_id))
-        cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)", 
-                      (user_id, "add", amount, description))
-        conn.commit()
+        with transaction() as cursor:
+            if not _debit(cursor, user_id, amount):
+                return False
+            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)",
+                          (user_id, transaction_type, amount, description))
         return True
     except Exception as e:
-        print(f"Erro ao adicionar saldo: {e}")
+        print(f"Erro ao debitar saldo: {e}")
         return False
-    finally:
-        conn.close()
 
-def remove_balance(user_id: int, amount: float, description: str = "Remoção de saldo") -> bool:
-    """Remove saldo de um usuário (apenas admin)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
-    result = cursor.fetchone()
-    
-    if not result or result[0] < amount:
-        conn.close()
-        return False
-    
+def credit_balance(user_id: int, amount: float, description: str = "Adição de saldo",
+                   transaction_type: str = "add") -> bool:
+    """Credita saldo atomicamente (UPSERT), criando o usuário se necessário."""
     try:
-        cursor.execute("UPDATE users SET balance = balance - ? WHERE user_id = ?", (amount, user_id))
-        cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)", 
-                      (user_id, "remove", amount, description))
-        conn.commit()
+        with transaction() as cursor:
+            _credit(cursor, user_id, amount)
+            cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)",
+                          (user_id, transaction_type, amount, description))
         return True
     except Exception as e:
-        print(f"Erro ao remover saldo: {e}")
+        print(f"Erro ao creditar saldo: {e}")
         return False
-    finally:
-        conn.close()
+
+def add_balance(user_id: int, amount: float, description: str = "Adição de saldo") -> bool:
+    """Adiciona saldo a um usuário."""
+    return credit_balance(user_id, amount, description)
+
+def remove_balance(user_id: int, amount: float, description: str = "Remoção de saldo") -> bool:
+    """Remove saldo de um usuário (apenas admin)."""
+    return debit_balance(user_id, amount, description)
 
 def withdraw_balance(user_id: int, amount: float) -> bool:
     """Processa um saque (simula transferência bancária)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
-    result = cursor.fetchone()
-    
-    if not result or result[0] < amount:
-        conn.close()
-        return False
-    
-    try:
-        cursor.execute("UPDATE users SET balance = balance - ? WHERE user_id = ?", (amount, user_id))
-        cursor.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)", 
-                      (user_id, "withdraw", amount, "Saque solicitado"))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Erro ao sacar: {e}")
-        return False
-    finally:
-        conn.close()
+    return debit_balance(user_id, amount, "Saque solicitado", "withdraw")
 
 def get_transaction_history(user_id: int, limit: int = 10) -> list:
     """Retorna o histórico de transações de um usuário."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT type, amount, description, created_at 
-        FROM transactions 
-        WHERE user_id = ? 
-        ORDER BY created_at DESC 
+    cursor = get_connection().execute("""
+        SELECT type, amount, description, created_at
+        FROM transactions
+        WHERE user_id = ?
+        ORDER BY created_at DESC
         LIMIT ?
     """, (user_id, limit))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    return cursor.fetchall()
+
+def get_transaction_totals(user_id: int) -> tuple:
+    """Retorna (total recebido, número de saques, total sacado) de um usuário."""
+    cursor = get_connection().execute("""
+        SELECT
+            COALESCE(SUM(CASE WHEN type IN ('add', 'payment', 'deposit') THEN amount ELSE 0 END), 0),
+            COUNT(CASE WHEN type = 'withdraw' THEN 1 END),
+            COALESCE(SUM(CASE WHEN type = 'withdraw' THEN amount ELSE 0 END), 0)
+        FROM transactions
+        WHERE user_id = ?
+    """, (user_id,))
+    return cursor.fetchone()
 
-def register_payment(payment_id: str, receiver_id: int, amount: float, channel_id: int = None, internal_id: str = None) -> bool:
-    """Registra um pagamento com o canal onde foi gerado e o ID interno da MisticPay."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def register_payment(payment_id: str, receiver_id: int, amount: float, channel_id: int = None, internal_id: str = None,
+                     payer_id: int = None, pix_code: str = None) -> bool:
+    """Registra um pagamento com o canal onde foi gerado, o ID interno da MisticPay,
+    o cliente e o código PIX copia e cola (lidos pelo botão "Pagar Agora")."""
+    conn = get_connection()
     try:
-        cursor.execute("""
-            INSERT INTO payments (payment_id, receiver_id, amount, channel_id, internal_id, status)
-            VALUES (?, ?, ?, ?, ?, 'pending')
-        """, (payment_id, receiver_id, amount, channel_id, internal_id))
-        conn.commit()
+        conn.execute("""
+            INSERT INTO payments (payment_id, receiver_id, amount, channel_id, internal_id, payer_id, qr_code, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """, (payment_id, receiver_id, amount, channel_id, internal_id, payer_id, pix_code))
         return True
     except Exception as e:
         print(f"Erro ao registrar pagamento: {e}")
         return False
-    finally:
-        conn.close()
+
+# qr_code guarda o código copia e cola (o conteúdo do QR); o PNG vem de utils.qr_cache
+PAYMENT_COLUMNS = ("payment_id", "receiver_id", "payer_id", "amount", "status", "qr_code",
+                   "channel_id", "internal_id", "created_at")
+
+def _payment_dict(row) -> dict:
+    return dict(zip(PAYMENT_COLUMNS, row)) if row else None
+
+def get_payment(payment_id: str) -> dict:
+    """Retorna a cobrança (dict com PAYMENT_COLUMNS) ou None."""
+    row = get_connection().execute(
+        f"SELECT {', '.join(PAYMENT_COLUMNS)} FROM payments WHERE payment_id = ?", (payment_id,)
+    ).fetchone()
+    return _payment_dict(row)
 
 def get_payment_channel(payment_id: str) -> int:
     """Retorna o canal_id de um pagamento."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT channel_id FROM payments WHERE payment_id = ?", (payment_id,))
+    cursor = get_connection().execute("SELECT channel_id FROM payments WHERE payment_id = ?", (payment_id,))
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result else None
 
 def get_payment_receiver(payment_id: str) -> int:
     """Retorna o receiver_id (vendedor) de um pagamento.
     Procura tanto pelo payment_id customizado quanto pelo internal_id da MisticPay.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+    conn = get_connection()
+
     # Primeiro tenta pelo payment_id customizado (discord_...)
-    cursor.execute("SELECT receiver_id FROM payments WHERE payment_id = ?", (payment_id,))
-    result = cursor.fetchone()
-    
+    result = conn.execute("SELECT receiver_id FROM payments WHERE payment_id = ?", (payment_id,)).fetchone()
+
     # Se não encontrar, tenta pelo internal_id (ID numérico da MisticPay)
     if not result:
-        cursor.execute("SELECT receiver_id FROM payments WHERE internal_id = ?", (payment_id,))
-        result = cursor.fetchone()
-    
-    conn.close()
+        result = conn.execute("SELECT receiver_id FROM payments WHERE internal_id = ?", (payment_id,)).fetchone()
+
     return result[0] if result else None
 
 def update_payment_status(payment_id: str, status: str) -> bool:
     """Atualiza status de um pagamento."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("UPDATE payments SET status = ? WHERE payment_id = ?", (status, payment_id))
-        conn.commit()
+        conn.execute("UPDATE payments SET status = ? WHERE payment_id = ?", (status, payment_id))
         return True
     except Exception as e:
         print(f"Erro ao atualizar pagamento: {e}")
         return False
-    finally:
-        conn.close()
 # ════════════════════════════════════════════════════════════════════════════
 # FUNÇÕES DE PERMISSÕES DE CARGO
 # ════════════════════════════════════════════════════════════════════════════
 
 def add_cargo_permission(role_id: int) -> bool:
     """Adiciona permissão de cobrar para um cargo."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
+        conn.execute("""
             INSERT OR REPLACE INTO cargo_permissions (role_id, can_charge, updated_at)
             VALUES (?, 1, CURRENT_TIMESTAMP)
         """, (role_id,))
-        conn.commit()
         return True
     except Exception as e:
         print(f"Erro ao adicionar permissão de cargo: {e}")
         return False
-    finally:
-        conn.close()
 
 def remove_cargo_permission(role_id: int) -> bool:
     """Remove permissão de cobrar de um cargo."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("DELETE FROM cargo_permissions WHERE role_id = ?", (role_id,))
-        conn.commit()
+        conn.execute("DELETE FROM cargo_permissions WHERE role_id = ?", (role_id,))
         return True
     except Exception as e:
         print(f"Erro ao remover permissão de cargo: {e}")
         return False
-    finally:
-        conn.close()
 
 def has_cargo_permission(role_id: int) -> bool:
     """Verifica se um cargo tem permissão de cobrar."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("SELECT can_charge FROM cargo_permissions WHERE role_id = ?", (role_id,))
-        result = cursor.fetchone()
-        conn.close()
+        result = conn.execute("SELECT can_charge FROM cargo_permissions WHERE role_id = ?", (role_id,)).fetchone()
         return result[0] if result else False
     except Exception as e:
         print(f"Erro ao verificar permissão de cargo: {e}")
@@ -407,24 +409,21 @@ def has_cargo_permission(role_id: int) -> bool:
 
 def get_all_cargo_permissions() -> list:
     """Retorna todos os cargos com permissão."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("SELECT role_id FROM cargo_permissions WHERE can_charge = 1")
+        cursor = conn.execute("SELECT role_id FROM cargo_permissions WHERE can_charge = 1")
         return [row[0] for row in cursor.fetchall()]
     except Exception as e:
         print(f"Erro ao listar permissões de cargo: {e}")
         return []
-    finally:
-        conn.close()
 
 # ════════════════════════════════════════════════════════════════════════════
 # FUNÇÕES DE HISTÓRICO DETALHADO DE TRANSAÇÕES
 # ════════════════════════════════════════════════════════════════════════════
 
 def add_transaction_history(
-    user_id: int, 
-    transaction_type: str, 
+    user_id: int,
+    transaction_type: str,
     amount: float,
     description: str,
     gross_amount: float = None,
@@ -434,28 +433,23 @@ def add_transaction_history(
     status: str = "completed"
 ) -> bool:
     """Adiciona uma transação ao histórico detalhado."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
-            INSERT INTO transaction_history 
+        conn.execute("""
+            INSERT INTO transaction_history
             (user_id, type, amount, gross_amount, description, sender_id, sender_name, misticpay_ref, status)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (user_id, transaction_type, amount, gross_amount, description, sender_id, sender_name, misticpay_ref, status))
-        conn.commit()
         return True
     except Exception as e:
         print(f"Erro ao adicionar histórico de transação: {e}")
         return False
-    finally:
-        conn.close()
 
 def get_transaction_history_detailed(user_id: int, limit: int = 10) -> list:
     """Retorna o histórico detalhado de transações de um usuário."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
+        cursor = conn.execute("""
             SELECT type, amount, gross_amount, description, sender_name, misticpay_ref, status, created_at
             FROM transaction_history
             WHERE user_id = ?
@@ -466,8 +460,6 @@ def get_transaction_history_detailed(user_id: int, limit: int = 10) -> list:
     except Exception as e:
         print(f"Erro ao buscar histórico: {e}")
         return []
-    finally:
-        conn.close()
 
 # ════════════════════════════════════════════════════════════════════════════
 # FUNÇÕES DE REEMBOLSO
@@ -481,15 +473,13 @@ def create_refund(
     misticpay_ref: str = None
 ):
     """Cria um reembolso e retorna o ID do reembolso criado."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
+        cursor = conn.execute("""
             INSERT INTO refunds (payment_id, user_id, amount, reason, misticpay_ref, status)
             VALUES (?, ?, ?, ?, ?, 'pending')
         """, (payment_id, user_id, amount, reason, misticpay_ref))
-        conn.commit()
-        
+
         # Retornar o ID do reembolso criado
         refund_id = cursor.lastrowid
         print(f"[DEBUG] Reembolso criado com ID: {refund_id} para user_id: {user_id}, amount: {amount}")
@@ -499,52 +489,43 @@ def create_refund(
         import traceback
         traceback.print_exc()
         return None
-    finally:
-        conn.close()
 
 def process_refund(refund_id: int, misticpay_ref: str = None) -> bool:
     """Marca um reembolso como processado."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
-            UPDATE refunds 
+        conn.execute("""
+            UPDATE refunds
             SET status = 'completed', processed_at = CURRENT_TIMESTAMP, misticpay_ref = ?
             WHERE id = ?
         """, (misticpay_ref, refund_id))
-        conn.commit()
         return True
     except Exception as e:
         print(f"Erro ao processar reembolso: {e}")
         return False
-    finally:
-        conn.close()
 
 def approve_refund(refund_id: int, approved_by: int) -> bool:
     """Aprova um reembolso pendente."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
         # Verificar se o reembolso existe
-        cursor.execute("SELECT id, status FROM refunds WHERE id = ?", (refund_id,))
-        refund = cursor.fetchone()
+        refund = conn.execute("SELECT id, status FROM refunds WHERE id = ?", (refund_id,)).fetchone()
         print(f"[DEBUG] Reembolso encontrado: {refund}")
-        
+
         if not refund:
             print(f"[ERRO] Reembolso #{refund_id} não encontrado no banco")
             return False
-        
+
         if refund[1] != 'pending':
             print(f"[ERRO] Reembolso #{refund_id} já foi processado. Status atual: {refund[1]}")
             return False
-        
-        cursor.execute("""
-            UPDATE refunds 
+
+        cursor = conn.execute("""
+            UPDATE refunds
             SET status = 'aprovado', approved_by = ?, approved_at = CURRENT_TIMESTAMP
             WHERE id = ? AND status = 'pending'
         """, (approved_by, refund_id))
-        conn.commit()
-        
+
         rows_affected = cursor.rowcount
         print(f"[DEBUG] Linhas afetadas: {rows_affected}")
         return rows_affected > 0
@@ -553,38 +534,30 @@ def approve_refund(refund_id: int, approved_by: int) -> bool:
         import traceback
         traceback.print_exc()
         return False
-    finally:
-        conn.close()
 
 def reject_refund(refund_id: int, approved_by: int) -> bool:
     """Rejeita um reembolso pendente."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
-            UPDATE refunds 
+        cursor = conn.execute("""
+            UPDATE refunds
             SET status = 'rejeitado', approved_by = ?, approved_at = CURRENT_TIMESTAMP
             WHERE id = ? AND status = 'pending'
         """, (approved_by, refund_id))
-        conn.commit()
         return cursor.rowcount > 0
     except Exception as e:
         print(f"Erro ao rejeitar reembolso: {e}")
         return False
-    finally:
-        conn.close()
 
 def get_refund_by_id(refund_id: int) -> dict:
     """Retorna os dados de um reembolso específico."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
+        row = conn.execute("""
             SELECT id, user_id, amount, reason, status, created_at, approved_by, approved_at
             FROM refunds
             WHERE id = ?
-        """, (refund_id,))
-        row = cursor.fetchone()
+        """, (refund_id,)).fetchone()
         if row:
             return {
                 'id': row[0],
@@ -600,15 +573,12 @@ def get_refund_by_id(refund_id: int) -> dict:
     except Exception as e:
         print(f"Erro ao buscar reembolso: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_pending_refunds() -> list:
     """Retorna todos os reembolsos pendentes."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
+        cursor = conn.execute("""
             SELECT id, user_id, amount, reason, payment_id, created_at
             FROM refunds
             WHERE status = 'pending'
@@ -618,215 +588,687 @@ def get_pending_refunds() -> list:
     except Exception as e:
         print(f"Erro ao listar reembolsos: {e}")
         return []
-    finally:
-        conn.close()
+
+# ════════════════════════════════════════════════════════════════════════════
+# FUNÇÕES DE SAQUE E PAYOUT (IDEMPOTÊNCIA)
+# ════════════════════════════════════════════════════════════════════════════
+
+# Cada transferência PIX tem uma chave de idempotência derivada do registro de
+# origem (withdrawal-<id>, refund-<id>), gravada em payouts ANTES da chamada HTTP.
+# Status: pending (gravado, não enviado) -> sending (HTTP em andamento) ->
+# accepted | failed | unknown (resultado incerto: reenviar com a mesma chave).
+PAYOUT_COLUMNS = ("idempotency_key", "kind", "reference_id", "user_id", "amount", "pix_key",
+                  "debited_amount", "status", "payout_id", "attempts", "last_error")
+
+def _payout_dict(row) -> dict:
+    return dict(zip(PAYOUT_COLUMNS, row)) if row else None
+
+def create_withdrawal_request(user_id: int, amount: float, pix_key: str) -> int:
+    """Registra um saque aguardando aprovação e retorna o ID (base da chave de idempotência)."""
+    try:
+        cursor = get_connection().execute("""
+            INSERT INTO withdrawals (user_id, amount, status, pix_key)
+            VALUES (?, ?, 'pending', ?)
+        """, (user_id, amount, pix_key))
+        return cursor.lastrowid
+    except Exception as e:
+        print(f"Erro ao registrar saque: {e}")
+        return None
+
+def begin_payout(idempotency_key: str, kind: str, reference_id, user_id: int, amount: float,
+                 pix_key: str, debited_amount: float = None) -> dict:
+    """Grava o payout (se ainda não existir) e retorna o registro atual."""
+    with transaction() as cursor:
+        cursor.execute("""
+            INSERT OR IGNORE INTO payouts
+                (idempotency_key, kind, reference_id, user_id, amount, pix_key, debited_amount, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """, (idempotency_key, kind, str(reference_id), user_id, amount, pix_key, debited_amount))
+        row = cursor.execute(f"SELECT {', '.join(PAYOUT_COLUMNS)} FROM payouts WHERE idempotency_key = ?",
+                             (idempotency_key,)).fetchone()
+    return _payout_dict(row)
+
+def get_payout(idempotency_key: str) -> dict:
+    """Retorna o registro do payout (None se nunca foi gravado)."""
+    row = get_connection().execute(f"SELECT {', '.join(PAYOUT_COLUMNS)} FROM payouts WHERE idempotency_key = ?",
+                                   (idempotency_key,)).fetchone()
+    return _payout_dict(row)
+
+def claim_payout(idempotency_key: str) -> bool:
+    """Marca o payout como em envio. False se já foi concluído ou está sendo enviado."""
+    cursor = get_connection().execute("""
+        UPDATE payouts SET status = 'sending', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE idempotency_key = ? AND status IN ('pending', 'unknown')
+    """, (idempotency_key,))
+    return cursor.rowcount == 1
+
+def record_payout_result(idempotency_key: str, status: str, payout_id: str = None, error: str = None,
+                         notify: bool = False):
+    """Registra o resultado de um envio (e o status do saque e da aprovação de origem).
+
+    Com notify (payout retomado, sem aprovador esperando a resposta), um
+    resultado final também grava no outbox a notificação ao usuário.
+    """
+    with transaction() as cursor:
+        cursor.execute("""
+            UPDATE payouts SET status = ?, payout_id = COALESCE(?, payout_id), last_error = ?,
+                               updated_at = CURRENT_TIMESTAMP
+            WHERE idempotency_key = ?
+        """, (status, payout_id, error, idempotency_key))
+        withdrawal_status = {"accepted": "completed", "failed": "failed"}.get(status)
+        if withdrawal_status:
+            cursor.execute("""
+                UPDATE withdrawals SET status = ?, processed_at = CURRENT_TIMESTAMP
+                WHERE id = (SELECT CAST(reference_id AS INTEGER) FROM payouts
+                            WHERE idempotency_key = ? AND kind = 'withdrawal')
+            """, (withdrawal_status, idempotency_key))
+            # Aprovação ainda reivindicada (ex.: payout retomado após reinício)
+            cursor.execute("""
+                UPDATE approvals SET status = ?, decided_by = claimed_by, decided_at = CURRENT_TIMESTAMP
+                WHERE status = 'processing' AND EXISTS (
+                    SELECT 1 FROM payouts
+                    WHERE idempotency_key = ? AND payouts.kind = approvals.kind
+                      AND payouts.reference_id = CAST(approvals.reference_id AS TEXT)
+                )
+            """, ("approved" if status == "accepted" else "failed", idempotency_key))
+            if notify:
+                cursor.execute(_PAYOUT_RESULT_EVENT_SQL, (EVENT_PAYOUT_RESULT, idempotency_key))
+
+def reset_inflight_payouts() -> int:
+    """Na inicialização: envios interrompidos ('sending') passam a ter resultado incerto."""
+    cursor = get_connection().execute("""
+        UPDATE payouts SET status = 'unknown', updated_at = CURRENT_TIMESTAMP WHERE status = 'sending'
+    """)
+    return cursor.rowcount
+
+def get_unfinished_payouts() -> list:
+    """Retorna os payouts que ainda precisam ser enviados ou confirmados."""
+    rows = get_connection().execute(f"""
+        SELECT {', '.join(PAYOUT_COLUMNS)} FROM payouts
+        WHERE status IN ('pending', 'unknown') ORDER BY created_at
+    """).fetchall()
+    return [_payout_dict(row) for row in rows]
+
+# ════════════════════════════════════════════════════════════════════════════
+# FUNÇÕES DE APROVAÇÃO (SAQUES E REEMBOLSOS)
+# ════════════════════════════════════════════════════════════════════════════
+
+# Estado das aprovações enviadas por DM (kind: 'withdrawal' | 'refund',
+# reference_id: withdrawals.id | refunds.id). Na inicialização o bot recria as
+# views das aprovações em aberto. Status: pending -> processing (reivindicada
+# por um aprovador em claim_approval) -> approved | rejected | failed.
+APPROVAL_COLUMNS = ("id", "kind", "reference_id", "user_id", "amount", "amount_final", "pix_key",
+                    "reason", "payment_id", "approver_ids", "status", "decided_by", "claimed_by")
+
+def _approval_dict(row) -> dict:
+    if not row:
+        return None
+    approval = dict(zip(APPROVAL_COLUMNS, row))
+    ids = approval["approver_ids"]
+    approval["approver_ids"] = [int(i) for i in ids.split(",") if i] if ids else None
+    return approval
+
+def create_approval(kind: str, reference_id: int, user_id: int, amount: float, pix_key: str,
+                    amount_final: float = None, reason: str = None, payment_id: str = None,
+                    approver_ids: list = None) -> int:
+    """Registra uma aprovação pendente e retorna o ID (o mesmo se já existir)."""
+    ids = ",".join(str(i) for i in approver_ids) if approver_ids else None
+    with transaction() as cursor:
+        cursor.execute("""
+            INSERT OR IGNORE INTO approvals
+                (kind, reference_id, user_id, amount, amount_final, pix_key, reason, payment_id, approver_ids)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (kind, reference_id, user_id, amount, amount_final, pix_key, reason, payment_id, ids))
+        row = cursor.execute("SELECT id FROM approvals WHERE kind = ? AND reference_id = ?",
+                             (kind, reference_id)).fetchone()
+    return row[0]
+
+def add_approval_message(approval_id: int, recipient_id: int, channel_id: int, message_id: int):
+    """Guarda a referência da DM enviada a um aprovador."""
+    get_connection().execute("""
+        INSERT OR REPLACE INTO approval_messages (message_id, approval_id, recipient_id, channel_id)
+        VALUES (?, ?, ?, ?)
+    """, (message_id, approval_id, recipient_id, channel_id))
+
+def add_approval_messages(approval_id: int, refs: list):
+    """Guarda de uma vez as DMs de uma aprovação (dicts recipient_id, channel_id, message_id)."""
+    with transaction() as cursor:
+        cursor.executemany("""
+            INSERT OR REPLACE INTO approval_messages (message_id, approval_id, recipient_id, channel_id)
+            VALUES (?, ?, ?, ?)
+        """, [(r['message_id'], approval_id, r['recipient_id'], r['channel_id']) for r in refs])
+
+def get_approval_messages(kind: str, reference_id: int) -> list:
+    """Retorna as DMs (recipient_id, channel_id, message_id) de uma aprovação."""
+    rows = get_connection().execute("""
+        SELECT m.recipient_id, m.channel_id, m.message_id
+        FROM approval_messages m JOIN approvals a ON a.id = m.approval_id
+        WHERE a.kind = ? AND a.reference_id = ?
+    """, (kind, reference_id)).fetchall()
+    return [{'recipient_id': r[0], 'channel_id': r[1], 'message_id': r[2]} for r in rows]
+
+def claim_approval(kind: str, reference_id: int, approver_id: int) -> bool:
+    """Reivindica a aprovação para o aprovador (pending -> processing, um único UPDATE).
+
+    Só um aprovador vence, em qualquer processo. Aprovações antigas, sem registro
+    em approvals, retornam True (protegidas pelos UPDATEs condicionais de origem).
+    """
+    conn = get_connection()
+    cursor = conn.execute("""
+        UPDATE approvals SET status = 'processing', claimed_by = ?, claimed_at = CURRENT_TIMESTAMP
+        WHERE kind = ? AND reference_id = ? AND status = 'pending'
+    """, (approver_id, kind, reference_id))
+    if cursor.rowcount == 1:
+        return True
+    return conn.execute("SELECT 1 FROM approvals WHERE kind = ? AND reference_id = ?",
+                        (kind, reference_id)).fetchone() is None
+
+def release_approval(kind: str, reference_id: int, approver_id: int) -> bool:
+    """Devolve a aprovação à fila (processing -> pending) se nada foi executado."""
+    cursor = get_connection().execute("""
+        UPDATE approvals SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+        WHERE kind = ? AND reference_id = ? AND status = 'processing' AND claimed_by = ?
+    """, (kind, reference_id, approver_id))
+    return cursor.rowcount == 1
+
+def finish_approval(kind: str, reference_id: int, status: str, decided_by: int = None) -> bool:
+    """Encerra uma aprovação (approved | rejected | failed). False se já encerrada
+    ou reivindicada por outro aprovador."""
+    with transaction() as cursor:
+        cursor.execute("""
+            UPDATE approvals SET status = ?, decided_by = ?, decided_at = CURRENT_TIMESTAMP
+            WHERE kind = ? AND reference_id = ?
+              AND (status = 'pending' OR (status = 'processing' AND claimed_by IS ?))
+        """, (status, decided_by, kind, reference_id, decided_by))
+        finished = cursor.rowcount == 1
+        if finished and kind == "withdrawal" and status in ("rejected", "failed"):
+            cursor.execute("""
+                UPDATE withdrawals SET status = ?, processed_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'pending'
+            """, (status, reference_id))
+    return finished
+
+def release_stale_approval_claims(older_than: float) -> int:
+    """Devolve à fila as reivindicações abandonadas (processo caiu antes do PIX).
+
+    Só as que não têm payout registrado: as demais são retomadas por
+    resume_payouts e encerradas por record_payout_result.
+    """
+    cursor = get_connection().execute("""
+        UPDATE approvals SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+        WHERE status = 'processing' AND claimed_at < datetime('now', ?)
+          AND NOT EXISTS (
+              SELECT 1 FROM payouts
+              WHERE payouts.kind = approvals.kind AND payouts.reference_id = CAST(approvals.reference_id AS TEXT)
+          )
+    """, (f"-{int(older_than)} seconds",))
+    return cursor.rowcount
+
+def get_open_approvals() -> list:
+    """Retorna as aprovações em aberto (uma consulta, para recriar as views)."""
+    rows = get_connection().execute(f"""
+        SELECT {', '.join(APPROVAL_COLUMNS)} FROM approvals WHERE status IN ('pending', 'processing') ORDER BY id
+    """).fetchall()
+    return [_approval_dict(row) for row in rows]
+
+# ════════════════════════════════════════════════════════════════════════════
+# EVENTOS PARA O BOT (OUTBOX DE NOTIFICAÇÕES)
+# ════════════════════════════════════════════════════════════════════════════
+
+# Outbox do bot: as notificações de pagamento são gravadas aqui na mesma
+# transação do crédito (_op_settle_payment), por qualquer processo (bot ou
+# webhook_service.py), e o despachante do bot (utils/bot_events.py) as entrega
+# no Discord. Status: pending -> delivering (reservado por um consumidor até
+# next_attempt_at) -> delivered | dead; falhas voltam para pending com backoff.
+BOT_EVENT_COLUMNS = ("id", "kind", "payload", "attempts")
+
+# Notificações de um pagamento liquidado (uma por destino, entregues e
+# retentadas de forma independente)
+EVENT_PAYMENT_CHANNEL = "payment_channel"
+EVENT_PAYMENT_DM = "payment_dm"
+
+# Resultado final de um payout concluído pelo resumer (saque ou reembolso
+# cuja aprovação ficou "em processamento"): DM ao usuário
+EVENT_PAYOUT_RESULT = "payout_result"
+_PAYOUT_RESULT_EVENT_SQL = """
+    INSERT INTO bot_events (kind, payload)
+    SELECT ?, json_object('idempotency_key', idempotency_key, 'kind', kind, 'reference_id', reference_id,
+                          'user_id', user_id, 'amount', amount, 'pix_key', pix_key,
+                          'debited_amount', debited_amount, 'status', status, 'payout_id', payout_id)
+    FROM payouts WHERE idempotency_key = ?
+"""
+
+def _bot_event_dict(row) -> dict:
+    return {'id': row[0], 'kind': row[1], 'payload': json.loads(row[2]), 'attempts': row[3]}
+
+def _enqueue_payment_notifications(cursor, settlement: dict):
+    """Grava as notificações do pagamento no outbox (transação do crédito)."""
+    payload = json.dumps({
+        "receiver_id": settlement["receiver_id"],
+        "amount": settlement["amount"],
+        "payment_id": settlement["payment_id"],
+        "ref": settlement["ref"],
+        "gross_amount": settlement["amount"],
+        "channel_id": settlement["channel_id"]
+    })
+    kinds = [EVENT_PAYMENT_DM]
+    if settlement["channel_id"]:
+        kinds.insert(0, EVENT_PAYMENT_CHANNEL)
+    cursor.executemany("INSERT INTO bot_events (kind, payload) VALUES (?, ?)",
+                       [(kind, payload) for kind in kinds])
+
+def claim_bot_events(consumer: str, limit: int = 50, lease: float = 60) -> list:
+    """
+    Reserva os próximos eventos prontos (mais antigos primeiro) em um único UPDATE
+
+    A reserva vale por lease segundos (next_attempt_at vira o fim da reserva);
+    eventos de um consumidor que caiu voltam a ser reservados quando ela expira,
+    sem mexer nos que outros consumidores ainda estão entregando.
+    """
+    now = time.time()
+    rows = get_connection().execute(f"""
+        UPDATE bot_events SET status = 'delivering', claimed_by = ?, attempts = attempts + 1, next_attempt_at = ?
+        WHERE id IN (
+            SELECT id FROM bot_events
+            WHERE status IN ('pending', 'delivering') AND next_attempt_at <= ? ORDER BY id LIMIT ?
+        )
+        RETURNING {', '.join(BOT_EVENT_COLUMNS)}
+    """, (consumer, now + lease, now, limit)).fetchall()
+    return sorted((_bot_event_dict(row) for row in rows), key=lambda e: e['id'])
+
+def finish_bot_events(consumer: str, delivered: list = (), retries: list = (), dead: list = ()):
+    """
+    Registra o resultado de um lote de entregas em uma única transação
+
+    Só altera eventos ainda reservados por este consumidor: se a reserva
+    expirou e outro consumidor pegou o evento, o resultado atrasado é ignorado.
+
+    Args:
+        consumer: ID do consumidor que reservou os eventos
+        delivered: IDs entregues
+        retries: (id, erro, next_attempt_at) que voltam para a fila
+        dead: (id, erro) que esgotaram as tentativas
+    """
+    with transaction() as cursor:
+        cursor.executemany("""
+            UPDATE bot_events SET status = 'delivered', last_error = NULL, delivered_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'delivering' AND claimed_by = ?
+        """, [(event_id, consumer) for event_id in delivered])
+        cursor.executemany("""
+            UPDATE bot_events SET status = 'pending', last_error = ?, next_attempt_at = ?
+            WHERE id = ? AND status = 'delivering' AND claimed_by = ?
+        """, [(error, next_attempt_at, event_id, consumer) for event_id, error, next_attempt_at in retries])
+        cursor.executemany("""
+            UPDATE bot_events SET status = 'dead', last_error = ?, delivered_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'delivering' AND claimed_by = ?
+        """, [(error, event_id, consumer) for event_id, error in dead])
+
+def get_bot_event_stats() -> dict:
+    """Quantidade de eventos por status."""
+    rows = get_connection().execute("SELECT status, COUNT(*) FROM bot_events GROUP BY status").fetchall()
+    stats = {'pending': 0, 'delivering': 0, 'delivered': 0, 'dead': 0}
+    stats.update(dict(rows))
+    return stats
+
+def list_dead_bot_events(limit: int = 50) -> list:
+    """Lista os eventos em dead-letter (mais recentes primeiro)."""
+    return get_connection().execute("""
+        SELECT id, kind, attempts, last_error, created_at, payload FROM bot_events
+        WHERE status = 'dead' ORDER BY id DESC LIMIT ?
+    """, (limit,)).fetchall()
+
+def replay_dead_bot_events(event_ids: list = None) -> int:
+    """Devolve eventos em dead-letter para a fila (None: todos), com as tentativas zeradas."""
+    conn = get_connection()
+    if event_ids:
+        placeholders = ",".join("?" for _ in event_ids)
+        cursor = conn.execute(f"""
+            UPDATE bot_events SET status = 'pending', attempts = 0, next_attempt_at = 0
+            WHERE status = 'dead' AND id IN ({placeholders})
+        """, tuple(event_ids))
+    else:
+        cursor = conn.execute("""
+            UPDATE bot_events SET status = 'pending', attempts = 0, next_attempt_at = 0 WHERE status = 'dead'
+        """)
+    return cursor.rowcount
 
 # ════════════════════════════════════════════════════════════════════════════
 # FUNÇÕES DE TRANSAÇÃO COM LOCK (ANTI-RACE CONDITIONS)
 # ════════════════════════════════════════════════════════════════════════════
 
+# Operações de ledger: recebem o cursor de uma transação já aberta e retornam
+# True/False. Quem abre a transação é o LedgerWriter (ou o caminho direto).
+
+def _op_add_balance(cursor, user_id: int, amount: float, description: str) -> bool:
+    _credit(cursor, user_id, amount)
+
+    # Registrar transação
+    cursor.execute("""
+        INSERT INTO transactions (user_id, type, amount, description)
+        VALUES (?, ?, ?, ?)
+    """, (user_id, "add", amount, description))
+
+    # Registrar no histórico detalhado
+    cursor.execute("""
+        INSERT INTO transaction_history (user_id, type, amount, description, status)
+        VALUES (?, ?, ?, ?, 'completed')
+    """, (user_id, "add", amount, description))
+    return True
+
+def _op_remove_balance(cursor, user_id: int, amount: float, description: str) -> bool:
+    # Débito condicional: falha sem alterar nada se não houver saldo
+    if not _debit(cursor, user_id, amount):
+        return False
+
+    # Registrar transação
+    cursor.execute("""
+        INSERT INTO transactions (user_id, type, amount, description)
+        VALUES (?, ?, ?, ?)
+    """, (user_id, "remove", amount, description))
+
+    # Registrar no histórico detalhado
+    cursor.execute("""
+        INSERT INTO transaction_history (user_id, type, amount, description, status)
+        VALUES (?, ?, ?, ?, 'completed')
+    """, (user_id, "remove", amount, description))
+    return True
+
+def _op_transfer_balance(cursor, from_user_id: int, to_user_id: int, amount: float, description: str) -> bool:
+    # Debitar o remetente (condicional) e creditar o destinatário
+    if not _debit(cursor, from_user_id, amount):
+        return False
+    _credit(cursor, to_user_id, amount)
+
+    # Registrar transações
+    cursor.execute("""
+        INSERT INTO transactions (user_id, type, amount, description)
+        VALUES (?, ?, ?, ?)
+    """, (from_user_id, "transfer_out", amount, description))
+
+    cursor.execute("""
+        INSERT INTO transactions (user_id, type, amount, description)
+        VALUES (?, ?, ?, ?)
+    """, (to_user_id, "transfer_in", amount, description))
+    return True
+
+def _op_withdraw_balance(cursor, user_id: int, amount: float) -> bool:
+    # Débito condicional: falha sem alterar nada se não houver saldo
+    if not _debit(cursor, user_id, amount):
+        return False
+
+    # Registrar como saque
+    cursor.execute("""
+        INSERT INTO transactions (user_id, type, amount, description)
+        VALUES (?, ?, ?, ?)
+    """, (user_id, "withdraw", amount, "Saque solicitado"))
+
+    # Registrar no histórico detalhado
+    cursor.execute("""
+        INSERT INTO transaction_history (user_id, type, amount, description, status)
+        VALUES (?, ?, ?, ?, 'completed')
+    """, (user_id, "withdraw", amount, "Saque solicitado"))
+
+    # Registrar em withdrawals
+    cursor.execute("""
+        INSERT INTO withdrawals (user_id, amount, status, pix_key)
+        SELECT user_id, ?, 'pending', pix_key FROM users WHERE user_id = ?
+    """, (amount, user_id))
+    return True
+
+def _op_settle_payment(cursor, payment_id: str, amount: float, ref: str, event_id: str = None) -> dict:
+    # Resolver pelo payment_id customizado (discord_...) ou pelo internal_id da MisticPay
+    row = cursor.execute("""
+        SELECT payment_id, receiver_id, amount, channel_id, status FROM payments WHERE payment_id = ?
+    """, (payment_id,)).fetchone()
+    if not row:
+        row = cursor.execute("""
+            SELECT payment_id, receiver_id, amount, channel_id, status FROM payments WHERE internal_id = ?
+        """, (payment_id,)).fetchone()
+    if not row:
+        return None
+
+    settlement = {
+        "payment_id": row[0],
+        "receiver_id": row[1],
+        "amount": amount if amount and amount > 0 else row[2],
+        "channel_id": row[3],
+        "ref": ref or row[0],
+        "settled": False,
+        "duplicate": False
+    }
+
+    # Idempotência: a mesma entrega do provedor (event_id) só é aceita uma vez
+    if event_id:
+        cursor.execute("INSERT OR IGNORE INTO webhook_events (event_id, payment_id) VALUES (?, ?)",
+                       (event_id, settlement["payment_id"]))
+        if cursor.rowcount != 1:
+            settlement["duplicate"] = True
+            return settlement
+
+    # pending -> completed: só quem fizer a transição credita o vendedor
+    cursor.execute("UPDATE payments SET status = 'completed' WHERE payment_id = ? AND status = 'pending'",
+                   (settlement["payment_id"],))
+    if cursor.rowcount != 1:
+        return settlement
+
+    _credit(cursor, settlement["receiver_id"], settlement["amount"])
+    cursor.execute("""
+        INSERT INTO transactions (user_id, type, amount, description)
+        VALUES (?, 'add', ?, 'Pagamento recebido - PIX')
+    """, (settlement["receiver_id"], settlement["amount"]))
+    cursor.execute("""
+        INSERT INTO transaction_history (user_id, type, amount, gross_amount, description, misticpay_ref, status)
+        VALUES (?, 'payment', ?, ?, 'Pagamento recebido', ?, 'completed')
+    """, (settlement["receiver_id"], settlement["amount"], settlement["amount"], settlement["ref"]))
+    # Notificações no outbox: confirmadas junto com o crédito, entregues pelo bot
+    _enqueue_payment_notifications(cursor, settlement)
+    settlement["settled"] = True
+    return settlement
+
+# ════════════════════════════════════════════════════════════════════════════
+# ESCRITOR ÚNICO DO LEDGER (GROUP COMMIT)
+# ════════════════════════════════════════════════════════════════════════════
+
+LEDGER_GROUP_COMMIT = os.getenv("LEDGER_GROUP_COMMIT", "1") == "1"
+LEDGER_BATCH_MAX = int(os.getenv("LEDGER_BATCH_MAX", "64"))
+LEDGER_BATCH_WAIT_MS = float(os.getenv("LEDGER_BATCH_WAIT_MS", "0"))
+
+class LedgerWriter:
+    """Thread única que grava as operações de ledger em lotes.
+
+    Webhook (thread do Flask) e cogs (event loop) enfileiram operações; a thread
+    do escritor junta o que estiver na fila (até LEDGER_BATCH_MAX), executa cada
+    operação em um SAVEPOINT próprio e faz um único COMMIT para o lote todo.
+    Uma operação que falha desfaz só o seu savepoint; as demais seguem no lote.
+    Cada chamador recebe um concurrent.futures.Future com o seu resultado.
+    """
+
+    def __init__(self, batch_max: int = LEDGER_BATCH_MAX, batch_wait_ms: float = LEDGER_BATCH_WAIT_MS):
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    def _ensure_running(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name="ledger-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, op, *args) -> Future:
+        """Enfileira uma operação de ledger e retorna o Future do resultado."""
+        future = Future()
+        self._ensure_running()
+        self._queue.put((op, args, future))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_max:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._commit_batch(batch)
+            except Exception as e:
+                print(f"Erro no escritor do ledger: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _commit_batch(self, batch: list):
+        results = []
+        with transaction() as cursor:
+            for index, (op, args, future) in enumerate(batch):
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = f"op_{index}"
+                cursor.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    result = op(cursor, *args)
+                except Exception as e:
+                    cursor.execute(f"ROLLBACK TO {savepoint}")
+                    cursor.execute(f"RELEASE {savepoint}")
+                    results.append((future, None, e))
+                    continue
+                cursor.execute(f"RELEASE {savepoint}")
+                results.append((future, result, None))
+
+        # Só depois do COMMIT os chamadores são liberados
+        self.batches += 1
+        self.operations += len(results)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "operations": self.operations
+        }
+
+ledger_writer = LedgerWriter()
+
+def run_ledger_operation(op, *args):
+    """Executa uma operação de ledger em uma transação própria na thread atual.
+
+    Não pega lock de conta: quem chama deve segurar account_locks das contas envolvidas.
+    """
+    with transaction() as cursor:
+        return op(cursor, *args)
+
+def submit_ledger_operation(op, *args, accounts: tuple = ()) -> Future:
+    """Executa uma operação de ledger e retorna um Future com o resultado.
+
+    Com LEDGER_GROUP_COMMIT ativo vai para o escritor único; senão roda na hora,
+    na thread atual, com os locks das contas em `accounts` (não há lock global),
+    e o Future já volta resolvido.
+    """
+    if LEDGER_GROUP_COMMIT:
+        return ledger_writer.submit(op, *args)
+
+    future = Future()
+    try:
+        with account_locks.acquire(*accounts):
+            future.set_result(run_ledger_operation(op, *args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
 def safe_add_balance(user_id: int, amount: float, description: str = "Adição de saldo") -> bool:
     """
     Adiciona saldo de forma segura, evitando race conditions com múltiplos usuários.
-    Usa lock para garantir que a operação seja atômica.
+    A operação é gravada pelo escritor único do ledger (atômica, em group commit).
     """
-    with _transaction_lock:
-        add_user(user_id)
-        conn = sqlite3.connect(DB_PATH)
-        
-        # Ativar modo de transação com isolamento mais forte
-        conn.isolation_level = None  # Modo autocommit desativado
-        conn.execute("BEGIN IMMEDIATE")  # Lock de escrita imediato
-        
-        cursor = conn.cursor()
-        try:
-            # Verificar saldo atual (com lock)
-            cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
-            result = cursor.fetchone()
-            current_balance = result[0] if result else 0
-            
-            # Atualizar saldo
-            new_balance = current_balance + amount
-            cursor.execute("UPDATE users SET balance = ?, updated_at = ? WHERE user_id = ?", 
-                          (new_balance, datetime.now().isoformat(), user_id))
-            
-            # Registrar transação
-            cursor.execute("""
-                INSERT INTO transactions (user_id, type, amount, description)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, "add", amount, description))
-            
-            # Registrar no histórico detalhado
-            cursor.execute("""
-                INSERT INTO transaction_history (user_id, type, amount, description, status)
-                VALUES (?, ?, ?, ?, 'completed')
-            """, (user_id, "add", amount, description))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            print(f"Erro ao adicionar saldo com segurança: {e}")
-            return False
-        finally:
-            conn.close()
+    try:
+        return submit_ledger_operation(_op_add_balance, user_id, amount, description,
+                                       accounts=(user_id,)).result()
+    except Exception as e:
+        print(f"Erro ao adicionar saldo com segurança: {e}")
+        return False
 
 def safe_remove_balance(user_id: int, amount: float, description: str = "Remoção de saldo") -> bool:
     """
     Remove saldo de forma segura, evitando overdraft com múltiplos usuários simultâneos.
-    Usa lock para garantir que a operação seja atômica.
+    A operação é gravada pelo escritor único do ledger (atômica, em group commit).
     """
-    with _transaction_lock:
-        conn = sqlite3.connect(DB_PATH)
-        
-        # Ativar modo de transação com isolamento mais forte
-        conn.isolation_level = None
-        conn.execute("BEGIN IMMEDIATE")
-        
-        cursor = conn.cursor()
-        try:
-            # Verificar saldo com lock
-            cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
-            result = cursor.fetchone()
-            
-            if not result or result[0] < amount:
-                conn.rollback()
-                return False
-            
-            current_balance = result[0]
-            new_balance = current_balance - amount
-            
-            # Atualizar saldo
-            cursor.execute("UPDATE users SET balance = ?, updated_at = ? WHERE user_id = ?", 
-                          (new_balance, datetime.now().isoformat(), user_id))
-            
-            # Registrar transação
-            cursor.execute("""
-                INSERT INTO transactions (user_id, type, amount, description)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, "remove", amount, description))
-            
-            # Registrar no histórico detalhado
-            cursor.execute("""
-                INSERT INTO transaction_history (user_id, type, amount, description, status)
-                VALUES (?, ?, ?, ?, 'completed')
-            """, (user_id, "remove", amount, description))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            print(f"Erro ao remover saldo com segurança: {e}")
-            return False
-        finally:
-            conn.close()
+    try:
+        return submit_ledger_operation(_op_remove_balance, user_id, amount, description,
+                                       accounts=(user_id,)).result()
+    except Exception as e:
+        print(f"Erro ao remover saldo com segurança: {e}")
+        return False
 
 def safe_transfer_balance(from_user_id: int, to_user_id: int, amount: float, description: str = "Transferência") -> bool:
     """
     Transfere saldo entre dois usuários de forma segura.
     Evita race conditions e garante atomicidade.
     """
-    with _transaction_lock:
-        add_user(from_user_id)
-        add_user(to_user_id)
-        
-        conn = sqlite3.connect(DB_PATH)
-        conn.isolation_level = None
-        conn.execute("BEGIN IMMEDIATE")
-        
-        cursor = conn.cursor()
-        try:
-            # Verificar saldo do remetente
-            cursor.execute("SELECT balance FROM users WHERE user_id = ?", (from_user_id,))
-            result = cursor.fetchone()
-            
-            if not result or result[0] < amount:
-                conn.rollback()
-                return False
-            
-            # Remover do remetente
-            cursor.execute("UPDATE users SET balance = balance - ?, updated_at = ? WHERE user_id = ?", 
-                          (amount, datetime.now().isoformat(), from_user_id))
-            
-            # Adicionar ao destinatário
-            cursor.execute("UPDATE users SET balance = balance + ?, updated_at = ? WHERE user_id = ?", 
-                          (amount, datetime.now().isoformat(), to_user_id))
-            
-            # Registrar transações
-            cursor.execute("""
-                INSERT INTO transactions (user_id, type, amount, description)
-                VALUES (?, ?, ?, ?)
-            """, (from_user_id, "transfer_out", amount, description))
-            
-            cursor.execute("""
-                INSERT INTO transactions (user_id, type, amount, description)
-                VALUES (?, ?, ?, ?)
-            """, (to_user_id, "transfer_in", amount, description))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            print(f"Erro ao transferir saldo com segurança: {e}")
-            return False
-        finally:
-            conn.close()
+    try:
+        # Os dois locks são adquiridos sempre na mesma ordem (ver StripedLockManager)
+        return submit_ledger_operation(_op_transfer_balance, from_user_id, to_user_id, amount, description,
+                                       accounts=(from_user_id, to_user_id)).result()
+    except Exception as e:
+        print(f"Erro ao transferir saldo com segurança: {e}")
+        return False
 
 def safe_withdraw_balance(user_id: int, amount: float) -> bool:
     """
     Processa um saque de forma segura.
     Evita múltiplas solicitações simultâneas criarem overdraft.
     """
-    with _transaction_lock:
-        conn = sqlite3.connect(DB_PATH)
-        conn.isolation_level = None
-        conn.execute("BEGIN IMMEDIATE")
-        
-        cursor = conn.cursor()
-        try:
-            # Verificar saldo com lock
-            cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
-            result = cursor.fetchone()
-            
-            if not result or result[0] < amount:
-                conn.rollback()
-                return False
-            
-            # Atualizar saldo
-            cursor.execute("UPDATE users SET balance = balance - ?, updated_at = ? WHERE user_id = ?", 
-                          (amount, datetime.now().isoformat(), user_id))
-            
-            # Registrar como saque
-            cursor.execute("""
-                INSERT INTO transactions (user_id, type, amount, description)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, "withdraw", amount, "Saque solicitado"))
-            
-            # Registrar no histórico detalhado
-            cursor.execute("""
-                INSERT INTO transaction_history (user_id, type, amount, description, status)
-                VALUES (?, ?, ?, ?, 'completed')
-            """, (user_id, "withdraw", amount, "Saque solicitado"))
-            
-            # Registrar em withdrawals
-            cursor.execute("""
-                INSERT INTO withdrawals (user_id, amount, status, pix_key)
-                SELECT user_id, ?, 'pending', pix_key FROM users WHERE user_id = ?
-            """, (amount, user_id))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            print(f"Erro ao sacar com segurança: {e}")
-            return False
-        finally:
-            conn.close()
+    try:
+        return submit_ledger_operation(_op_withdraw_balance, user_id, amount,
+                                       accounts=(user_id,)).result()
+    except Exception as e:
+        print(f"Erro ao sacar com segurança: {e}")
+        return False
+
+def settle_payment(payment_id: str, amount: float = None, ref: str = None, event_id: str = None) -> dict:
+    """
+    Liquida um pagamento confirmado pelo webhook em uma única transação:
+    resolve o pagamento (payment_id ou internal_id), muda de 'pending' para
+    'completed', credita o vendedor, grava uma linha no histórico e as
+    notificações do bot no outbox (bot_events).
+
+    Retorna None se o pagamento não existir. Caso contrário retorna um dict
+    com payment_id, receiver_id, amount, channel_id, ref, settled
+    (False quando o pagamento já tinha sido liquidado antes) e duplicate
+    (True quando o event_id do provedor já estava em webhook_events).
+    """
+    # O vendedor só é conhecido dentro da transação; o crédito é um único
+    # UPSERT e a transição de status é condicional, então não há lock de conta
+    return submit_ledger_operation(_op_settle_payment, payment_id, amount, ref, event_id).result()
 
 def get_transaction_lock_status() -> dict:
     """Retorna o status de locks de transação para debug."""
     return {
-        "locked": _transaction_lock.locked(),
+        "locked": account_locks.get_stats()["locked_stripes"] > 0,
+        "account_locks": account_locks.get_stats(),
+        "ledger": ledger_writer.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -834,73 +1276,55 @@ def get_transaction_lock_status() -> dict:
 
 def add_financeiro(user_id: int, added_by: int) -> bool:
     """Adiciona um usuário como financeiro (pode aprovar saques/reembolsos)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
+        conn.execute("""
             INSERT OR REPLACE INTO financeiros (user_id, added_by, added_at)
             VALUES (?, ?, CURRENT_TIMESTAMP)
         """, (user_id, added_by))
-        conn.commit()
         return True
     except Exception as e:
         print(f"Erro ao adicionar financeiro: {e}")
         return False
-    finally:
-        conn.close()
 
 def remove_financeiro(user_id: int) -> bool:
     """Remove um usuário da lista de financeiros."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("DELETE FROM financeiros WHERE user_id = ?", (user_id,))
-        conn.commit()
+        cursor = conn.execute("DELETE FROM financeiros WHERE user_id = ?", (user_id,))
         return cursor.rowcount > 0
     except Exception as e:
         print(f"Erro ao remover financeiro: {e}")
         return False
-    finally:
-        conn.close()
 
 def is_financeiro(user_id: int) -> bool:
     """Verifica se um usuário é financeiro."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("SELECT 1 FROM financeiros WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
+        result = conn.execute("SELECT 1 FROM financeiros WHERE user_id = ?", (user_id,)).fetchone()
         return result is not None
     except Exception as e:
         print(f"Erro ao verificar se é financeiro: {e}")
         return False
-    finally:
-        conn.close()
 
 def get_all_financeiros() -> list:
     """Retorna lista de todos os financeiros."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("SELECT user_id FROM financeiros ORDER BY added_at DESC")
-        result = cursor.fetchall()
-        return [row[0] for row in result]
+        cursor = conn.execute("SELECT user_id FROM financeiros ORDER BY added_at DESC")
+        return [row[0] for row in cursor.fetchall()]
     except Exception as e:
         print(f"Erro ao buscar financeiros: {e}")
         return []
-    finally:
-        conn.close()
 
 def get_financeiro_info(user_id: int) -> dict:
     """Retorna informações sobre um financeiro."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("""
+        result = conn.execute("""
             SELECT user_id, role, permissions, added_by, added_at
             FROM financeiros WHERE user_id = ?
-        """, (user_id,))
-        result = cursor.fetchone()
+        """, (user_id,)).fetchone()
         if result:
             return {
                 "user_id": result[0],
@@ -913,18 +1337,13 @@ def get_financeiro_info(user_id: int) -> dict:
     except Exception as e:
         print(f"Erro ao buscar info do financeiro: {e}")
         return None
-    finally:
-        cursor.close()
-        conn.close()
 
 def get_audit_trail(refund_id: int) -> dict:
     """Retorna informações de auditoria completas de um reembolso"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
+        conn = get_connection()
+        cursor = conn.execute("""
+            SELECT
                 r.id,
                 r.amount,
                 r.reason,
@@ -938,7 +1357,7 @@ def get_audit_trail(refund_id: int) -> dict:
             LEFT JOIN financeiros u ON r.approved_by = u.user_id
             WHERE r.id = ?
         """, (refund_id,))
-        
+
         result = cursor.fetchone()
         if result:
             return {
@@ -956,5 +1375,3 @@ def get_audit_trail(refund_id: int) -> dict:
     except Exception as e:
         print(f"Erro ao buscar auditoria: {e}")
         return None
-    finally:
-        conn.close()
@@ -0,0 +1,815 @@
+"""
+API assíncrona do banco de dados (aiosqlite).
+
+Espelha as funções do database.py para uso dentro do event loop do discord.py
+(cogs e views). O database.py síncrono continua sendo usado pela thread do
+Flask e pelos scripts.
+
+Cada processo mantém duas conexões persistentes:
+- leitura: consultas simples, sempre enxergam apenas dados já confirmados (WAL);
+- escrita: protegida por um asyncio.Lock, para que nenhum comando de outra
+  corrotina caia no meio de uma transação aberta.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import aiosqlite
+
+import database
+from utils.lock_manager import account_locks
+
+_reader = None
+_writer = None
+_path = None
+_loop = None
+_open_lock = asyncio.Lock()
+_write_lock = asyncio.Lock()
+
+# ════════════════════════════════════════════════════════════════════════════
+# CONEXÕES
+# ════════════════════════════════════════════════════════════════════════════
+
+async def _open_connection(path: str) -> aiosqlite.Connection:
+    """Abre uma conexão aiosqlite com os mesmos PRAGMAs do database.py."""
+    conn = aiosqlite.connect(
+        path,
+        timeout=database.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None
+    )
+    # A thread da conexão não pode segurar o encerramento do processo
+    conn.daemon = True
+    await conn
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute(f"PRAGMA busy_timeout={database.SQLITE_BUSY_TIMEOUT_MS}")
+    await conn.execute(f"PRAGMA synchronous={database.SQLITE_SYNCHRONOUS}")
+    await conn.execute(f"PRAGMA cache_size=-{database.SQLITE_CACHE_SIZE_KB}")
+    await conn.execute(f"PRAGMA mmap_size={database.SQLITE_MMAP_SIZE}")
+    await conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+async def _ensure_open():
+    """Abre (ou reabre, se DATABASE_PATH mudou) as conexões do processo."""
+    global _reader, _writer, _path, _loop, _open_lock, _write_lock
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        # Novo event loop (scripts com vários asyncio.run): os locks ficam presos
+        # ao loop em que foram disputados; as conexões aiosqlite servem a qualquer um
+        _open_lock, _write_lock = asyncio.Lock(), asyncio.Lock()
+        _loop = loop
+    if _writer is not None and _path == database.DB_PATH:
+        return
+    async with _open_lock:
+        if _writer is not None and _path == database.DB_PATH:
+            return
+        if _writer is not None:
+            await close()
+        os.makedirs(os.path.dirname(database.DB_PATH) or ".", exist_ok=True)
+        _writer = await _open_connection(database.DB_PATH)
+        _reader = await _open_connection(database.DB_PATH)
+        _path = database.DB_PATH
+
+async def close():
+    """Fecha as conexões assíncronas (usar no desligamento do bot)."""
+    global _reader, _writer, _path
+    for conn in (_reader, _writer):
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"Erro ao fechar conexão assíncrona: {e}")
+    _reader = None
+    _writer = None
+    _path = None
+
+async def _fetchone(query: str, params: tuple = ()):
+    await _ensure_open()
+    async with _reader.execute(query, params) as cursor:
+        return await cursor.fetchone()
+
+async def _fetchall(query: str, params: tuple = ()):
+    await _ensure_open()
+    async with _reader.execute(query, params) as cursor:
+        return await cursor.fetchall()
+
+async def _execute(query: str, params: tuple = ()) -> aiosqlite.Cursor:
+    """Executa um comando de escrita isolado (autocommit) na conexão de escrita."""
+    await _ensure_open()
+    async with _write_lock:
+        return await _writer.execute(query, params)
+
+@asynccontextmanager
+async def transaction(immediate: bool = True):
+    """Transação na conexão de escrita; COMMIT ao sair, ROLLBACK em exceção."""
+    await _ensure_open()
+    async with _write_lock:
+        await _writer.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield _writer
+        except BaseException:
+            await _writer.rollback()
+            raise
+        else:
+            await _writer.commit()
+
+# ════════════════════════════════════════════════════════════════════════════
+# USUÁRIOS E SALDOS
+# ════════════════════════════════════════════════════════════════════════════
+
+async def add_user(user_id: int, pix_key: str = None) -> bool:
+    """Adiciona um novo usuário se não existir."""
+    try:
+        await _execute("INSERT OR IGNORE INTO users (user_id, balance, pix_key) VALUES (?, ?, ?)",
+                       (user_id, 0, pix_key))
+        return True
+    except Exception as e:
+        print(f"Erro ao adicionar usuário: {e}")
+        return False
+
+async def set_pix_key(user_id: int, pix_key: str) -> bool:
+    """Define a chave PIX de um usuário."""
+    try:
+        await _execute("UPDATE users SET pix_key = ? WHERE user_id = ?", (pix_key, user_id))
+        return True
+    except Exception as e:
+        print(f"Erro ao definir chave PIX: {e}")
+        return False
+
+async def get_pix_key(user_id: int) -> str:
+    """Retorna a chave PIX de um usuário."""
+    result = await _fetchone("SELECT pix_key FROM users WHERE user_id = ?", (user_id,))
+    return result[0] if result and result[0] else None
+
+async def get_balance(user_id: int) -> float:
+    """Retorna o saldo de um usuário."""
+    result = await _fetchone("SELECT balance FROM users WHERE user_id = ?", (user_id,))
+    return result[0] if result else 0
+
+async def get_total_balance() -> float:
+    """Retorna o saldo total de todos os usuários."""
+    result = await _fetchone("SELECT SUM(balance) FROM users")
+    return result[0] if result[0] else 0
+
+async def get_all_users_with_balance() -> list:
+    """Retorna lista de todos os usuários com saldo (ordenado pelo maior saldo)."""
+    return await _fetchall("SELECT user_id, balance FROM users WHERE balance > 0 ORDER BY balance DESC")
+
+async def get_balance_by_user(user_id: int) -> dict:
+    """Retorna info completa do usuário."""
+    result = await _fetchone("SELECT user_id, balance, pix_key FROM users WHERE user_id = ?", (user_id,))
+    if result:
+        return {"user_id": result[0], "balance": result[1], "pix_key": result[2]}
+    return None
+
+async def debit_balance(user_id: int, amount: float, description: str = "Remoção de saldo",
+                        transaction_type: str = "remove") -> bool:
+    """Debita saldo atomicamente (UPDATE ... WHERE balance >= ?). Nunca deixa saldo negativo."""
+    if amount <= 0:
+        return False
+    try:
+        async with transaction() as conn:
+            cursor = await conn.execute(database._DEBIT_SQL, (amount, datetime.now().isoformat(), user_id, amount))
+            if cursor.rowcount != 1:
+                return False
+            await conn.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)",
+                               (user_id, transaction_type, amount, description))
+        return True
+    except Exception as e:
+        print(f"Erro ao debitar saldo: {e}")
+        return False
+
+async def credit_balance(user_id: int, amount: float, description: str = "Adição de saldo",
+                         transaction_type: str = "add") -> bool:
+    """Credita saldo atomicamente (UPSERT), criando o usuário se necessário."""
+    try:
+        async with transaction() as conn:
+            await conn.execute(database._CREDIT_SQL, (user_id, amount, datetime.now().isoformat()))
+            await conn.execute("INSERT INTO transactions (user_id, type, amount, description) VALUES (?, ?, ?, ?)",
+                               (user_id, transaction_type, amount, description))
+        return True
+    except Exception as e:
+        print(f"Erro ao creditar saldo: {e}")
+        return False
+
+async def add_balance(user_id: int, amount: float, description: str = "Adição de saldo") -> bool:
+    """Adiciona saldo a um usuário."""
+    return await credit_balance(user_id, amount, description)
+
+async def remove_balance(user_id: int, amount: float, description: str = "Remoção de saldo") -> bool:
+    """Remove saldo de um usuário (apenas admin)."""
+    return await debit_balance(user_id, amount, description)
+
+async def withdraw_balance(user_id: int, amount: float) -> bool:
+    """Processa um saque (simula transferência bancária)."""
+    return await debit_balance(user_id, amount, "Saque solicitado", "withdraw")
+
+async def get_transaction_history(user_id: int, limit: int = 10) -> list:
+    """Retorna o histórico de transações de um usuário."""
+    return await _fetchall("""
+        SELECT type, amount, description, created_at
+        FROM transactions
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT ?
+    """, (user_id, limit))
+
+async def get_transaction_totals(user_id: int) -> tuple:
+    """Retorna (total recebido, número de saques, total sacado) de um usuário."""
+    return await _fetchone("""
+        SELECT
+            COALESCE(SUM(CASE WHEN type IN ('add', 'payment', 'deposit') THEN amount ELSE 0 END), 0),
+            COUNT(CASE WHEN type = 'withdraw' THEN 1 END),
+            COALESCE(SUM(CASE WHEN type = 'withdraw' THEN amount ELSE 0 END), 0)
+        FROM transactions
+        WHERE user_id = ?
+    """, (user_id,))
+
+# ════════════════════════════════════════════════════════════════════════════
+# PAGAMENTOS
+# ════════════════════════════════════════════════════════════════════════════
+
+async def register_payment(payment_id: str, receiver_id: int, amount: float, channel_id: int = None, internal_id: str = None,
+                           payer_id: int = None, pix_code: str = None) -> bool:
+    """Registra um pagamento com o canal onde foi gerado, o ID interno da MisticPay,
+    o cliente e o código PIX copia e cola (lidos pelo botão "Pagar Agora")."""
+    try:
+        await _execute("""
+            INSERT INTO payments (payment_id, receiver_id, amount, channel_id, internal_id, payer_id, qr_code, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """, (payment_id, receiver_id, amount, channel_id, internal_id, payer_id, pix_code))
+        return True
+    except Exception as e:
+        print(f"Erro ao registrar pagamento: {e}")
+        return False
+
+async def get_payment(payment_id: str) -> dict:
+    """Retorna a cobrança (dict com database.PAYMENT_COLUMNS) ou None."""
+    row = await _fetchone(
+        f"SELECT {', '.join(database.PAYMENT_COLUMNS)} FROM payments WHERE payment_id = ?", (payment_id,)
+    )
+    return database._payment_dict(row)
+
+async def get_payment_channel(payment_id: str) -> int:
+    """Retorna o canal_id de um pagamento."""
+    result = await _fetchone("SELECT channel_id FROM payments WHERE payment_id = ?", (payment_id,))
+    return result[0] if result else None
+
+async def get_payment_receiver(payment_id: str) -> int:
+    """Retorna o receiver_id (vendedor) de um pagamento (payment_id ou internal_id)."""
+    result = await _fetchone("SELECT receiver_id FROM payments WHERE payment_id = ?", (payment_id,))
+    if not result:
+        result = await _fetchone("SELECT receiver_id FROM payments WHERE internal_id = ?", (payment_id,))
+    return result[0] if result else None
+
+async def update_payment_status(payment_id: str, status: str) -> bool:
+    """Atualiza status de um pagamento."""
+    try:
+        await _execute("UPDATE payments SET status = ? WHERE payment_id = ?", (status, payment_id))
+        return True
+    except Exception as e:
+        print(f"Erro ao atualizar pagamento: {e}")
+        return False
+
+# ════════════════════════════════════════════════════════════════════════════
+# PERMISSÕES DE CARGO
+# ════════════════════════════════════════════════════════════════════════════
+
+async def add_cargo_permission(role_id: int) -> bool:
+    """Adiciona permissão de cobrar para um cargo."""
+    try:
+        await _execute("""
+            INSERT OR REPLACE INTO cargo_permissions (role_id, can_charge, updated_at)
+            VALUES (?, 1, CURRENT_TIMESTAMP)
+        """, (role_id,))
+        return True
+    except Exception as e:
+        print(f"Erro ao adicionar permissão de cargo: {e}")
+        return False
+
+async def remove_cargo_permission(role_id: int) -> bool:
+    """Remove permissão de cobrar de um cargo."""
+    try:
+        await _execute("DELETE FROM cargo_permissions WHERE role_id = ?", (role_id,))
+        return True
+    except Exception as e:
+        print(f"Erro ao remover permissão de cargo: {e}")
+        return False
+
+async def has_cargo_permission(role_id: int) -> bool:
+    """Verifica se um cargo tem permissão de cobrar."""
+    try:
+        result = await _fetchone("SELECT can_charge FROM cargo_permissions WHERE role_id = ?", (role_id,))
+        return result[0] if result else False
+    except Exception as e:
+        print(f"Erro ao verificar permissão de cargo: {e}")
+        return False
+
+async def has_any_cargo_permission(role_ids: list) -> bool:
+    """Verifica, em uma única consulta, se algum dos cargos tem permissão de cobrar."""
+    role_ids = list(role_ids)
+    if not role_ids:
+        return False
+    try:
+        placeholders = ",".join("?" * len(role_ids))
+        result = await _fetchone(
+            f"SELECT 1 FROM cargo_permissions WHERE can_charge = 1 AND role_id IN ({placeholders}) LIMIT 1",
+            tuple(role_ids)
+        )
+        return result is not None
+    except Exception as e:
+        print(f"Erro ao verificar permissão de cargo: {e}")
+        return False
+
+async def get_all_cargo_permissions() -> list:
+    """Retorna todos os cargos com permissão."""
+    try:
+        rows = await _fetchall("SELECT role_id FROM cargo_permissions WHERE can_charge = 1")
+        return [row[0] for row in rows]
+    except Exception as e:
+        print(f"Erro ao listar permissões de cargo: {e}")
+        return []
+
+# ════════════════════════════════════════════════════════════════════════════
+# HISTÓRICO DETALHADO DE TRANSAÇÕES
+# ════════════════════════════════════════════════════════════════════════════
+
+async def add_transaction_history(
+    user_id: int,
+    transaction_type: str,
+    amount: float,
+    description: str,
+    gross_amount: float = None,
+    sender_id: int = None,
+    sender_name: str = None,
+    misticpay_ref: str = None,
+    status: str = "completed"
+) -> bool:
+    """Adiciona uma transação ao histórico detalhado."""
+    try:
+        await _execute("""
+            INSERT INTO transaction_history
+            (user_id, type, amount, gross_amount, description, sender_id, sender_name, misticpay_ref, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, transaction_type, amount, gross_amount, description, sender_id, sender_name, misticpay_ref, status))
+        return True
+    except Exception as e:
+        print(f"Erro ao adicionar histórico de transação: {e}")
+        return False
+
+async def get_transaction_history_detailed(user_id: int, limit: int = 10) -> list:
+    """Retorna o histórico detalhado de transações de um usuário."""
+    try:
+        return await _fetchall("""
+            SELECT type, amount, gross_amount, description, sender_name, misticpay_ref, status, created_at
+            FROM transaction_history
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (user_id, limit))
+    except Exception as e:
+        print(f"Erro ao buscar histórico: {e}")
+        return []
+
+# ════════════════════════════════════════════════════════════════════════════
+# REEMBOLSOS
+# ════════════════════════════════════════════════════════════════════════════
+
+async def create_refund(
+    user_id: int,
+    amount: float,
+    reason: str,
+    payment_id: str = None,
+    misticpay_ref: str = None
+):
+    """Cria um reembolso e retorna o ID do reembolso criado."""
+    try:
+        cursor = await _execute("""
+            INSERT INTO refunds (payment_id, user_id, amount, reason, misticpay_ref, status)
+            VALUES (?, ?, ?, ?, ?, 'pending')
+        """, (payment_id, user_id, amount, reason, misticpay_ref))
+        refund_id = cursor.lastrowid
+        print(f"[DEBUG] Reembolso criado com ID: {refund_id} para user_id: {user_id}, amount: {amount}")
+        return refund_id
+    except Exception as e:
+        print(f"Erro ao criar reembolso: {e}")
+        return None
+
+async def process_refund(refund_id: int, misticpay_ref: str = None) -> bool:
+    """Marca um reembolso como processado."""
+    try:
+        await _execute("""
+            UPDATE refunds
+            SET status = 'completed', processed_at = CURRENT_TIMESTAMP, misticpay_ref = ?
+            WHERE id = ?
+        """, (misticpay_ref, refund_id))
+        return True
+    except Exception as e:
+        print(f"Erro ao processar reembolso: {e}")
+        return False
+
+async def approve_refund(refund_id: int, approved_by: int) -> bool:
+    """Aprova um reembolso pendente."""
+    try:
+        cursor = await _execute("""
+            UPDATE refunds
+            SET status = 'aprovado', approved_by = ?, approved_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'pending'
+        """, (approved_by, refund_id))
+        if cursor.rowcount == 0:
+            print(f"[ERRO] Reembolso #{refund_id} não encontrado ou já processado")
+            return False
+        return True
+    except Exception as e:
+        print(f"Erro ao aprovar reembolso: {e}")
+        return False
+
+async def reject_refund(refund_id: int, approved_by: int) -> bool:
+    """Rejeita um reembolso pendente."""
+    try:
+        cursor = await _execute("""
+            UPDATE refunds
+            SET status = 'rejeitado', approved_by = ?, approved_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'pending'
+        """, (approved_by, refund_id))
+        return cursor.rowcount > 0
+    except Exception as e:
+        print(f"Erro ao rejeitar reembolso: {e}")
+        return False
+
+async def get_refund_by_id(refund_id: int) -> dict:
+    """Retorna os dados de um reembolso específico."""
+    try:
+        row = await _fetchone("""
+            SELECT id, user_id, amount, reason, status, created_at, approved_by, approved_at
+            FROM refunds
+            WHERE id = ?
+        """, (refund_id,))
+        if row:
+            return {
+                'id': row[0],
+                'user_id': row[1],
+                'amount': row[2],
+                'reason': row[3],
+                'status': row[4],
+                'created_at': row[5],
+                'approved_by': row[6],
+                'approved_at': row[7]
+            }
+        return None
+    except Exception as e:
+        print(f"Erro ao buscar reembolso: {e}")
+        return None
+
+async def get_pending_refunds() -> list:
+    """Retorna todos os reembolsos pendentes."""
+    try:
+        return await _fetchall("""
+            SELECT id, user_id, amount, reason, payment_id, created_at
+            FROM refunds
+            WHERE status = 'pending'
+            ORDER BY created_at DESC
+        """)
+    except Exception as e:
+        print(f"Erro ao listar reembolsos: {e}")
+        return []
+
+# ════════════════════════════════════════════════════════════════════════════
+# SAQUES E PAYOUTS (IDEMPOTÊNCIA)
+# ════════════════════════════════════════════════════════════════════════════
+
+async def create_withdrawal_request(user_id: int, amount: float, pix_key: str) -> int:
+    """Registra um saque aguardando aprovação e retorna o ID."""
+    try:
+        cursor = await _execute("""
+            INSERT INTO withdrawals (user_id, amount, status, pix_key)
+            VALUES (?, ?, 'pending', ?)
+        """, (user_id, amount, pix_key))
+        return cursor.lastrowid
+    except Exception as e:
+        print(f"Erro ao registrar saque: {e}")
+        return None
+
+async def begin_payout(idempotency_key: str, kind: str, reference_id, user_id: int, amount: float,
+                       pix_key: str, debited_amount: float = None) -> dict:
+    """Grava o payout (se ainda não existir) e retorna o registro atual."""
+    async with transaction() as conn:
+        await conn.execute("""
+            INSERT OR IGNORE INTO payouts
+                (idempotency_key, kind, reference_id, user_id, amount, pix_key, debited_amount, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """, (idempotency_key, kind, str(reference_id), user_id, amount, pix_key, debited_amount))
+        async with conn.execute(f"SELECT {', '.join(database.PAYOUT_COLUMNS)} FROM payouts WHERE idempotency_key = ?",
+                                (idempotency_key,)) as cursor:
+            row = await cursor.fetchone()
+    return database._payout_dict(row)
+
+async def get_payout(idempotency_key: str) -> dict:
+    """Retorna o registro do payout (None se nunca foi gravado)."""
+    row = await _fetchone(f"SELECT {', '.join(database.PAYOUT_COLUMNS)} FROM payouts WHERE idempotency_key = ?",
+                          (idempotency_key,))
+    return database._payout_dict(row)
+
+async def claim_payout(idempotency_key: str) -> bool:
+    """Marca o payout como em envio. False se já foi concluído ou está sendo enviado."""
+    cursor = await _execute("""
+        UPDATE payouts SET status = 'sending', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE idempotency_key = ? AND status IN ('pending', 'unknown')
+    """, (idempotency_key,))
+    return cursor.rowcount == 1
+
+async def record_payout_result(idempotency_key: str, status: str, payout_id: str = None, error: str = None,
+                               notify: bool = False):
+    """Registra o resultado de um envio (ver database.record_payout_result)."""
+    async with transaction() as conn:
+        await conn.execute("""
+            UPDATE payouts SET status = ?, payout_id = COALESCE(?, payout_id), last_error = ?,
+                               updated_at = CURRENT_TIMESTAMP
+            WHERE idempotency_key = ?
+        """, (status, payout_id, error, idempotency_key))
+        withdrawal_status = {"accepted": "completed", "failed": "failed"}.get(status)
+        if withdrawal_status:
+            await conn.execute("""
+                UPDATE withdrawals SET status = ?, processed_at = CURRENT_TIMESTAMP
+                WHERE id = (SELECT CAST(reference_id AS INTEGER) FROM payouts
+                            WHERE idempotency_key = ? AND kind = 'withdrawal')
+            """, (withdrawal_status, idempotency_key))
+            # Aprovação ainda reivindicada (ex.: payout retomado após reinício)
+            await conn.execute("""
+                UPDATE approvals SET status = ?, decided_by = claimed_by, decided_at = CURRENT_TIMESTAMP
+                WHERE status = 'processing' AND EXISTS (
+                    SELECT 1 FROM payouts
+                    WHERE idempotency_key = ? AND payouts.kind = approvals.kind
+                      AND payouts.reference_id = CAST(approvals.reference_id AS TEXT)
+                )
+            """, ("approved" if status == "accepted" else "failed", idempotency_key))
+            if notify:
+                await conn.execute(database._PAYOUT_RESULT_EVENT_SQL, (database.EVENT_PAYOUT_RESULT, idempotency_key))
+
+async def reset_inflight_payouts() -> int:
+    """Na inicialização: envios interrompidos ('sending') passam a ter resultado incerto."""
+    cursor = await _execute("""
+        UPDATE payouts SET status = 'unknown', updated_at = CURRENT_TIMESTAMP WHERE status = 'sending'
+    """)
+    return cursor.rowcount
+
+async def get_unfinished_payouts() -> list:
+    """Retorna os payouts que ainda precisam ser enviados ou confirmados."""
+    rows = await _fetchall(f"""
+        SELECT {', '.join(database.PAYOUT_COLUMNS)} FROM payouts
+        WHERE status IN ('pending', 'unknown') ORDER BY created_at
+    """)
+    return [database._payout_dict(row) for row in rows]
+
+# ════════════════════════════════════════════════════════════════════════════
+# APROVAÇÕES (SAQUES E REEMBOLSOS)
+# ════════════════════════════════════════════════════════════════════════════
+
+async def create_approval(kind: str, reference_id: int, user_id: int, amount: float, pix_key: str,
+                          amount_final: float = None, reason: str = None, payment_id: str = None,
+                          approver_ids: list = None) -> int:
+    """Registra uma aprovação pendente e retorna o ID (o mesmo se já existir)."""
+    ids = ",".join(str(i) for i in approver_ids) if approver_ids else None
+    async with transaction() as conn:
+        await conn.execute("""
+            INSERT OR IGNORE INTO approvals
+                (kind, reference_id, user_id, amount, amount_final, pix_key, reason, payment_id, approver_ids)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (kind, reference_id, user_id, amount, amount_final, pix_key, reason, payment_id, ids))
+        async with conn.execute("SELECT id FROM approvals WHERE kind = ? AND reference_id = ?",
+                                (kind, reference_id)) as cursor:
+            row = await cursor.fetchone()
+    return row[0]
+
+async def add_approval_message(approval_id: int, recipient_id: int, channel_id: int, message_id: int):
+    """Guarda a referência da DM enviada a um aprovador."""
+    await _execute("""
+        INSERT OR REPLACE INTO approval_messages (message_id, approval_id, recipient_id, channel_id)
+        VALUES (?, ?, ?, ?)
+    """, (message_id, approval_id, recipient_id, channel_id))
+
+async def add_approval_messages(approval_id: int, refs: list):
+    """Guarda de uma vez as DMs de uma aprovação (dicts recipient_id, channel_id, message_id)."""
+    async with transaction() as conn:
+        await conn.executemany("""
+            INSERT OR REPLACE INTO approval_messages (message_id, approval_id, recipient_id, channel_id)
+            VALUES (?, ?, ?, ?)
+        """, [(r['message_id'], approval_id, r['recipient_id'], r['channel_id']) for r in refs])
+
+async def get_approval_messages(kind: str, reference_id: int) -> list:
+    """Retorna as DMs (recipient_id, channel_id, message_id) de uma aprovação."""
+    rows = await _fetchall("""
+        SELECT m.recipient_id, m.channel_id, m.message_id
+        FROM approval_messages m JOIN approvals a ON a.id = m.approval_id
+        WHERE a.kind = ? AND a.reference_id = ?
+    """, (kind, reference_id))
+    return [{'recipient_id': r[0], 'channel_id': r[1], 'message_id': r[2]} for r in rows]
+
+async def claim_approval(kind: str, reference_id: int, approver_id: int) -> bool:
+    """Reivindica a aprovação para o aprovador (pending -> processing, um único UPDATE).
+
+    Só um aprovador vence, em qualquer processo. Aprovações antigas, sem registro
+    em approvals, retornam True (protegidas pelos UPDATEs condicionais de origem).
+    """
+    cursor = await _execute("""
+        UPDATE approvals SET status = 'processing', claimed_by = ?, claimed_at = CURRENT_TIMESTAMP
+        WHERE kind = ? AND reference_id = ? AND status = 'pending'
+    """, (approver_id, kind, reference_id))
+    if cursor.rowcount == 1:
+        return True
+    return await _fetchone("SELECT 1 FROM approvals WHERE kind = ? AND reference_id = ?",
+                           (kind, reference_id)) is None
+
+async def release_approval(kind: str, reference_id: int, approver_id: int) -> bool:
+    """Devolve a aprovação à fila (processing -> pending) se nada foi executado."""
+    cursor = await _execute("""
+        UPDATE approvals SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+        WHERE kind = ? AND reference_id = ? AND status = 'processing' AND claimed_by = ?
+    """, (kind, reference_id, approver_id))
+    return cursor.rowcount == 1
+
+async def finish_approval(kind: str, reference_id: int, status: str, decided_by: int = None) -> bool:
+    """Encerra uma aprovação (approved | rejected | failed). False se já encerrada
+    ou reivindicada por outro aprovador."""
+    async with transaction() as conn:
+        async with conn.execute("""
+            UPDATE approvals SET status = ?, decided_by = ?, decided_at = CURRENT_TIMESTAMP
+            WHERE kind = ? AND reference_id = ?
+              AND (status = 'pending' OR (status = 'processing' AND claimed_by IS ?))
+        """, (status, decided_by, kind, reference_id, decided_by)) as cursor:
+            finished = cursor.rowcount == 1
+        if finished and kind == "withdrawal" and status in ("rejected", "failed"):
+            await conn.execute("""
+                UPDATE withdrawals SET status = ?, processed_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'pending'
+            """, (status, reference_id))
+    return finished
+
+async def release_stale_approval_claims(older_than: float) -> int:
+    """Devolve à fila as reivindicações abandonadas (processo caiu antes do PIX)."""
+    cursor = await _execute("""
+        UPDATE approvals SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+        WHERE status = 'processing' AND claimed_at < datetime('now', ?)
+          AND NOT EXISTS (
+              SELECT 1 FROM payouts
+              WHERE payouts.kind = approvals.kind AND payouts.reference_id = CAST(approvals.reference_id AS TEXT)
+          )
+    """, (f"-{int(older_than)} seconds",))
+    return cursor.rowcount
+
+async def get_open_approvals() -> list:
+    """Retorna as aprovações em aberto (uma consulta, para recriar as views)."""
+    rows = await _fetchall(f"""
+        SELECT {', '.join(database.APPROVAL_COLUMNS)} FROM approvals WHERE status IN ('pending', 'processing') ORDER BY id
+    """)
+    return [database._approval_dict(row) for row in rows]
+
+# ════════════════════════════════════════════════════════════════════════════
+# EVENTOS PARA O BOT (OUTBOX DE NOTIFICAÇÕES)
+# ════════════════════════════════════════════════════════════════════════════
+
+async def claim_bot_events(consumer: str, limit: int = 50, lease: float = 60) -> list:
+    """Reserva os próximos eventos prontos por lease segundos (ver database.claim_bot_events)."""
+    now = time.time()
+    async with transaction() as conn:
+        async with conn.execute(f"""
+            UPDATE bot_events SET status = 'delivering', claimed_by = ?, attempts = attempts + 1, next_attempt_at = ?
+            WHERE id IN (
+                SELECT id FROM bot_events
+                WHERE status IN ('pending', 'delivering') AND next_attempt_at <= ? ORDER BY id LIMIT ?
+            )
+            RETURNING {', '.join(database.BOT_EVENT_COLUMNS)}
+        """, (consumer, now + lease, now, limit)) as cursor:
+            rows = await cursor.fetchall()
+    return sorted((database._bot_event_dict(row) for row in rows), key=lambda e: e['id'])
+
+async def finish_bot_events(consumer: str, delivered: list = (), retries: list = (), dead: list = ()):
+    """Registra o resultado de um lote de entregas em uma única transação (ver database.finish_bot_events)."""
+    async with transaction() as conn:
+        await conn.executemany("""
+            UPDATE bot_events SET status = 'delivered', last_error = NULL, delivered_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'delivering' AND claimed_by = ?
+        """, [(event_id, consumer) for event_id in delivered])
+        await conn.executemany("""
+            UPDATE bot_events SET status = 'pending', last_error = ?, next_attempt_at = ?
+            WHERE id = ? AND status = 'delivering' AND claimed_by = ?
+        """, [(error, next_attempt_at, event_id, consumer) for event_id, error, next_attempt_at in retries])
+        await conn.executemany("""
+            UPDATE bot_events SET status = 'dead', last_error = ?, delivered_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'delivering' AND claimed_by = ?
+        """, [(error, event_id, consumer) for event_id, error in dead])
+
+# ════════════════════════════════════════════════════════════════════════════
+# TRANSAÇÕES SEGURAS (ANTI-RACE CONDITIONS)
+# ════════════════════════════════════════════════════════════════════════════
+
+# Gravadas pelo mesmo escritor único do database.py (group commit), junto com
+# os créditos vindos do webhook; aqui apenas aguardamos o Future sem bloquear o loop.
+# Sem group commit, os locks das contas são adquiridos pelo caminho assíncrono
+# e a operação roda em uma thread auxiliar.
+
+async def _run_ledger(op, *args, accounts: tuple):
+    if database.LEDGER_GROUP_COMMIT:
+        return await asyncio.wrap_future(database.submit_ledger_operation(op, *args, accounts=accounts))
+    async with account_locks.acquire_async(*accounts):
+        return await asyncio.to_thread(database.run_ledger_operation, op, *args)
+
+async def safe_add_balance(user_id: int, amount: float, description: str = "Adição de saldo") -> bool:
+    """Adiciona saldo de forma atômica (escritor único do ledger)."""
+    try:
+        return await _run_ledger(database._op_add_balance, user_id, amount, description, accounts=(user_id,))
+    except Exception as e:
+        print(f"Erro ao adicionar saldo com segurança: {e}")
+        return False
+
+async def safe_remove_balance(user_id: int, amount: float, description: str = "Remoção de saldo") -> bool:
+    """Remove saldo de forma atômica, sem permitir saldo negativo."""
+    try:
+        return await _run_ledger(database._op_remove_balance, user_id, amount, description, accounts=(user_id,))
+    except Exception as e:
+        print(f"Erro ao remover saldo com segurança: {e}")
+        return False
+
+async def safe_transfer_balance(from_user_id: int, to_user_id: int, amount: float, description: str = "Transferência") -> bool:
+    """Transfere saldo entre dois usuários de forma atômica."""
+    try:
+        return await _run_ledger(database._op_transfer_balance, from_user_id, to_user_id, amount, description,
+                                 accounts=(from_user_id, to_user_id))
+    except Exception as e:
+        print(f"Erro ao transferir saldo com segurança: {e}")
+        return False
+
+async def settle_payment(payment_id: str, amount: float = None, ref: str = None, event_id: str = None) -> dict:
+    """Liquida um pagamento confirmado em uma única transação (ver database.settle_payment)."""
+    return await _run_ledger(database._op_settle_payment, payment_id, amount, ref, event_id, accounts=())
+
+async def safe_withdraw_balance(user_id: int, amount: float) -> bool:
+    """Processa um saque de forma atômica."""
+    try:
+        return await _run_ledger(database._op_withdraw_balance, user_id, amount, accounts=(user_id,))
+    except Exception as e:
+        print(f"Erro ao sacar com segurança: {e}")
+        return False
+
+# ════════════════════════════════════════════════════════════════════════════
+# FINANCEIROS
+# ════════════════════════════════════════════════════════════════════════════
+
+async def add_financeiro(user_id: int, added_by: int) -> bool:
+    """Adiciona um usuário como financeiro (pode aprovar saques/reembolsos)."""
+    try:
+        await _execute("""
+            INSERT OR REPLACE INTO financeiros (user_id, added_by, added_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        """, (user_id, added_by))
+        return True
+    except Exception as e:
+        print(f"Erro ao adicionar financeiro: {e}")
+        return False
+
+async def remove_financeiro(user_id: int) -> bool:
+    """Remove um usuário da lista de financeiros."""
+    try:
+        cursor = await _execute("DELETE FROM financeiros WHERE user_id = ?", (user_id,))
+        return cursor.rowcount > 0
+    except Exception as e:
+        print(f"Erro ao remover financeiro: {e}")
+        return False
+
+async def is_financeiro(user_id: int) -> bool:
+    """Verifica se um usuário é financeiro."""
+    try:
+        return await _fetchone("SELECT 1 FROM financeiros WHERE user_id = ?", (user_id,)) is not None
+    except Exception as e:
+        print(f"Erro ao verificar se é financeiro: {e}")
+        return False
+
+async def get_all_financeiros() -> list:
+    """Retorna lista de todos os financeiros."""
+    try:
+        rows = await _fetchall("SELECT user_id FROM financeiros ORDER BY added_at DESC")
+        return [row[0] for row in rows]
+    except Exception as e:
+        print(f"Erro ao buscar financeiros: {e}")
+        return []
+
+async def get_financeiro_info(user_id: int) -> dict:
+    """Retorna informações sobre um financeiro."""
+    try:
+        result = await _fetchone("""
+            SELECT user_id, role, permissions, added_by, added_at
+            FROM financeiros WHERE user_id = ?
+        """, (user_id,))
+        if result:
+            return {
+                "user_id": result[0],
+                "role": result[1],
+                "permissions": result[2],
+                "added_by": result[3],
+                "added_at": result[4]
+            }
+        return None
+    except Exception as e:
+        print(f"Erro ao buscar info do financeiro: {e}")
+        return None
@@ -36,19 +36,57 @@ intents = discord.Intents.all()
 intents.message_content = True
 intents.members = True
 intents.presences = True
-bot = commands.Bot(command_prefix="/", intents=intents)
+# Cabeçalhos de rate limit das respostas alimentam o agendador de saída
+from utils.outbound_scheduler import outbound_scheduler
+bot = commands.Bot(command_prefix="/", intents=intents, http_trace=outbound_scheduler.trace_config())
 
 # Variável global para webhook acessar bot
 import webhook_server
 webhook_server.bot_instance = bot
 webhook_server.logger = logger
 
-# Iniciar servidor webhook em thread separada
-import threading
-webhook_thread = threading.Thread(target=webhook_server.run_webhook, daemon=True)
-webhook_thread.start()
-logger.info("✅ Servidor webhook iniciado na porta 5000")
-print("🌐 Servidor webhook rodando em http://0.0.0.0:5000")
+# Servidor webhook: aiohttp no event loop do bot (padrão), Flask em thread separada
+# ou "service" (webhook_service.py em outro processo; o bot só entrega as notificações)
+WEBHOOK_SERVER = os.getenv("WEBHOOK_SERVER", "aiohttp").lower()
+if WEBHOOK_SERVER == "flask":
+    import threading
+    webhook_thread = threading.Thread(target=webhook_server.run_webhook, daemon=True)
+    webhook_thread.start()
+    logger.info(f"✅ Servidor webhook (Flask) iniciado na porta {webhook_server.WEBHOOK_PORT}")
+    print(f"🌐 Servidor webhook rodando em http://{webhook_server.WEBHOOK_HOST}:{webhook_server.WEBHOOK_PORT}")
+
+@bot.event
+async def setup_hook():
+    # Roda uma vez, antes de conectar (on_ready pode repetir em reconexões)
+    
+    # Despachante do outbox: entrega as notificações de pagamento gravadas junto
+    # com o crédito (por este processo ou pelo webhook_service.py) e os avisos
+    # dos saques/reembolsos concluídos pelo resumer de payouts
+    from utils.bot_events import bot_event_consumer
+    from ui_components import registrar_notificacoes_payout
+    webhook_server.registrar_notificacoes(bot_event_consumer)
+    registrar_notificacoes_payout(bot_event_consumer, bot)
+    await bot_event_consumer.start()
+    
+    # Recriar os botões das aprovações de saque/reembolso pendentes (DMs enviadas antes do reinício).
+    # Aqui e não em on_ready: numa reconexão as reivindicações em andamento seriam
+    # liberadas e as views registradas de novo
+    from ui_components import restaurar_aprovacoes
+    try:
+        restauradas = await restaurar_aprovacoes(bot)
+        logger.info(f"✅ {restauradas} aprovação(ões) pendente(s) restaurada(s)")
+        print(f"🔁 {restauradas} aprovação(ões) pendente(s) restaurada(s)")
+    except Exception as e:
+        logger.error(f"Erro ao restaurar aprovações: {e}")
+        print(f"❌ Erro ao restaurar aprovações: {e}")
+    
+    if WEBHOOK_SERVER == "service":
+        logger.info("✅ Webhook em processo separado (webhook_service.py)")
+        print("📬 Webhook em processo separado: entregando as notificações do outbox")
+    elif WEBHOOK_SERVER != "flask":
+        await webhook_server.start_aiohttp_webhook()
+        logger.info(f"✅ Servidor webhook (aiohttp) iniciado na porta {webhook_server.WEBHOOK_PORT}")
+        print(f"🌐 Servidor webhook rodando em http://{webhook_server.WEBHOOK_HOST}:{webhook_server.WEBHOOK_PORT}")
 
 @bot.event
 async def on_ready():
@@ -58,6 +96,10 @@ async def on_ready():
     # Atualizar heartbeat
     uptime_monitor.heartbeat()
     
+    # Retomar transferências PIX interrompidas (mesma chave de idempotência)
+    from misticpay_client import misticpay_client
+    misticpay_client.start_payout_resumer()
+    
     try:
         # Carregar cogs
         for filename in os.listdir("./cogs"):
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Migrações versionadas do banco de dados.
+
+A versão do schema fica em PRAGMA user_version. Cada migração tem um número
+e roda uma única vez, em ordem, dentro de uma transação junto com a
+atualização de user_version. Uma base já migrada custa uma única leitura
+de versão na inicialização.
+
+Migrações marcadas como "em lotes" (tabelas grandes) recebem a conexão e
+fazem seu trabalho em transações curtas via run_in_batches(), para não
+bloquear os escritores por muito tempo; elas precisam ser idempotentes,
+pois podem ser interrompidas no meio e executadas de novo.
+
+Para mudar o schema: adicione uma função com @migration(próxima_versão, ...)
+no fim deste arquivo. Nunca altere uma migração já publicada.
+
+Uso:
+    python migrations.py            # aplica migrações pendentes
+    python migrations.py status     # mostra versão atual e pendências
+    python migrations.py --backup   # faz backup antes de migrar
+"""
+import os
+import sys
+import time
+from collections import namedtuple
+
+import database
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+MIGRATION_BATCH_PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE", "0.01"))
+
+Migration = namedtuple("Migration", ["version", "description", "func", "batched"])
+
+MIGRATIONS = []
+
+def migration(version: int, description: str, batched: bool = False):
+    """Registra uma migração. As versões devem ser sequenciais."""
+    def decorator(func):
+        expected = len(MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"Migração {func.__name__} com versão {version}, esperado {expected}")
+        MIGRATIONS.append(Migration(version, description, func, batched))
+        return func
+    return decorator
+
+# ════════════════════════════════════════════════════════════════════════════
+# UTILITÁRIOS
+# ════════════════════════════════════════════════════════════════════════════
+
+def get_version(conn=None) -> int:
+    """Retorna a versão atual do schema (PRAGMA user_version)."""
+    conn = conn or database.get_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+def add_column_if_missing(cursor, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN apenas se a coluna ainda não existir."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def run_in_batches(table: str, set_clause: str, where_clause: str, params: tuple = (),
+                   batch_size: int = None) -> int:
+    """Executa um UPDATE em lotes de rowid, cada lote em uma transação curta.
+
+    Entre os lotes o lock de escrita é liberado, então o bot e o webhook
+    continuam gravando normalmente durante migrações longas.
+    Retorna o total de linhas alteradas.
+    """
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    total = 0
+    while True:
+        with database.transaction() as cursor:
+            cursor.execute(f"""
+                UPDATE {table} SET {set_clause}
+                WHERE rowid IN (SELECT rowid FROM {table} WHERE {where_clause} LIMIT ?)
+            """, (*params, batch_size))
+            changed = cursor.rowcount
+        total += changed
+        if changed < batch_size:
+            return total
+        time.sleep(MIGRATION_BATCH_PAUSE)
+
+# ════════════════════════════════════════════════════════════════════════════
+# EXECUÇÃO
+# ════════════════════════════════════════════════════════════════════════════
+
+def _apply(conn, mig: Migration) -> bool:
+    """Aplica uma migração. Retorna False se outro processo já a aplicou."""
+    if mig.batched:
+        if get_version(conn) >= mig.version:
+            return False
+        mig.func(conn)
+        with database.transaction() as cursor:
+            if get_version(conn) >= mig.version:
+                return False
+            cursor.execute(f"PRAGMA user_version = {mig.version}")
+        return True
+
+    with database.transaction() as cursor:
+        # Reler a versão já com o lock de escrita (bot e webhook podem migrar juntos)
+        if get_version(conn) >= mig.version:
+            return False
+        mig.func(cursor)
+        cursor.execute(f"PRAGMA user_version = {mig.version}")
+    return True
+
+def migrate(verbose: bool = False) -> int:
+    """Aplica as migrações pendentes e retorna a versão final do schema."""
+    conn = database.get_connection()
+    current = get_version(conn)
+    if current >= latest_version():
+        return current
+
+    for mig in MIGRATIONS:
+        if mig.version <= current:
+            continue
+        start = time.perf_counter()
+        if _apply(conn, mig) and verbose:
+            print(f"✅ Migração {mig.version:03d} aplicada: {mig.description} ({time.perf_counter() - start:.2f}s)")
+
+    # Atualiza as estatísticas do planejador depois de mudanças de schema
+    conn.execute("PRAGMA optimize")
+    return get_version(conn)
+
+# ════════════════════════════════════════════════════════════════════════════
+# MIGRAÇÕES
+# ════════════════════════════════════════════════════════════════════════════
+
+@migration(1, "schema inicial")
+def _001_schema_inicial(cursor):
+    # Tabela de usuários e saldos (cada pessoa tem seu próprio saldo)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            balance REAL DEFAULT 0,
+            pix_key TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tabela de transações
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """)
+
+    # Tabela de pagamentos MisticPay
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payments (
+            payment_id TEXT PRIMARY KEY,
+            receiver_id INTEGER NOT NULL,
+            payer_id INTEGER,
+            amount REAL NOT NULL,
+            status TEXT DEFAULT 'pending',
+            qr_code TEXT,
+            misticpay_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(receiver_id) REFERENCES users(user_id)
+        )
+    """)
+
+    # Tabela de saques
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS withdrawals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            status TEXT DEFAULT 'pending',
+            pix_key TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """)
+
+    # Tabela de permissões de cargos para cobrar
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cargo_permissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role_id INTEGER UNIQUE NOT NULL,
+            can_charge BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tabela de histórico detalhado de transações
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            gross_amount REAL,
+            description TEXT,
+            sender_id INTEGER,
+            sender_name TEXT,
+            misticpay_ref TEXT,
+            status TEXT DEFAULT 'completed',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """)
+
+    # Tabela de reembolsos
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS refunds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payment_id TEXT,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            reason TEXT,
+            misticpay_ref TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """)
+
+    # Tabela de financeiros (usuários com permissão para aprovar saques/reembolsos)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS financeiros (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            role TEXT DEFAULT 'financeiro',
+            permissions TEXT DEFAULT 'approve_withdrawals,approve_refunds',
+            added_by INTEGER,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(user_id) REFERENCES users(user_id)
+        )
+    """)
+
+@migration(2, "payments.channel_id (notificação no canal do /cobrar)")
+def _002_payments_channel_id(cursor):
+    # Antes: migrate_payments_channel.py
+    add_column_if_missing(cursor, "payments", "channel_id", "INTEGER")
+
+@migration(3, "payments.internal_id (ID numérico da MisticPay)")
+def _003_payments_internal_id(cursor):
+    # Antes: migrate_add_internal_id.py
+    add_column_if_missing(cursor, "payments", "internal_id", "TEXT")
+
+@migration(4, "refunds.approved_by / approved_at")
+def _004_refunds_aprovacao(cursor):
+    add_column_if_missing(cursor, "refunds", "approved_by", "INTEGER")
+    add_column_if_missing(cursor, "refunds", "approved_at", "TIMESTAMP")
+
+@migration(5, "índices das consultas quentes (histórico, pagamentos, reembolsos, saldos)")
+def _005_indices(cursor):
+    # get_transaction_history / get_transaction_history_detailed: WHERE user_id = ? ORDER BY created_at DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at)")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transaction_history_user_created
+        ON transaction_history (user_id, created_at)
+    """)
+    # get_payment_receiver: WHERE internal_id = ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payments_internal_id ON payments (internal_id)")
+    # admin_panel: filtro de status + ORDER BY created_at, estatísticas por dia
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payments_status_created ON payments (status, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payments_created ON payments (created_at)")
+    # get_pending_refunds e admin_panel
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_refunds_status_created ON refunds (status, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_refunds_created ON refunds (created_at)")
+    # get_all_users_with_balance e admin_panel: ORDER BY balance DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_balance ON users (balance)")
+
+@migration(6, "normalizar status 'pendente' de reembolsos antigos", batched=True)
+def _006_refunds_status_pendente(conn):
+    # Bases criadas pelo init_db.py antigo usavam 'pendente' como padrão
+    run_in_batches("refunds", "status = 'pending'", "status = 'pendente'")
+
+@migration(7, "webhook_events (idempotência por transactionId da MisticPay)")
+def _007_webhook_events(cursor):
+    # A chave primária é a restrição única que deduplica os webhooks
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS webhook_events (
+            event_id TEXT PRIMARY KEY,
+            payment_id TEXT,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+@migration(8, "webhook_inbox (caixa de entrada durável dos webhooks)")
+def _008_webhook_inbox(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS webhook_inbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            body TEXT NOT NULL,
+            headers TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL DEFAULT 0,
+            last_error TEXT,
+            locked_by TEXT,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP
+        )
+    """)
+    # Fila: próxima entrada pronta em ordem de chegada
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_webhook_inbox_fila
+        ON webhook_inbox(status, next_attempt_at, id)
+    """)
+
+@migration(9, "payouts (chaves de idempotência das transferências PIX)")
+def _009_payouts(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payouts (
+            idempotency_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            reference_id TEXT,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            pix_key TEXT,
+            debited_amount REAL,
+            status TEXT DEFAULT 'pending',
+            payout_id TEXT,
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # get_unfinished_payouts: WHERE status IN ('pending', 'unknown')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payouts_status ON payouts (status)")
+
+@migration(10, "approvals + approval_messages (aprovações pendentes sobrevivem a reinícios)")
+def _010_approvals(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS approvals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            reference_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            amount_final REAL,
+            pix_key TEXT,
+            reason TEXT,
+            payment_id TEXT,
+            approver_ids TEXT,
+            status TEXT DEFAULT 'pending',
+            decided_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            decided_at TIMESTAMP,
+            UNIQUE(kind, reference_id)
+        )
+    """)
+    # DMs enviadas aos aprovadores (para apagar/editar depois, mesmo após reinício)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS approval_messages (
+            message_id INTEGER PRIMARY KEY,
+            approval_id INTEGER NOT NULL,
+            recipient_id INTEGER,
+            channel_id INTEGER NOT NULL,
+            FOREIGN KEY(approval_id) REFERENCES approvals(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_approvals_status ON approvals (status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_approval_messages_approval ON approval_messages (approval_id)")
+
+@migration(11, "approvals.claimed_by / claimed_at (reivindicação atômica entre processos)")
+def _011_approvals_claim(cursor):
+    add_column_if_missing(cursor, "approvals", "claimed_by", "INTEGER")
+    add_column_if_missing(cursor, "approvals", "claimed_at", "TIMESTAMP")
+
+@migration(12, "bot_events (eventos do serviço de webhook para o bot, entre processos)")
+def _012_bot_events(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bot_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            claimed_by TEXT,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            delivered_at TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bot_events_fila ON bot_events (status, id)")
+
+@migration(13, "bot_events.next_attempt_at (outbox de notificações com backoff)")
+def _013_bot_events_backoff(cursor):
+    add_column_if_missing(cursor, "bot_events", "next_attempt_at", "REAL DEFAULT 0")
+    # claim_bot_events: WHERE status IN (...) AND next_attempt_at <= ? ORDER BY id
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_bot_events_pronto
+        ON bot_events (status, next_attempt_at, id)
+    """)
+
+@migration(14, "remove idx_bot_events_fila (substituído por idx_bot_events_pronto)")
+def _014_drop_bot_events_fila(cursor):
+    cursor.execute("DROP INDEX IF EXISTS idx_bot_events_fila")
+
+# ════════════════════════════════════════════════════════════════════════════
+# CLI
+# ════════════════════════════════════════════════════════════════════════════
+
+def _backup():
+    from utils.backup import BackupManager
+    if not os.path.exists(database.DB_PATH):
+        return
+    # Consolidar o WAL no arquivo principal antes de copiar
+    database.get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    BackupManager(database.DB_PATH).create_backup()
+
+def main(argv):
+    from dotenv import load_dotenv
+    load_dotenv()
+    database.DB_PATH = os.getenv("DATABASE_PATH", database.DB_PATH)
+
+    print(f"📁 Banco de dados: {database.DB_PATH}")
+    current = get_version()
+    pending = [m for m in MIGRATIONS if m.version > current]
+
+    if "status" in argv:
+        print(f"🔢 Versão atual: {current} (última: {latest_version()})")
+        for mig in pending:
+            print(f"⏳ Pendente {mig.version:03d}: {mig.description}")
+        if not pending:
+            print("✅ Banco atualizado")
+        return
+
+    if not pending:
+        print(f"✅ Banco já está na versão {current}. Nada a migrar.")
+        return
+
+    if "--backup" in argv:
+        _backup()
+
+    version = migrate(verbose=True)
+    print(f"✅ Banco migrado para a versão {version}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
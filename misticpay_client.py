@@ -0,0 +1,337 @@
+"""
+Cliente assíncrono da API MisticPay (aiohttp)
+
+Usado pelo bot (cogs e views) no lugar das chamadas bloqueantes do
+MisticPayHandler: uma única ClientSession com pool de conexões keep-alive
+(reaproveita DNS e TLS entre chamadas) e prazo máximo por chamada, sem
+travar o event loop.
+
+Resiliência: erros transitórios são repetidos com backoff exponencial com
+jitter e todas as chamadas passam pelo circuit breaker da MisticPay
+(utils/circuit_breaker.py), que falha na hora enquanto a API está fora.
+
+Transferências PIX (saques e reembolsos) usam payout(): a chave de
+idempotência é gravada em payouts antes da chamada HTTP e enviada no header
+Idempotency-Key; o resultado é registrado, e um novo clique ou um reinício
+do bot retoma o envio com a mesma chave em vez de transferir de novo.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import aiohttp
+
+from payment_handler import MisticPayHandler, MISTICPAY_API_URL
+from utils.circuit_breaker import CircuitOpenError, misticpay_breaker, sleep_backoff
+
+MISTICPAY_TIMEOUT = float(os.getenv("MISTICPAY_TIMEOUT", "10"))
+MISTICPAY_CONNECT_TIMEOUT = float(os.getenv("MISTICPAY_CONNECT_TIMEOUT", "3"))
+MISTICPAY_POOL_SIZE = int(os.getenv("MISTICPAY_POOL_SIZE", "20"))
+MISTICPAY_RETRY_ATTEMPTS = int(os.getenv("MISTICPAY_RETRY_ATTEMPTS", "3"))
+MISTICPAY_RETRY_BASE = float(os.getenv("MISTICPAY_RETRY_BASE", "0.5"))
+MISTICPAY_RETRY_MAX = float(os.getenv("MISTICPAY_RETRY_MAX", "8"))
+PAYOUT_RESUME_INTERVAL = float(os.getenv("PAYOUT_RESUME_INTERVAL", "300"))
+
+# Resultado de um payout cujo envio ainda não foi confirmado (não devolver saldo)
+PAYOUT_PROCESSING = "PROCESSANDO"
+
+def _retry_after(headers) -> float:
+    """Espera pedida no Retry-After de um 429 (segundos ou data HTTP), limitada a MISTICPAY_RETRY_MAX"""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return 1.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return 1.0
+    return min(max(seconds, 0.0), MISTICPAY_RETRY_MAX)
+
+class AsyncMisticPayClient:
+    def __init__(self, base_url: str = MISTICPAY_API_URL, timeout: float = MISTICPAY_TIMEOUT,
+                 connect_timeout: float = MISTICPAY_CONNECT_TIMEOUT, pool_size: int = MISTICPAY_POOL_SIZE):
+        """
+        Inicializa o cliente (a sessão só é aberta na primeira chamada)
+
+        Args:
+            base_url: URL base da API
+            timeout: Prazo total padrão de cada chamada (segundos)
+            connect_timeout: Prazo para abrir a conexão (segundos)
+            pool_size: Conexões simultâneas mantidas no pool
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_size = pool_size
+        self.breaker = misticpay_breaker
+        self.retry_attempts = MISTICPAY_RETRY_ATTEMPTS
+        self._session = None
+        self._loop = None
+        self._resumer = None
+        self.retries = 0
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                # Credenciais ausentes (None) não são enviadas, como no requests
+                headers={k: v for k, v in MisticPayHandler.build_headers().items() if v is not None},
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+            )
+            self._loop = loop
+        return self._session
+
+    async def _post(self, path: str, payload: Dict, deadline: float = None, headers: Dict = None) -> tuple:
+        """POST na API; retorna (status HTTP, corpo em JSON ou texto, headers da resposta)"""
+        session = await self._get_session()
+        timeout = aiohttp.ClientTimeout(total=deadline, connect=self.connect_timeout) if deadline else None
+        async with session.post(f"{self.base_url}{path}", json=payload, timeout=timeout,
+                                headers=headers) as response:
+            text = await response.text()
+            print(f"[MisticPay] Status Code: {response.status}")
+            print(f"[MisticPay] Response: {text[:500]}")
+            try:
+                body = await response.json(content_type=None)
+            except ValueError:
+                body = text
+            return response.status, body, response.headers
+
+    async def _request(self, path: str, payload: Dict, deadline: float = None,
+                       retry_ambiguous: bool = True, headers: Dict = None) -> tuple:
+        """
+        POST com retry e circuit breaker; retorna (status HTTP, corpo)
+
+        Sempre são repetidos: 429 (após o Retry-After da resposta) e falhas de
+        conexão (a requisição não chegou à API). Timeouts e 5xx só com retry_ambiguous=True, pois a API pode ter
+        executado a operação. Levanta CircuitOpenError (somente se nenhuma
+        requisição foi feita) com o circuito aberto e a última exceção se
+        todas as tentativas falharem.
+        """
+        last_error = None
+        last_response = None
+        for attempt in range(1, self.retry_attempts + 1):
+            if not self.breaker.allow():
+                if last_response is not None:
+                    return last_response
+                if last_error is not None:
+                    raise last_error
+                raise CircuitOpenError(f"MisticPay indisponível (circuito {self.breaker.state})")
+
+            retry_after = 0.0
+            try:
+                status, body, response_headers = await self._post(path, payload, deadline, headers)
+            except aiohttp.ClientConnectorError as e:
+                self.breaker.record_failure(f"conexão: {e}")
+                last_error = e
+                if attempt == self.retry_attempts:
+                    raise
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                self.breaker.record_failure(f"{type(e).__name__}: {e}")
+                last_error, last_response = e, None
+                if not retry_ambiguous or attempt == self.retry_attempts:
+                    raise
+            else:
+                last_error, last_response = None, (status, body)
+                if status >= 500:
+                    self.breaker.record_failure(f"HTTP {status}")
+                    if not retry_ambiguous or attempt == self.retry_attempts:
+                        return status, body
+                elif status == 429:
+                    # Limite de requisições: a API está de pé, só pedindo calma
+                    self.breaker.record_success()
+                    if attempt == self.retry_attempts:
+                        return status, body
+                    retry_after = _retry_after(response_headers)
+                else:
+                    self.breaker.record_success()
+                    return status, body
+
+            self.retries += 1
+            print(f"[MisticPay] 🔁 Tentativa {attempt + 1}/{self.retry_attempts} em {path}")
+            await sleep_backoff(attempt, MISTICPAY_RETRY_BASE, MISTICPAY_RETRY_MAX, minimum=retry_after)
+
+    async def create_payment_link(self, receiver_id: int, amount: float, description: str = "Cobrança",
+                                  channel_id: int = None, deadline: float = None) -> Optional[Dict]:
+        """Cria um link de pagamento MisticPay e retorna URL + QR Code (None em caso de erro)."""
+        payload = MisticPayHandler.build_payment_payload(receiver_id, amount, description)
+        print(f"[MisticPay] Enviando POST para: {self.base_url}/transactions/create")
+        try:
+            status, body = await self._request("/transactions/create", payload, deadline)
+        except CircuitOpenError as e:
+            print(f"[MisticPay] ⛔ {e}")
+            return None
+        except asyncio.TimeoutError:
+            print(f"[MisticPay] ⏱️ Timeout ao criar pagamento")
+            return None
+        except Exception as e:
+            print(f"[MisticPay] EXCEÇÃO: {e}")
+            return None
+
+        if status in (200, 201) and isinstance(body, dict):
+            return MisticPayHandler.parse_payment_response(body, amount, channel_id)
+        print(f"[MisticPay] ERRO: {status} - {body}")
+        return None
+
+    async def create_withdrawal(self, user_id: int, amount: float, pix_key: str,
+                                deadline: float = None) -> Optional[Dict]:
+        """Cria um saque/transferência PIX automática (None em caso de erro)."""
+        payload = MisticPayHandler.build_withdrawal_payload(user_id, amount, pix_key)
+        print(f"[MisticPay] Enviando POST para: {self.base_url}/transactions/withdraw")
+        try:
+            # Saque não é repetido em timeout/5xx: a transferência pode já ter sido feita
+            status, body = await self._request("/transactions/withdraw", payload, deadline, retry_ambiguous=False)
+        except CircuitOpenError as e:
+            print(f"[MisticPay] ⛔ {e}")
+            return None
+        except asyncio.TimeoutError:
+            print(f"[MisticPay] ⏱️ Timeout no saque")
+            return None
+        except Exception as e:
+            print(f"[MisticPay] EXCEÇÃO no saque: {e}")
+            return None
+
+        if status in (200, 201, 202) and isinstance(body, dict):  # 202 = Aceito (em processamento)
+            return MisticPayHandler.parse_withdrawal_response(body, amount)
+        print(f"[MisticPay] ERRO no saque: {status} - {body}")
+        return None
+
+    # ── Payouts idempotentes ──
+
+    async def payout(self, idempotency_key: str, kind: str, reference_id, user_id: int, amount: float,
+                     pix_key: str, debited_amount: float = None, deadline: float = None) -> Optional[Dict]:
+        """
+        Transferência PIX idempotente (saque ou reembolso)
+
+        Args:
+            idempotency_key: Chave estável derivada do registro de origem (ex: withdrawal-42)
+            kind: 'withdrawal' ou 'refund'
+            reference_id: ID do registro de origem
+            debited_amount: Valor debitado do usuário, devolvido se uma retomada falhar de vez
+
+        Returns:
+            Dict com payout_id, status e amount; status PROCESSANDO quando o
+            resultado ainda é incerto (o saldo NÃO deve ser devolvido).
+            None se a transferência foi recusada e nada foi enviado.
+        """
+        from database_async import begin_payout, claim_payout
+
+        # Gravado antes de qualquer chamada HTTP
+        record = await begin_payout(idempotency_key, kind, reference_id, user_id, amount, pix_key, debited_amount)
+        if record["status"] == "accepted":
+            print(f"[MisticPay] ♻️ Payout {idempotency_key} já enviado ({record['payout_id']})")
+            return {"payout_id": record["payout_id"], "status": "QUEUED", "amount": amount}
+        if record["status"] == "failed":
+            return None
+        if not await claim_payout(idempotency_key):
+            # Outro envio com a mesma chave está em andamento
+            return {"payout_id": idempotency_key, "status": PAYOUT_PROCESSING, "amount": amount}
+
+        status, result = await self._send_payout(record, deadline)
+        return None if status == "failed" else result
+
+    async def _send_payout(self, record: Dict, deadline: float = None, notify: bool = False) -> tuple:
+        """
+        Envia um payout já reservado e registra o resultado; retorna (status, resultado)
+
+        Com notify, um resultado final grava a notificação ao usuário no outbox
+        (payouts retomados: nenhum aprovador está esperando a resposta).
+        """
+        from database_async import record_payout_result
+
+        key = record["idempotency_key"]
+        amount = record["amount"]
+        payload = MisticPayHandler.build_withdrawal_payload(record["user_id"], amount, record["pix_key"])
+        processing = {"payout_id": key, "status": PAYOUT_PROCESSING, "amount": amount}
+        print(f"[MisticPay] Enviando payout {key} para: {self.base_url}/transactions/withdraw")
+
+        try:
+            # Com a chave de idempotência, timeouts e 5xx podem ser repetidos
+            status, body = await self._request("/transactions/withdraw", payload, deadline,
+                                               headers={"Idempotency-Key": key})
+        except CircuitOpenError as e:
+            print(f"[MisticPay] ⛔ {e}")
+            # Nada foi enviado agora; só é incerto se um envio anterior foi
+            outcome = "unknown" if record["status"] == "unknown" else "failed"
+            await record_payout_result(key, outcome, error=str(e), notify=notify)
+            return outcome, (processing if outcome == "unknown" else None)
+        except Exception as e:
+            print(f"[MisticPay] ⚠️ Resultado incerto do payout {key}: {type(e).__name__}: {e}")
+            await record_payout_result(key, "unknown", error=f"{type(e).__name__}: {e}", notify=notify)
+            return "unknown", processing
+
+        if status in (200, 201, 202) and isinstance(body, dict):
+            result = MisticPayHandler.parse_withdrawal_response(body, amount)
+            await record_payout_result(key, "accepted", payout_id=result["payout_id"], notify=notify)
+            return "accepted", result
+        if 400 <= status < 500 and status != 429:
+            print(f"[MisticPay] ERRO no payout {key}: {status} - {body}")
+            await record_payout_result(key, "failed", error=f"HTTP {status}: {str(body)[:200]}", notify=notify)
+            return "failed", None
+
+        await record_payout_result(key, "unknown", error=f"HTTP {status}", notify=notify)
+        return "unknown", processing
+
+    async def resume_payouts(self) -> int:
+        """
+        Retoma payouts pendentes ou com resultado incerto, sempre com a mesma chave
+
+        Se a API recusar de vez, o valor debitado (debited_amount) é devolvido ao usuário.
+        O resultado final encerra a aprovação e é avisado ao usuário pelo outbox
+        (EVENT_PAYOUT_RESULT). Retorna a quantidade de payouts retomados.
+        """
+        from database_async import claim_payout, credit_balance, get_unfinished_payouts
+
+        resumed = 0
+        for record in await get_unfinished_payouts():
+            if not await claim_payout(record["idempotency_key"]):
+                continue
+            resumed += 1
+            status, _ = await self._send_payout(record, notify=True)
+            print(f"[MisticPay] ♻️ Payout {record['idempotency_key']} retomado: {status}")
+            if status == "failed" and record["debited_amount"]:
+                await credit_balance(record["user_id"], record["debited_amount"],
+                                     "Saque não concluído - Saldo devolvido")
+        return resumed
+
+    def start_payout_resumer(self, interval: float = PAYOUT_RESUME_INTERVAL):
+        """Retoma os payouts na inicialização e depois periodicamente (idempotente)"""
+        if self._resumer is not None and not self._resumer.done():
+            return
+        self._resumer = asyncio.get_running_loop().create_task(self._resume_loop(interval))
+
+    async def _resume_loop(self, interval: float):
+        from database_async import reset_inflight_payouts
+
+        # Envios interrompidos por um reinício têm resultado incerto
+        interrupted = await reset_inflight_payouts()
+        if interrupted:
+            print(f"[MisticPay] ♻️ {interrupted} payout(s) interrompido(s) serão retomados")
+        while True:
+            try:
+                await self.resume_payouts()
+            except Exception as e:
+                print(f"[MisticPay] Erro ao retomar payouts: {e}")
+            await asyncio.sleep(interval)
+
+    def get_stats(self) -> dict:
+        """Retorna o estado do circuit breaker e o total de novas tentativas"""
+        return {**self.breaker.get_stats(), 'retries': self.retries}
+
+    async def close(self):
+        """Fecha a sessão e as conexões do pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+# Instância global
+misticpay_client = AsyncMisticPayClient()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Simulador local da API MisticPay (aiohttp)
+
+Substitui a MisticPay em testes offline e de carga: responde em
+/transactions/create e /transactions/withdraw no mesmo formato da API real,
+com latência, erros 5xx e 429 configuráveis, e depois de um atraso chama o
+webhook do bot (webhook_server) como se o cliente tivesse pago o PIX.
+
+Para apontar o bot para o simulador, defina no .env:
+    MISTICPAY_API_URL=http://localhost:8787/api
+
+Uso:
+    python misticpay_simulator.py [--port 8787] [--latency-ms 80] [--jitter-ms 40]
+                                  [--error-rate 0.02] [--rate-limit-rate 0.05]
+                                  [--pay-delay 3] [--pay-rate 1.0] [--duplicate-rate 0.1]
+                                  [--webhook-url http://localhost:5000/webhook]
+
+Rotas auxiliares:
+    GET  /stats                          contadores do simulador
+    POST /api/simulate/pay/<transactionId>  confirma uma cobrança na hora
+"""
+import argparse
+import asyncio
+import base64
+import io
+import itertools
+import os
+import random
+import time
+from typing import Dict
+
+import aiohttp
+import qrcode
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class MisticPaySimulator:
+    def __init__(self, latency_ms: float = 80, jitter_ms: float = 40, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, pay_delay: float = 3.0, pay_rate: float = 1.0,
+                 duplicate_rate: float = 0.0, webhook_url: str = None, render_qr: bool = False):
+        """
+        Inicializa o simulador
+
+        Args:
+            latency_ms: Latência média de cada resposta (ms)
+            jitter_ms: Variação aleatória somada à latência (0 a jitter_ms)
+            error_rate: Fração das requisições respondidas com HTTP 500/503
+            rate_limit_rate: Fração das requisições respondidas com HTTP 429
+            pay_delay: Segundos até o "cliente" pagar a cobrança (webhook COMPLETO)
+            pay_rate: Fração das cobranças que chegam a ser pagas
+            duplicate_rate: Fração dos webhooks entregues duas vezes (como a MisticPay faz)
+            webhook_url: URL do webhook do bot (None desativa os callbacks)
+            render_qr: Gera o QR Code real em base64 (mais lento; por padrão só o copia e cola)
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.pay_delay = pay_delay
+        self.pay_rate = pay_rate
+        self.duplicate_rate = duplicate_rate
+        self.webhook_url = webhook_url
+        self.render_qr = render_qr
+
+        self._internal_ids = itertools.count(500000)
+        self.charges: Dict[str, Dict] = {}
+        self.withdrawals: Dict[str, Dict] = {}  # Idempotency-Key -> resposta
+        self._callbacks = set()
+        self._session = None
+        self.stats = {
+            'charges': 0,
+            'withdrawals': 0,
+            'withdrawal_replays': 0,
+            'errors_injected': 0,
+            'rate_limited': 0,
+            'webhooks_sent': 0,
+            'webhooks_failed': 0
+        }
+        self._webhook_ms_total = 0.0
+
+    # ── Falhas e latência ──
+
+    async def _delay(self):
+        await asyncio.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+    def _injected_failure(self):
+        """Resposta de falha sorteada (429 ou 5xx), ou None para seguir normalmente"""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            return web.json_response({"message": "Too Many Requests"}, status=429,
+                                     headers={"Retry-After": "1"})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats['errors_injected'] += 1
+            return web.json_response({"message": "Erro interno simulado"},
+                                     status=random.choice((500, 503)))
+        return None
+
+    # ── Rotas da API ──
+
+    async def create_transaction(self, request: web.Request) -> web.Response:
+        await self._delay()
+        failure = self._injected_failure()
+        if failure is not None:
+            return failure
+
+        payload = await request.json()
+        transaction_id = str(payload.get("transactionId") or f"sim_{next(self._internal_ids)}")
+        amount = float(payload.get("amount") or 0)
+        if amount <= 0:
+            return web.json_response({"message": "amount inválido"}, status=400)
+
+        charge = self.charges.get(transaction_id)
+        if charge is None:
+            internal_id = next(self._internal_ids)
+            copy_paste = f"00020126580014br.gov.bcb.pix0136sim-{transaction_id}5204000053039865406{amount:.2f}6304SIMU"
+            charge = {
+                "id": internal_id,
+                "transactionId": transaction_id,
+                "value": amount,
+                "status": "PENDENTE",
+                "copyPaste": copy_paste,
+                "qrcodeUrl": None,
+                "qrCodeBase64": self._qr_base64(copy_paste) if self.render_qr else None,
+                "createdAt": time.time()
+            }
+            self.charges[transaction_id] = charge
+            self.stats['charges'] += 1
+            if self.webhook_url and random.random() < self.pay_rate:
+                self._schedule(self._pay_later(transaction_id, self.pay_delay))
+
+        return web.json_response({"message": "Transação criada", "data": charge}, status=201)
+
+    async def withdraw(self, request: web.Request) -> web.Response:
+        await self._delay()
+        failure = self._injected_failure()
+        if failure is not None:
+            return failure
+
+        key = request.headers.get("Idempotency-Key")
+        if key and key in self.withdrawals:
+            # Mesma chave: devolve o resultado original, sem nova transferência
+            self.stats['withdrawal_replays'] += 1
+            return web.json_response(self.withdrawals[key], status=202)
+
+        payload = await request.json()
+        if float(payload.get("amount") or 0) <= 0 or not payload.get("pixKey"):
+            return web.json_response({"message": "amount ou pixKey inválido"}, status=400)
+
+        body = {
+            "message": "Saque em processamento",
+            "data": {
+                "transactionId": f"wd_{next(self._internal_ids)}",
+                "status": "QUEUED",
+                "value": float(payload["amount"]),
+                "pixKey": payload["pixKey"]
+            }
+        }
+        if key:
+            self.withdrawals[key] = body
+        self.stats['withdrawals'] += 1
+        return web.json_response(body, status=202)
+
+    async def simulate_pay(self, request: web.Request) -> web.Response:
+        transaction_id = request.match_info["transaction_id"]
+        if transaction_id not in self.charges:
+            return web.json_response({"message": "Cobrança não encontrada"}, status=404)
+        status = await self._send_webhook(transaction_id)
+        return web.json_response({"transactionId": transaction_id, "webhook_status": status})
+
+    async def stats_route(self, request: web.Request) -> web.Response:
+        return web.json_response(self.get_stats())
+
+    def get_stats(self) -> dict:
+        """Retorna os contadores, a latência média dos webhooks e os callbacks pendentes"""
+        return {
+            **self.stats,
+            'webhook_latency_ms': round(self._webhook_ms_total / (self.stats['webhooks_sent'] or 1), 2),
+            'pending_callbacks': len(self._callbacks)
+        }
+
+    # ── Webhooks de pagamento ──
+
+    @staticmethod
+    def _qr_base64(data: str) -> str:
+        buffer = io.BytesIO()
+        qrcode.make(data).save(buffer, format="PNG")
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    def _schedule(self, coro):
+        task = asyncio.create_task(coro)
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _pay_later(self, transaction_id: str, delay: float):
+        await asyncio.sleep(delay)
+        await self._send_webhook(transaction_id)
+        if random.random() < self.duplicate_rate:
+            # Reentrega do mesmo evento: o bot deve creditar uma única vez
+            await asyncio.sleep(random.uniform(0, 1))
+            await self._send_webhook(transaction_id)
+
+    async def _send_webhook(self, transaction_id: str) -> int:
+        """Envia o webhook COMPLETO (formato atual da MisticPay); retorna o status HTTP ou 0"""
+        charge = self.charges[transaction_id]
+        charge["status"] = "COMPLETO"
+        payload = {
+            "transactionId": transaction_id,
+            "status": "COMPLETO",
+            "value": charge["value"],
+            "transactionType": "DEPOSITO",
+            "id": charge["id"]
+        }
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        start = time.perf_counter()
+        try:
+            async with self._session.post(self.webhook_url, json=payload) as response:
+                await response.read()
+                self.stats['webhooks_sent'] += 1
+                self._webhook_ms_total += (time.perf_counter() - start) * 1000
+                return response.status
+        except Exception as e:
+            self.stats['webhooks_failed'] += 1
+            print(f"⚠️ Webhook de {transaction_id} falhou: {e}")
+            return 0
+
+    async def _on_cleanup(self, app: web.Application):
+        for task in list(self._callbacks):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+
+    def make_app(self) -> web.Application:
+        """Aplicação aiohttp com as rotas da API simulada"""
+        app = web.Application()
+        app.router.add_post("/api/transactions/create", self.create_transaction)
+        app.router.add_post("/api/transactions/withdraw", self.withdraw)
+        app.router.add_post("/api/simulate/pay/{transaction_id}", self.simulate_pay)
+        app.router.add_get("/stats", self.stats_route)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local da API MisticPay")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("MISTICPAY_SIMULATOR_PORT", "8787")))
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--pay-delay", type=float, default=3.0)
+    parser.add_argument("--pay-rate", type=float, default=1.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--webhook-url", default="http://localhost:5000/webhook",
+                        help="URL do webhook do bot ('' desativa os callbacks)")
+    parser.add_argument("--render-qr", action="store_true")
+    args = parser.parse_args()
+
+    simulator = MisticPaySimulator(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        pay_delay=args.pay_delay,
+        pay_rate=args.pay_rate,
+        duplicate_rate=args.duplicate_rate,
+        webhook_url=args.webhook_url or None,
+        render_qr=args.render_qr
+    )
+    print(f"🧪 Simulador MisticPay em http://{args.host}:{args.port}/api")
+    print(f"   Latência {args.latency_ms:.0f}+{args.jitter_ms:.0f}ms | erros {args.error_rate:.0%} | "
+          f"429 {args.rate_limit_rate:.0%} | pagamento em {args.pay_delay}s -> {args.webhook_url or 'desativado'}")
+    web.run_app(simulator.make_app(), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
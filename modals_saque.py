@@ -3,7 +3,7 @@ Modals para saque de saldo
 """
 
 import discord
-from database import get_balance
+from database_async import get_balance
 
 
 class ModalConfirmarSaqueTudo(discord.ui.Modal, title="💸 Confirmar Saque de Todo Saldo"):
@@ -71,9 +71,11 @@ class ModalEscolherValorSaque(discord.ui.Modal, title="💰 Escolher Valor"):
                 )
                 return
             
-            if amount > self.balance:
+            # Saldo atual (o do menu pode ter mudado desde que o modal foi aberto)
+            saldo = await get_balance(self.user_id)
+            if amount > saldo:
                 await interaction.response.send_message(
-                    f"❌ Você tem apenas R$ {self.balance:.2f} disponível",
+                    f"❌ Você tem apenas R$ {saldo:.2f} disponível",
                     ephemeral=True
                 )
                 return
@@ -1,7 +1,5 @@
 import os
 import requests
-import qrcode
-import io
 import base64
 from typing import Optional, Dict
 from dotenv import load_dotenv
@@ -10,11 +8,93 @@ load_dotenv()
 
 MISTICPAY_CLIENT_ID = os.getenv("MISTICPAY_CLIENT_ID")
 MISTICPAY_CLIENT_SECRET = os.getenv("MISTICPAY_CLIENT_SECRET")
-MISTICPAY_API_URL = "https://api.misticpay.com/api"
+# Sobrescreva para apontar para o simulador local (misticpay_simulator.py)
+MISTICPAY_API_URL = os.getenv("MISTICPAY_API_URL", "https://api.misticpay.com/api").rstrip("/")
 
 class MisticPayHandler:
     """Gerenciador de pagamentos com MisticPay."""
     
+    # ── Montagem e leitura das requisições (compartilhadas com misticpay_client) ──
+    
+    @staticmethod
+    def build_headers() -> Dict:
+        """Headers de autenticação da API MisticPay."""
+        return {
+            "ci": MISTICPAY_CLIENT_ID,
+            "cs": MISTICPAY_CLIENT_SECRET,
+            "Content-Type": "application/json"
+        }
+    
+    @staticmethod
+    def build_payment_payload(receiver_id: int, amount: float, description: str) -> Dict:
+        """Payload de /transactions/create."""
+        # ID de transação único e ordenado por tempo (várias cobranças por segundo)
+        from utils.id_generator import id_generator
+        
+        return {
+            "amount": amount,
+            "payerName": f"Cliente {receiver_id}",
+            "payerDocument": "00000000000",  # CPF genérico
+            "transactionId": id_generator.next_payment_id(),
+            "description": description
+        }
+    
+    @staticmethod
+    def parse_payment_response(data: Dict, amount: float, channel_id: int = None) -> Dict:
+        """Converte a resposta de /transactions/create no resultado da cobrança."""
+        transaction_data = data.get("data", {})
+        
+        # MisticPay retorna tanto o transactionId customizado quanto o ID interno
+        payment_id = transaction_data.get("transactionId")  # ID customizado (discord_...)
+        internal_id = transaction_data.get("id")  # ID interno da MisticPay (505520)
+        
+        print(f"[MisticPay] ✅ Pagamento criado - ID customizado: {payment_id} | ID interno: {internal_id}")
+        
+        return {
+            "payment_id": payment_id,
+            "internal_id": internal_id,  # Adicionar ID interno
+            "url": transaction_data.get("copyPaste"),  # Código PIX copia e cola
+            "qr_code_url": transaction_data.get("qrcodeUrl"),
+            "qr_code_base64": transaction_data.get("qrCodeBase64"),
+            "channel_id": channel_id,
+            "amount": amount
+        }
+    
+    @staticmethod
+    def pix_key_type(pix_key: str) -> str:
+        """Detecta o tipo da chave PIX."""
+        if "@" in pix_key:
+            return "EMAIL"
+        elif len(pix_key) == 11 and pix_key.isdigit():
+            return "CPF"
+        elif len(pix_key) == 14 and pix_key.isdigit():
+            return "CNPJ"
+        elif pix_key.startswith("+"):
+            return "TELEFONE"
+        return "CHAVE_ALEATORIA"  # Default
+    
+    @staticmethod
+    def build_withdrawal_payload(user_id: int, amount: float, pix_key: str) -> Dict:
+        """Payload de /transactions/withdraw."""
+        return {
+            "amount": amount,
+            "pixKey": pix_key,
+            "pixKeyType": MisticPayHandler.pix_key_type(pix_key),
+            "description": f"Saque Discord - Usuário {user_id}"
+        }
+    
+    @staticmethod
+    def parse_withdrawal_response(data: Dict, amount: float) -> Dict:
+        """Converte a resposta de /transactions/withdraw no resultado do saque."""
+        withdrawal_data = data.get("data", {})
+        return {
+            "payout_id": withdrawal_data.get("transactionId"),
+            "status": withdrawal_data.get("status", "QUEUED"),
+            "amount": amount
+        }
+    
+    # ── Chamadas síncronas (scripts e testes; o bot usa misticpay_client) ──
+    
     @staticmethod
     def create_payment_link(receiver_id: int, amount: float, description: str = "Cobrança", channel_id: int = None) -> Optional[Dict]:
         """Cria um link de pagamento MisticPay e retorna URL + QR Code."""
@@ -22,23 +102,8 @@ class MisticPayHandler:
             print(f"[MisticPay] Iniciando criação de pagamento...")
             print(f"[MisticPay] Client ID: {MISTICPAY_CLIENT_ID}")
             
-            headers = {
-                "ci": MISTICPAY_CLIENT_ID,
-                "cs": MISTICPAY_CLIENT_SECRET,
-                "Content-Type": "application/json"
-            }
-            
-            # Gerar ID de transação único
-            import time
-            transaction_id = f"discord_{receiver_id}_{int(time.time())}"
-            
-            payload = {
-                "amount": amount,
-                "payerName": f"Cliente {receiver_id}",
-                "payerDocument": "00000000000",  # CPF genérico
-                "transactionId": transaction_id,
-                "description": description
-            }
+            headers = MisticPayHandler.build_headers()
+            payload = MisticPayHandler.build_payment_payload(receiver_id, amount, description)
             
             print(f"[MisticPay] Enviando POST para: {MISTICPAY_API_URL}/transactions/create")
             print(f"[MisticPay] Payload: {payload}")
@@ -54,27 +119,7 @@ class MisticPayHandler:
             print(f"[MisticPay] Response: {response.text[:500]}")
             
             if response.status_code == 200 or response.status_code == 201:
-                data = response.json()
-                transaction_data = data.get("data", {})
-                
-                # MisticPay retorna tanto o transactionId customizado quanto o ID interno
-                payment_id = transaction_data.get("transactionId")  # ID customizado (discord_...)
-                internal_id = transaction_data.get("id")  # ID interno da MisticPay (505520)
-                qr_code_base64 = transaction_data.get("qrCodeBase64")
-                qr_code_url = transaction_data.get("qrcodeUrl")
-                copy_paste = transaction_data.get("copyPaste")
-                
-                print(f"[MisticPay] ✅ Pagamento criado - ID customizado: {payment_id} | ID interno: {internal_id}")
-                
-                return {
-                    "payment_id": payment_id,
-                    "internal_id": internal_id,  # Adicionar ID interno
-                    "url": copy_paste,  # Código PIX copia e cola
-                    "qr_code_url": qr_code_url,
-                    "qr_code_base64": qr_code_base64,
-                    "channel_id": channel_id,
-                    "amount": amount
-                }
+                return MisticPayHandler.parse_payment_response(response.json(), amount, channel_id)
             else:
                 print(f"[MisticPay] ERRO: {response.status_code} - {response.text}")
                 return None
@@ -87,29 +132,56 @@ class MisticPayHandler:
     
     @staticmethod
     def generate_qr_code(data: str) -> str:
-        """Gera QR code em formato base64."""
+        """Gera QR code em formato base64 (síncrono; o bot usa utils.qr_cache)."""
         try:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(data)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
+            from utils.qr_cache import render_png
             
             # Converter para base64
-            buffer = io.BytesIO()
-            img.save(buffer, format="PNG")
-            img_str = base64.b64encode(buffer.getvalue()).decode()
+            img_str = base64.b64encode(render_png(data)).decode()
             
             return img_str
         except Exception as e:
             print(f"Erro ao gerar QR code: {e}")
             return None
     
+    @staticmethod
+    def parse_webhook(request_body: Dict) -> Optional[Dict]:
+        """Extrai payment_id, event_id (chave de idempotência), valor e referência
+        de um webhook de pagamento confirmado.
+
+        Não consulta o banco: o vendedor é resolvido por database.settle_payment,
+        na mesma transação que credita o saldo. Retorna None se não for um
+        pagamento confirmado.
+        """
+        if not request_body:
+            return None
+
+        # Novo formato: dados diretos no root
+        if "event" not in request_body and "transactionId" in request_body:
+            if str(request_body.get("status", "")).upper() != "COMPLETO":
+                return None
+            payment_id = str(request_body.get("transactionId"))
+            return {
+                "payment_id": payment_id,
+                "event_id": payment_id,
+                "amount": float(request_body.get("value") or 0),
+                "ref": payment_id
+            }
+
+        # Formato antigo: com "event" e "data"
+        if request_body.get("event") in ["transaction.paid", "charge.paid", "payment.approved", "transaction.approved"]:
+            data_field = request_body.get("data") or {}
+            payment_id = data_field.get("transactionId") or data_field.get("id") or data_field.get("payment_id")
+            if not payment_id:
+                return None
+            return {
+                "payment_id": str(payment_id),
+                "event_id": str(data_field.get("transactionId") or payment_id),
+                "amount": float(data_field.get("amount") or 0),
+                "ref": str(data_field.get("id") or payment_id)
+            }
+        return None
+
     @staticmethod
     def verify_webhook(request_body: Dict) -> Optional[Dict]:
         """Verifica e processa webhook de pagamento MisticPay.
@@ -239,29 +311,8 @@ class MisticPayHandler:
             print(f"[MisticPay] Iniciando saque...")
             print(f"[MisticPay] Client ID: {MISTICPAY_CLIENT_ID}")
             
-            headers = {
-                "ci": MISTICPAY_CLIENT_ID,
-                "cs": MISTICPAY_CLIENT_SECRET,
-                "Content-Type": "application/json"
-            }
-            
-            # Detectar tipo de chave PIX
-            pix_key_type = "CHAVE_ALEATORIA"  # Default
-            if "@" in pix_key:
-                pix_key_type = "EMAIL"
-            elif len(pix_key) == 11 and pix_key.isdigit():
-                pix_key_type = "CPF"
-            elif len(pix_key) == 14 and pix_key.isdigit():
-                pix_key_type = "CNPJ"
-            elif pix_key.startswith("+"):
-                pix_key_type = "TELEFONE"
-            
-            payload = {
-                "amount": amount,
-                "pixKey": pix_key,
-                "pixKeyType": pix_key_type,
-                "description": f"Saque Discord - Usuário {user_id}"
-            }
+            headers = MisticPayHandler.build_headers()
+            payload = MisticPayHandler.build_withdrawal_payload(user_id, amount, pix_key)
             
             print(f"[MisticPay] Enviando POST para: {MISTICPAY_API_URL}/transactions/withdraw")
             print(f"[MisticPay] Payload: {payload}")
@@ -277,14 +328,7 @@ class MisticPayHandler:
             print(f"[MisticPay] Response: {response.text[:500]}")
             
             if response.status_code in [200, 201, 202]:  # 202 = Aceito (em processamento)
-                data = response.json()
-                withdrawal_data = data.get("data", {})
-                
-                return {
-                    "payout_id": withdrawal_data.get("transactionId"),
-                    "status": withdrawal_data.get("status", "QUEUED"),
-                    "amount": amount
-                }
+                return MisticPayHandler.parse_withdrawal_response(response.json(), amount)
             else:
                 print(f"[MisticPay] ERRO no saque: {response.status_code} - {response.text}")
                 return None
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Administração da caixa de entrada de webhooks (dead-letter).
+
+Webhooks que esgotaram as tentativas ficam com status 'dead' em
+webhook_inbox. Depois de corrigir a causa (ex.: cobrança não registrada),
+devolva-os à fila; o servidor de webhook os processa de novo. A liquidação
+é idempotente, então reenviar um webhook já creditado não credita duas vezes.
+
+As notificações do bot (outbox bot_events) têm a mesma dead-letter: o
+subcomando "eventos" faz o mesmo para elas.
+
+Uso:
+    python replay_webhooks.py                       # mostra a fila e lista dead-letters
+    python replay_webhooks.py replay 12 15          # reenvia as entradas 12 e 15
+    python replay_webhooks.py replay --all          # reenvia todas as dead-letters
+    python replay_webhooks.py eventos               # mostra o outbox de notificações
+    python replay_webhooks.py eventos replay --all  # reenvia notificações em dead-letter
+"""
+import os
+import sys
+
+import database
+
+def main(argv):
+    from dotenv import load_dotenv
+    load_dotenv()
+    database.DB_PATH = os.getenv("DATABASE_PATH", database.DB_PATH)
+    database.init_db()
+
+    from utils.webhook_inbox import webhook_inbox
+
+    print(f"📁 Banco de dados: {database.DB_PATH}")
+
+    if argv and argv[0] == "eventos":
+        eventos(argv[1:])
+        return
+
+    if argv and argv[0] == "replay":
+        ids = [int(arg) for arg in argv[1:] if arg != "--all"]
+        if not ids and "--all" not in argv:
+            print("❌ Informe os IDs ou --all")
+            sys.exit(1)
+        count = webhook_inbox.replay_dead(ids or None)
+        print(f"🔁 {count} webhook(s) devolvido(s) à fila")
+        return
+
+    stats = webhook_inbox.get_stats()
+    print("📥 Caixa de entrada: " + " | ".join(f"{status}: {count}" for status, count in stats.items()))
+
+    dead = webhook_inbox.list_dead()
+    if not dead:
+        print("✅ Nenhum webhook em dead-letter")
+        return
+
+    print(f"\n☠️ Dead-letters ({len(dead)}):")
+    for entry_id, attempts, last_error, received_at, body in dead:
+        print(f"  #{entry_id} | {received_at} | {attempts} tentativa(s) | {last_error}")
+        print(f"      {body[:120]}")
+
+def eventos(argv):
+    """Outbox de notificações do bot (bot_events)"""
+    if argv and argv[0] == "replay":
+        ids = [int(arg) for arg in argv[1:] if arg != "--all"]
+        if not ids and "--all" not in argv:
+            print("❌ Informe os IDs ou --all")
+            sys.exit(1)
+        count = database.replay_dead_bot_events(ids or None)
+        print(f"🔁 {count} notificação(ões) devolvida(s) ao outbox")
+        return
+
+    stats = database.get_bot_event_stats()
+    print("📬 Outbox do bot: " + " | ".join(f"{status}: {count}" for status, count in stats.items()))
+
+    dead = database.list_dead_bot_events()
+    if not dead:
+        print("✅ Nenhuma notificação em dead-letter")
+        return
+
+    print(f"\n☠️ Dead-letters ({len(dead)}):")
+    for event_id, kind, attempts, last_error, created_at, payload in dead:
+        print(f"  #{event_id} | {kind} | {created_at} | {attempts} tentativa(s) | {last_error}")
+        print(f"      {payload[:120]}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
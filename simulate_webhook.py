@@ -9,6 +9,10 @@ Funcionalidade:
 2. Envia dados para o webhook local
 3. Valida que notificação foi processada
 
+O pagamento precisa estar registrado no banco (criado com /cobrar), senão o
+webhook fica na fila de retentativas. Para o fluxo completo sem a MisticPay
+real (cobrança + webhook automático), use misticpay_simulator.py.
+
 Uso:
     python simulate_webhook.py [payment_id] [receiver_id] [channel_id] [amount]
     
@@ -50,25 +54,19 @@ def print_header(msg):
     print(f"{Colors.PURPLE}{'='*50}{Colors.END}\n")
 
 def create_webhook_payload(payment_id, receiver_id, channel_id, amount):
-    """Cria um payload simulado de webhook do MisticPay."""
+    """Cria um payload simulado de webhook do MisticPay.
+    
+    Usa o formato atual da MisticPay (dados no root, status COMPLETO), o mesmo
+    lido por MisticPayHandler.parse_webhook. O vendedor e o canal não vão no
+    webhook: são resolvidos pela cobrança registrada com este payment_id.
+    """
     
     return {
-        "id": f"evt_{int(time.time())}",
-        "type": "charge.paid",
-        "data": {
-            "id": payment_id,
-            "status": "paid",
-            "amount": amount,
-            "currency": "BRL",
-            "pix_dict_key": "00000000-0000-0000-0000-000000000000",
-            "metadata": {
-                "receiver_id": receiver_id,
-                "channel_id": channel_id,
-                "type": "discord_payment"
-            },
-            "created_at": datetime.now().isoformat(),
-            "paid_at": datetime.now().isoformat()
-        }
+        "transactionId": payment_id,
+        "status": "COMPLETO",
+        "value": amount,
+        "transactionType": "DEPOSITO",
+        "createdAt": datetime.now().isoformat()
     }
 
 def send_webhook(webhook_url, payload):
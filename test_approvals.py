@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Script de Teste - Reivindicação atômica das aprovações (saques e reembolsos)
+
+claim_approval é um UPDATE condicional: com vários aprovadores clicando ao
+mesmo tempo, só um reivindica, e só ele encerra ou libera a aprovação.
+
+Uso:
+    python test_approvals.py
+"""
+
+import asyncio
+
+import database
+import database_async
+from cogs.payment import PaymentCog, dm_fanout
+from testing_utils import banco_temporario, em_paralelo, executar
+
+def test_claim_concorrente_tem_um_vencedor():
+    """8 aprovadores clicando ao mesmo tempo (threads): só um reivindica o saque."""
+    with banco_temporario():
+        database.create_approval("withdrawal", 1, 30, 50.0, "pix@teste", amount_final=49.5)
+
+        aprovadores = [100 + i for i in range(8)]
+        resultados = em_paralelo(lambda a: database.claim_approval("withdrawal", 1, a), aprovadores)
+
+        assert resultados.count(True) == 1, resultados
+        # Só o vencedor encerra a aprovação
+        vencedor = aprovadores[resultados.index(True)]
+        perdedor = aprovadores[resultados.index(False)]
+        assert database.finish_approval("withdrawal", 1, "approved", perdedor) is False
+        assert database.finish_approval("withdrawal", 1, "approved", vencedor) is True
+
+def test_claim_concorrente_async_tem_um_vencedor():
+    """8 cliques no event loop (banco assíncrono): só um reivindica o reembolso."""
+    async def cenario():
+        await database_async.create_approval("refund", 2, 31, 20.0, "pix@teste", reason="teste")
+        resultados = await asyncio.gather(*(
+            database_async.claim_approval("refund", 2, 200 + i) for i in range(8)
+        ))
+        assert resultados.count(True) == 1, resultados
+
+    with banco_temporario():
+        try:
+            asyncio.run(cenario())
+        finally:
+            asyncio.run(database_async.close())
+
+def test_release_devolve_a_fila():
+    """Aprovação liberada pelo dono volta a ser reivindicável por outro aprovador."""
+    with banco_temporario():
+        database.create_approval("refund", 3, 32, 10.0, "pix@teste", reason="teste")
+
+        assert database.claim_approval("refund", 3, 300) is True
+        assert database.release_approval("refund", 3, 301) is False
+        assert database.release_approval("refund", 3, 300) is True
+        assert database.claim_approval("refund", 3, 301) is True
+
+def test_falha_no_envio_encerra_a_aprovacao():
+    """DMs de aprovação falhando: a aprovação é encerrada e o saldo volta uma vez só."""
+    async def falhar(*args, **kwargs):
+        raise RuntimeError("Discord fora do ar")
+
+    async def cenario():
+        from ui_components import AprovacaoSaqueView
+
+        await database_async.credit_balance(33, 50.0)
+        await database_async.debit_balance(33, 50.0)
+        withdrawal_id = await database_async.create_withdrawal_request(33, 45.0, "pix@teste")
+        approval_id = await database_async.create_approval("withdrawal", withdrawal_id, 33, 50.0, "pix@teste",
+                                                           amount_final=45.0)
+        view = AprovacaoSaqueView(33, 50.0, 45.0, "pix@teste", None, withdrawal_id=withdrawal_id)
+
+        enviado = await PaymentCog(None)._enviar_aprovacao_saque(33, 50.0, approval_id, None, view)
+
+        assert enviado is False
+        # Nada para restaurar_aprovacoes recriar no próximo início
+        assert await database_async.get_open_approvals() == []
+        assert view.processado is True
+        assert await database_async.get_balance(33) == 50.0
+        # Um clique atrasado não reivindica nem devolve de novo
+        assert await database_async.claim_approval("withdrawal", withdrawal_id, 400) is False
+        assert await view._encerrar("failed") is False
+        return withdrawal_id
+
+    with banco_temporario():
+        envio_original = dm_fanout.send
+        dm_fanout.send = falhar
+        try:
+            withdrawal_id = asyncio.run(cenario())
+        finally:
+            dm_fanout.send = envio_original
+            asyncio.run(database_async.close())
+        status = database.get_connection().execute(
+            "SELECT status FROM withdrawals WHERE id = ?", (withdrawal_id,)).fetchone()[0]
+        assert status == "failed", status
+
+if __name__ == "__main__":
+    exit(executar("TESTE DE APROVAÇÕES", (
+        test_claim_concorrente_tem_um_vencedor,
+        test_claim_concorrente_async_tem_um_vencedor,
+        test_release_devolve_a_fila,
+        test_falha_no_envio_encerra_a_aprovacao,
+    )))
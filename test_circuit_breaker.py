@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Script de Teste - Circuit breaker e retry das chamadas à MisticPay
+
+Percorre os estados do circuito (closed -> open -> half-open -> closed) com
+tempos curtos e confere que um 429 espera o Retry-After da API antes de
+repetir. Nenhuma chamada HTTP é feita: _post é substituído por respostas fixas.
+
+Uso:
+    python test_circuit_breaker.py
+"""
+
+import asyncio
+import time
+
+from misticpay_client import AsyncMisticPayClient
+from testing_utils import executar
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+def test_circuito_abre_testa_e_fecha():
+    """closed -> open no limite de falhas -> half-open após o timeout -> closed com sucesso."""
+    breaker = CircuitBreaker("teste", failure_threshold=3, recovery_timeout=0.05)
+
+    for _ in range(2):
+        breaker.record_failure("erro")
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure("erro")
+    assert breaker.state == OPEN and breaker.trips == 1
+    assert breaker.allow() is False and breaker.rejected == 1
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is True
+    # Só uma chamada de teste por vez
+    assert breaker.allow() is False
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.get_stats()['consecutive_failures'] == 0
+
+def test_teste_falho_reabre_o_circuito():
+    """Falha na chamada de teste (half-open) reabre o circuito e conta outra abertura."""
+    breaker = CircuitBreaker("teste", failure_threshold=1, recovery_timeout=0.05)
+
+    breaker.record_failure("erro")
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    breaker.record_failure("erro no teste")
+    assert breaker.state == OPEN and breaker.trips == 2
+    assert breaker.get_stats()['last_failure'] == "erro no teste"
+
+def test_429_respeita_retry_after():
+    """HTTP 429 com Retry-After: a nova tentativa espera o tempo pedido pela API."""
+    cliente = AsyncMisticPayClient()
+    cliente.breaker = CircuitBreaker("teste")
+    respostas = [(429, {"message": "Too Many Requests"}, {"Retry-After": "0.3"}), (200, {"ok": True}, {})]
+    chamadas = []
+
+    async def post(*args, **kwargs):
+        chamadas.append(time.monotonic())
+        return respostas.pop(0)
+
+    cliente._post = post
+    status, body = asyncio.run(cliente._request("/transactions/create", {}))
+
+    assert status == 200 and body == {"ok": True}
+    assert chamadas[1] - chamadas[0] >= 0.3
+    # 429 não conta como falha: a API está de pé
+    assert cliente.breaker.total_failures == 0 and cliente.retries == 1
+
+if __name__ == "__main__":
+    exit(executar("TESTE DO CIRCUIT BREAKER (MisticPay)", (
+        test_circuito_abre_testa_e_fecha,
+        test_teste_falho_reabre_o_circuito,
+        test_429_respeita_retry_after,
+    )))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Script de Teste - Débito e crédito atômicos do saldo
+
+O débito é um UPDATE condicional (balance >= valor): débitos simultâneos
+nunca deixam o saldo negativo, sem depender de lock global.
+
+Uso:
+    python test_ledger.py
+"""
+
+import database
+from testing_utils import banco_temporario, em_paralelo, executar
+
+def test_debito_concorrente_nao_deixa_saldo_negativo():
+    """20 débitos de R$ 10 simultâneos sobre R$ 100: exatamente 10 passam."""
+    with banco_temporario():
+        database.credit_balance(1, 100.0)
+
+        resultados = em_paralelo(lambda _: database.debit_balance(1, 10.0), range(20))
+
+        assert resultados.count(True) == 10, resultados
+        assert database.get_balance(1) == 0
+
+def test_debito_acima_do_saldo_e_recusado():
+    """Um débito maior que o saldo falha sem alterar nada."""
+    with banco_temporario():
+        database.credit_balance(2, 5.0)
+
+        assert database.debit_balance(2, 5.01) is False
+        assert database.get_balance(2) == 5.0
+
+if __name__ == "__main__":
+    exit(executar("TESTE DO LEDGER (débito/crédito atômicos)", (
+        test_debito_concorrente_nao_deixa_saldo_negativo,
+        test_debito_acima_do_saldo_e_recusado,
+    )))
@@ -218,7 +218,7 @@ def check_webhook_server():
             content = f.read()
         
         checks = {
-            "get_payment_channel": "Função para buscar channel_id",
+            "settle_payment": "Liquidação do pagamento (retorna channel_id)",
             "notificar_pagamento": "Função de notificação",
             "EMOJI_SUCESSO": "Variável de emoji",
             "bot_instance.get_channel": "Envio em canal",
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Script de Teste - Agendador de saída das mensagens do bot
+
+O Discord é simulado por canais falsos (nenhuma chamada HTTP): confere a
+ordem por prioridade, a pausa de uma rota após um 429 e o agrupamento das
+notificações de um canal saturado sem alterar os embeds e views originais.
+
+Uso:
+    python test_outbound_scheduler.py
+"""
+
+import asyncio
+import time
+
+import discord
+
+from testing_utils import executar
+from utils.outbound_scheduler import PRIORITY_APPROVAL, PRIORITY_NOTIFICATION, OutboundScheduler
+
+class _Canal:
+    """Canal falso: registra os envios (ou falha, com falhar=True)."""
+
+    def __init__(self, channel_id: int, falhar: bool = False):
+        self.id = channel_id
+        self.falhar = falhar
+        self.envios = []
+
+    async def send(self, **kwargs):
+        if self.falhar:
+            raise ConnectionResetError("canal indisponível")
+        self.envios.append(kwargs)
+        return kwargs
+
+def _notificacao(titulo: str) -> dict:
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(label="Reembolsar", row=1))
+    return {"embed": discord.Embed(title=titulo), "view": view}
+
+def test_aprovacao_passa_na_frente():
+    """Com o agendador ocupado, uma aprovação enfileirada depois sai antes da notificação."""
+    async def cenario():
+        agendador = OutboundScheduler(max_concurrency=1)
+        ordem, liberar = [], asyncio.Event()
+
+        async def bloqueio():
+            await liberar.wait()
+            ordem.append("bloqueio")
+
+        async def registrar(nome):
+            ordem.append(nome)
+
+        primeiro = asyncio.ensure_future(agendador.run("POST /a", bloqueio))
+        await asyncio.sleep(0.01)
+        envios = [asyncio.ensure_future(agendador.run("POST /b", lambda: registrar("notificacao"), PRIORITY_NOTIFICATION)),
+                  asyncio.ensure_future(agendador.run("POST /c", lambda: registrar("aprovacao"), PRIORITY_APPROVAL))]
+        await asyncio.sleep(0.01)
+        liberar.set()
+        await asyncio.gather(primeiro, *envios)
+        assert ordem == ["bloqueio", "aprovacao", "notificacao"], ordem
+
+    asyncio.run(cenario())
+
+def test_429_pausa_a_rota():
+    """Um 429 pausa só a rota atingida pelo Retry-After; as outras seguem."""
+    async def cenario():
+        agendador = OutboundScheduler()
+        agendador.observe("POST /a", 429, {"Retry-After": "0.3"})
+
+        inicio = time.monotonic()
+        await agendador.run("POST /b", lambda: asyncio.sleep(0))
+        assert time.monotonic() - inicio < 0.1
+        await agendador.run("POST /a", lambda: asyncio.sleep(0))
+        assert time.monotonic() - inicio >= 0.3
+        assert agendador.get_stats()["rate_limited"] == 1
+
+    asyncio.run(cenario())
+
+def test_notificacoes_do_mesmo_canal_sao_agrupadas():
+    """Canal saturado: 4 notificações viram uma mensagem com os embeds e botões numerados."""
+    async def cenario():
+        agendador = OutboundScheduler(route_limit=1)
+        canal = _Canal(10)
+        notificacoes = [_notificacao(f"Pagamento {i}") for i in range(4)]
+
+        await asyncio.gather(*(agendador.send(canal, coalesce=True, **n) for n in notificacoes))
+
+        assert len(canal.envios) == 1, canal.envios
+        enviado = canal.envios[0]
+        assert [e.title for e in enviado["embeds"]] == [f"{i + 1}. Pagamento {i}" for i in range(4)]
+        assert [b.label for b in enviado["view"].children] == [f"Reembolsar {i + 1}" for i in range(4)]
+        assert agendador.coalesced == 3
+
+    asyncio.run(cenario())
+
+def test_falha_no_agrupado_preserva_os_originais():
+    """Envio agrupado falhando: embeds e views de cada notificação continuam intactos para um reenvio."""
+    async def cenario():
+        agendador = OutboundScheduler(route_limit=1)
+        canal = _Canal(11, falhar=True)
+        notificacoes = [_notificacao(f"Pagamento {i}") for i in range(3)]
+
+        resultados = await asyncio.gather(*(agendador.send(canal, coalesce=True, **n) for n in notificacoes),
+                                          return_exceptions=True)
+
+        assert all(isinstance(r, ConnectionResetError) for r in resultados), resultados
+        for i, n in enumerate(notificacoes):
+            assert n["embed"].title == f"Pagamento {i}"
+            assert [(b.label, b.row) for b in n["view"].children] == [("Reembolsar", 1)]
+
+    asyncio.run(cenario())
+
+if __name__ == "__main__":
+    exit(executar("TESTE DO AGENDADOR DE SAÍDA", (
+        test_aprovacao_passa_na_frente,
+        test_429_pausa_a_rota,
+        test_notificacoes_do_mesmo_canal_sao_agrupadas,
+        test_falha_no_agrupado_preserva_os_originais,
+    )))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Script de Teste - Payouts idempotentes (saques e reembolsos PIX)
+
+A API MisticPay é simulada em _request (nenhuma chamada HTTP): confere que
+só um envio reserva a chave, que um resultado incerto não devolve saldo e
+que uma recusa definitiva devolve exatamente uma vez, mesmo com resumers
+simultâneos.
+
+Uso:
+    python test_payouts.py
+"""
+
+import asyncio
+
+import database
+import database_async
+from misticpay_client import PAYOUT_PROCESSING, AsyncMisticPayClient
+from testing_utils import banco_temporario, em_paralelo, executar
+
+def _cliente(respostas: list) -> AsyncMisticPayClient:
+    """Cliente cuja API responde, em ordem, com os itens de `respostas`
+    ((status, corpo) ou uma exceção a ser levantada)."""
+    cliente = AsyncMisticPayClient()
+
+    async def request(*args, **kwargs):
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    cliente._request = request
+    return cliente
+
+def test_claim_payout_concorrente_tem_um_vencedor():
+    """8 envios simultâneos do mesmo payout: só um reserva a chave."""
+    with banco_temporario():
+        database.begin_payout("withdrawal-1", "withdrawal", 1, 20, 10.0, "pix@teste")
+
+        vencedores = em_paralelo(lambda _: database.claim_payout("withdrawal-1"), range(8))
+
+        assert vencedores.count(True) == 1, vencedores
+
+def test_payout_falho_devolve_uma_vez():
+    """Saque com resultado incerto não devolve; recusado depois, devolve exatamente uma vez."""
+    async def cenario():
+        await database_async.credit_balance(21, 50.0)
+        await database_async.debit_balance(21, 50.0)
+        cliente = _cliente([asyncio.TimeoutError(), (400, {"message": "chave inválida"})])
+
+        # Timeout: o PIX pode ter saído, nada é devolvido
+        resultado = await cliente.payout("withdrawal-2", "withdrawal", 2, 21, 49.5, "pix@teste",
+                                         debited_amount=50.0)
+        assert resultado["status"] == PAYOUT_PROCESSING
+        assert await database_async.get_balance(21) == 0
+
+        # Dois resumers ao mesmo tempo: um retoma, recebe a recusa e devolve
+        await asyncio.gather(cliente.resume_payouts(), cliente.resume_payouts())
+        await cliente.resume_payouts()
+        assert (await database_async.get_payout("withdrawal-2"))["status"] == "failed"
+        assert await database_async.get_balance(21) == 50.0
+
+    with banco_temporario():
+        try:
+            asyncio.run(cenario())
+        finally:
+            asyncio.run(database_async.close())
+
+def test_payout_aceito_nao_e_reenviado():
+    """Payout aceito: um novo clique devolve o mesmo resultado sem chamar a API."""
+    async def cenario():
+        cliente = _cliente([(200, {"transactionId": "tx-1", "status": "QUEUED"})])
+        await cliente.payout("refund-3", "refund", 3, 22, 15.0, "pix@teste")
+        # Sem respostas restantes: uma nova chamada à API levantaria IndexError
+        repetido = await cliente.payout("refund-3", "refund", 3, 22, 15.0, "pix@teste")
+        assert repetido["status"] == "QUEUED"
+
+    with banco_temporario():
+        try:
+            asyncio.run(cenario())
+        finally:
+            asyncio.run(database_async.close())
+
+if __name__ == "__main__":
+    exit(executar("TESTE DE PAYOUTS IDEMPOTENTES", (
+        test_claim_payout_concorrente_tem_um_vencedor,
+        test_payout_falho_devolve_uma_vez,
+        test_payout_aceito_nao_e_reenviado,
+    )))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Script de Teste - Liquidação de pagamentos pelo webhook
+
+settle_payment resolve o pagamento, faz a transição pending -> completed,
+credita o vendedor e grava o outbox numa única transação: entregas repetidas
+ou simultâneas do mesmo pagamento creditam uma vez só.
+
+Uso:
+    python test_settlement.py
+"""
+
+import database
+from testing_utils import banco_temporario, em_paralelo, executar
+
+def _contar(sql: str) -> int:
+    return database.get_connection().execute(sql).fetchone()[0]
+
+def test_liquidacao_dupla_credita_uma_vez():
+    """O mesmo pagamento liquidado duas vezes (event_ids diferentes) credita uma vez só."""
+    with banco_temporario():
+        database.register_payment("discord_1", 10, 25.0, channel_id=555)
+
+        primeira = database.settle_payment("discord_1", event_id="tx-1")
+        segunda = database.settle_payment("discord_1", event_id="tx-2")
+
+        assert primeira["settled"] is True
+        assert segunda["settled"] is False and segunda["duplicate"] is False
+        assert database.get_balance(10) == 25.0
+        assert _contar("SELECT COUNT(*) FROM transaction_history WHERE user_id = 10") == 1
+        # Uma notificação por destino (canal + DM), gravadas junto com o crédito
+        assert _contar("SELECT COUNT(*) FROM bot_events") == 2
+
+def test_mesmo_evento_e_deduplicado():
+    """Reentrega do mesmo event_id é marcada como duplicada e não credita."""
+    with banco_temporario():
+        database.register_payment("discord_2", 11, 8.0)
+
+        database.settle_payment("discord_2", event_id="tx-9")
+        repetida = database.settle_payment("discord_2", event_id="tx-9")
+
+        assert repetida["duplicate"] is True
+        assert database.get_balance(11) == 8.0
+
+def test_liquidacao_concorrente_credita_uma_vez():
+    """10 webhooks simultâneos do mesmo pagamento: um crédito só."""
+    with banco_temporario():
+        database.register_payment("discord_3", 12, 40.0)
+
+        resultados = em_paralelo(lambda i: database.settle_payment("discord_3", event_id=f"tx-{i}"), range(10))
+
+        assert sum(1 for r in resultados if r["settled"]) == 1
+        assert database.get_balance(12) == 40.0
+
+if __name__ == "__main__":
+    exit(executar("TESTE DE LIQUIDAÇÃO DE PAGAMENTOS", (
+        test_liquidacao_dupla_credita_uma_vez,
+        test_mesmo_evento_e_deduplicado,
+        test_liquidacao_concorrente_credita_uma_vez,
+    )))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Script de Teste - Caixa de entrada durável dos webhooks
+
+Cobre a reserva das entradas pelos workers (um vencedor por entrada, reserva
+com prazo), a conclusão restrita ao dono da reserva e o caminho de falha até
+dead-letter e replay.
+
+Uso:
+    python test_webhook_inbox.py
+"""
+
+import time
+
+from testing_utils import banco_temporario, em_paralelo, executar
+from utils.webhook_inbox import DEAD, DONE, PENDING, WebhookInbox
+
+def test_reserva_concorrente_tem_um_vencedor():
+    """8 workers disputando 1 entrada: só um a reserva."""
+    with banco_temporario():
+        inbox = WebhookInbox()
+        inbox.append('{"id": 1}')
+
+        reservas = em_paralelo(lambda i: inbox.claim(f"w{i}"), range(8))
+
+        assert sum(1 for r in reservas if r is not None) == 1
+
+def test_reserva_vencida_e_retomada_sem_sobrescrever():
+    """Reserva vencida volta para outro worker; o dono antigo não conclui nem falha a entrada."""
+    with banco_temporario():
+        inbox = WebhookInbox(lease=0.2)
+        entry_id = inbox.append('{"id": 2}')
+
+        assert inbox.claim("a")["id"] == entry_id
+        assert inbox.claim("b") is None
+        time.sleep(0.25)
+        retomada = inbox.claim("b")
+        assert retomada["id"] == entry_id and retomada["attempts"] == 2
+
+        assert inbox.complete(entry_id, "a") is False
+        assert inbox.fail(entry_id, "a", 1, "erro") is None
+        assert inbox.complete(entry_id, "b") is True
+        assert inbox.get_stats()[DONE] == 1
+
+def test_falhas_levam_a_dead_letter():
+    """Falhas agendam nova tentativa até max_attempts; depois a entrada vai para dead-letter."""
+    with banco_temporario():
+        inbox = WebhookInbox(max_attempts=2, backoff_base=0)
+        entry_id = inbox.append('{"id": 3}')
+
+        entry = inbox.claim("w")
+        assert inbox.fail(entry_id, "w", entry["attempts"], "erro 1") == PENDING
+        entry = inbox.claim("w")
+        assert inbox.fail(entry_id, "w", entry["attempts"], "erro 2") == DEAD
+        assert inbox.claim("w") is None
+        assert inbox.replay_dead([entry_id]) == 1
+        assert inbox.claim("w")["attempts"] == 1
+
+if __name__ == "__main__":
+    exit(executar("TESTE DA CAIXA DE ENTRADA DE WEBHOOKS", (
+        test_reserva_concorrente_tem_um_vencedor,
+        test_reserva_vencida_e_retomada_sem_sobrescrever,
+        test_falhas_levam_a_dead_letter,
+    )))
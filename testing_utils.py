@@ -0,0 +1,62 @@
+"""
+Utilitários compartilhados pelos scripts de teste (test_*.py)
+
+banco_temporario() troca a base do bot por uma base SQLite nova, migrada,
+num diretório temporário que é apagado no fim; em_paralelo() dispara várias
+chamadas ao mesmo tempo (disputas por saldo, claims e reservas); executar()
+roda os testes de um script e imprime o resultado no formato dos demais.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import database
+
+@contextmanager
+def banco_temporario():
+    """Aponta database (e database_async, que segue database.DB_PATH) para uma base nova."""
+    anterior = database.DB_PATH
+    diretorio = tempfile.mkdtemp(prefix="bot_test_")
+    database.DB_PATH = os.path.join(diretorio, "bot.db")
+    try:
+        database.init_db()
+        yield database.DB_PATH
+    finally:
+        database.close_all_connections()
+        database.DB_PATH = anterior
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+def em_paralelo(func, argumentos: list) -> list:
+    """Chama func(arg) para cada argumento, em threads liberadas juntas; retorna os resultados em ordem."""
+    barreira = threading.Barrier(len(argumentos))
+    resultados = [None] * len(argumentos)
+
+    def worker(i, arg):
+        barreira.wait()
+        resultados[i] = func(arg)
+
+    threads = [threading.Thread(target=worker, args=(i, arg)) for i, arg in enumerate(argumentos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultados
+
+def executar(titulo: str, testes: tuple) -> int:
+    """Roda as funções de teste (o docstring é a descrição) e retorna o código de saída."""
+    print("\n" + "=" * 50)
+    print(f"🧪 {titulo}")
+    print("=" * 50)
+
+    falhas = 0
+    for teste in testes:
+        try:
+            teste()
+            print(f"✅ {teste.__doc__}")
+        except AssertionError as e:
+            falhas += 1
+            print(f"❌ {teste.__doc__} {e}")
+
+    return 1 if falhas else 0
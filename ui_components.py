@@ -1,17 +1,20 @@
 import discord
 import time
 import os
+import uuid
 from typing import Callable, Optional
-from database import get_balance, set_pix_key
+from database_async import get_balance, set_pix_key
 from embed_utils import padronizar_embed
 from collections import defaultdict
 from datetime import datetime, timedelta
 from modals_saque import ModalConfirmarSaqueTudo, ModalEscolherValorSaque
+from utils.outbound_scheduler import PRIORITY_APPROVAL, PRIORITY_CUSTOMER, outbound_scheduler
 
 # Configurações de limites
 VALOR_MAXIMO_TRANSACAO = float(os.getenv("VALOR_MAXIMO_TRANSACAO", "10000"))
 NOTIFICACAO_CHANNEL_ID = int(os.getenv("NOTIFICACAO_CHANNEL_ID", "0"))
 RATE_LIMIT_SEGUNDOS = int(os.getenv("RATE_LIMIT_SEGUNDOS", "3"))
+APPROVAL_CLAIM_TIMEOUT = int(os.getenv("APPROVAL_CLAIM_TIMEOUT", "300"))  # segundos até uma reivindicação abandonada voltar à fila
 
 # Sistema de Rate Limiting
 class RateLimiter:
@@ -82,7 +85,7 @@ class SaqueButton(discord.ui.Button):
             await interaction.response.send_message("❌ Este botão não é para você!", ephemeral=True)
             return
         
-        balance = get_balance(self.user_id)
+        balance = await get_balance(self.user_id)
         if balance <= 0:
             await interaction.response.send_message("❌ Você não tem saldo para sacar.", ephemeral=True)
             return
@@ -155,7 +158,7 @@ class SaldoActionView(discord.ui.View):
             )
         elif custom_id == "atualizar":
             from embed_utils import criar_separador, formatar_valor, padronizar_embed
-            balance = get_balance(self.user_id)
+            balance = await get_balance(self.user_id)
             self.balance = balance
             
             embed = discord.Embed(
@@ -267,9 +270,7 @@ class MenuView(discord.ui.View):
         return True
 
 class AprovacaoReembolsoView(discord.ui.View):
-    """View para aprovação/rejeição de reembolsos"""
-    _processing_refunds = {}  # Proteção contra concorrência
-    _refund_messages = {}  # Armazena message_ids para cada refund_id
+    """View para aprovação/rejeição de reembolsos (estado e DMs em approvals)"""
     
     def __init__(self, refund_id: int, user_id: int, amount: float, pix_key: str, reason: str, aprovador_ids: list, timeout: int = None, payment_id: str = None):
         super().__init__(timeout=timeout)
@@ -284,9 +285,9 @@ class AprovacaoReembolsoView(discord.ui.View):
         self.processado = False
         self.payment_id = payment_id  # 🆕 Guardar payment_id para usar no channel
         
-        # Inicializar lista de mensagens para este reembolso
-        if refund_id not in self._refund_messages:
-            self._refund_messages[refund_id] = []
+        # custom_id estável: a view é recriada após reinícios (restaurar_aprovacoes)
+        self.aprovar.custom_id = f"reembolso:aprovar:{refund_id}"
+        self.rejeitar.custom_id = f"reembolso:rejeitar:{refund_id}"
     
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         """Verifica se o usuário tem permissão para aprovar"""
@@ -320,32 +321,49 @@ class AprovacaoReembolsoView(discord.ui.View):
         
         await interaction.response.defer()
         
+        from database_async import approve_refund, add_transaction_history, finish_approval, claim_approval, release_approval
+        
+        # Reivindicação atômica no banco: só um aprovador (em qualquer processo) segue
+        if not await claim_approval("refund", self.refund_id, interaction.user.id):
+            await interaction.followup.send("⚠️ Este reembolso já está sendo processado", ephemeral=True)
+            return
+        
         try:
-            # Verificar se já está sendo processado
-            if self.refund_id in self._processing_refunds:
-                await interaction.followup.send("⚠️ Este reembolso já está sendo processado", ephemeral=True)
-                return
-            
-            # Marcar como em processamento
-            self._processing_refunds[self.refund_id] = True
-            
-            from database import approve_refund, add_transaction_history
-            from payment_handler import MisticPayHandler
+            from misticpay_client import PAYOUT_PROCESSING, misticpay_client
             
             # Aprovar no banco
-            if not approve_refund(self.refund_id, interaction.user.id):
+            if not await approve_refund(self.refund_id, interaction.user.id):
+                await release_approval("refund", self.refund_id, interaction.user.id)
                 await interaction.followup.send("❌ Erro ao aprovar reembolso (banco).", ephemeral=True)
                 return
             
-            # Fazer transferência PIX via API MisticPay
-            result = MisticPayHandler.create_withdrawal(self.user_id, self.amount, self.pix_key)
+            # Fazer transferência PIX via API MisticPay (idempotente: um novo clique não transfere de novo)
+            result = await misticpay_client.payout(
+                f"refund-{self.refund_id}", "refund", self.refund_id, self.user_id, self.amount, self.pix_key
+            )
             
-            if result:
+            if result and result["status"] == PAYOUT_PROCESSING:
+                # Resultado incerto: a aprovação continua reivindicada; o resumer
+                # conclui o payout, encerra a aprovação e avisa o usuário
+                self.processado = True
+                self.aprovado = True
+                self.aprovador_id = interaction.user.id
+                
+                embed = discord.Embed(
+                    title="⏳ Reembolso em Processamento",
+                    description=f"**ID:** #{self.refund_id}\n**Valor:** R$ {self.amount:.2f}\n**Usuário:** <@{self.user_id}>\n**Chave PIX:** `{self.pix_key}`\n\nA transferência foi enviada, mas a MisticPay ainda não confirmou o resultado. O usuário será avisado quando ela for concluída.\n\n**Aprovado por:** {interaction.user.mention}",
+                    color=discord.Color.orange(),
+                    timestamp=interaction.created_at
+                )
+                embed.set_footer(text="⏳ Aguardando confirmação da MisticPay")
+                await interaction.edit_original_response(embed=embed, view=None)
+                self.stop()
+            elif result:
                 # Transferência aceita (status retornado pela API)
                 status_pix = result.get("status", "QUEUED")
                 if str(status_pix).upper() == "QUEUED":
                     status_pix = "Aprovado"
-                add_transaction_history(
+                await add_transaction_history(
                     self.user_id,
                     'reembolso',
                     self.amount,
@@ -369,15 +387,12 @@ class AprovacaoReembolsoView(discord.ui.View):
                 embed.set_footer(text="✅ Reembolso aprovado")
                 await interaction.edit_original_response(embed=embed, view=None)
                 
-                # Deletar mensagens antigas de todos os aprovadores - REMOVIDO PARA MANTER HISTÓRICO
-                # (Mensagens agora ficam permanentes no privado dos aprovadores)
-                if self.refund_id in self._refund_messages:
-                    # Apenas limpar do dicionário de tracking, não deletar as mensagens
-                    del self._refund_messages[self.refund_id]
+                # Mensagens ficam permanentes no privado dos aprovadores (histórico);
+                # a aprovação sai da lista de views recriadas na inicialização
+                await finish_approval("refund", self.refund_id, "approved", interaction.user.id)
                 
                 # Notificar usuário
                 try:
-                    user = await interaction.client.fetch_user(self.user_id)
                     embed_user = discord.Embed(
                         title="✅ Reembolso Aprovado e Transferido",
                         description=f"Seu reembolso de **R$ {self.amount:.2f}** foi aprovado e enviado via PIX!\n\n**Chave PIX:** `{self.pix_key}`\n**Motivo:** {self.reason}\n**Status:** {status_pix}\n\nO valor deve chegar em alguns minutos.",
@@ -385,15 +400,15 @@ class AprovacaoReembolsoView(discord.ui.View):
                         timestamp=interaction.created_at
                     )
                     embed_user.set_footer(text="✅ Reembolso aprovado")
-                    await user.send(embed=embed_user)
+                    await outbound_scheduler.send_dm(interaction.client, self.user_id, PRIORITY_CUSTOMER, embed=embed_user)
                 except:
                     pass
                 
                 # 🆕 NOTIFICAR NO CANAL ONDE O /COBRAR FOI USADO (sem notificação no canal geral)
                 try:
                     if self.payment_id:
-                        from database import get_payment_channel
-                        channel_id = get_payment_channel(self.payment_id)
+                        from database_async import get_payment_channel
+                        channel_id = await get_payment_channel(self.payment_id)
                         if channel_id and channel_id > 0:
                             channel = interaction.client.get_channel(channel_id)
                             if channel:
@@ -404,7 +419,7 @@ class AprovacaoReembolsoView(discord.ui.View):
                                     timestamp=interaction.created_at
                                 )
                                 embed_canal_original.set_footer(text=f"ID: #{self.refund_id}")
-                                await channel.send(embed=embed_canal_original)
+                                await outbound_scheduler.send(channel, PRIORITY_CUSTOMER, embed=embed_canal_original)
                 except Exception as e:
                     print(f"Erro ao notificar canal original: {e}")
                 
@@ -420,15 +435,14 @@ class AprovacaoReembolsoView(discord.ui.View):
                 )
                 embed.set_footer(text="⚠️ Verifique a API e tente novamente")
                 await interaction.edit_original_response(embed=embed, view=None)
+                await finish_approval("refund", self.refund_id, "failed", interaction.user.id)
                 
         except Exception as e:
             import traceback
             traceback.print_exc()
+            # Devolve à fila (se o PIX saiu, o payout já encerrou a aprovação)
+            await release_approval("refund", self.refund_id, interaction.user.id)
             await interaction.followup.send(f"❌ Erro ao processar reembolso: {str(e)}", ephemeral=True)
-        finally:
-            # Liberar lock
-            if self.refund_id in self._processing_refunds:
-                del self._processing_refunds[self.refund_id]
     
     @discord.ui.button(label="Rejeitar Reembolso", style=discord.ButtonStyle.red, emoji="❌")
     async def rejeitar(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -442,10 +456,15 @@ class AprovacaoReembolsoView(discord.ui.View):
         
         rate_limiter.add_request(interaction.user.id)
         
-        from database import reject_refund
+        from database_async import reject_refund, finish_approval, claim_approval, release_approval
+        
+        if not await claim_approval("refund", self.refund_id, interaction.user.id):
+            await interaction.response.send_message("⚠️ Este reembolso já está sendo processado", ephemeral=True)
+            return
         
         # Rejeitar no banco
-        if reject_refund(self.refund_id, interaction.user.id):
+        if await reject_refund(self.refund_id, interaction.user.id):
+            await finish_approval("refund", self.refund_id, "rejected", interaction.user.id)
             self.aprovado = False
             self.aprovador_id = interaction.user.id
             
@@ -460,7 +479,6 @@ class AprovacaoReembolsoView(discord.ui.View):
             
             # Notificar usuário
             try:
-                user = await interaction.client.fetch_user(self.user_id)
                 embed_user = discord.Embed(
                     title="❌ Reembolso Rejeitado",
                     description=f"Seu reembolso de **R$ {self.amount:.2f}** foi rejeitado.\n\n**Motivo:** {self.reason}",
@@ -468,15 +486,15 @@ class AprovacaoReembolsoView(discord.ui.View):
                     timestamp=interaction.created_at
                 )
                 embed_user.set_footer(text="❌ Reembolso rejeitado")
-                await user.send(embed=embed_user)
+                await outbound_scheduler.send_dm(interaction.client, self.user_id, PRIORITY_CUSTOMER, embed=embed_user)
             except:
                 pass
             
             # 🆕 NOTIFICAR NO CANAL ONDE O /COBRAR FOI USADO (sem notificação no canal geral)
             try:
                 if self.payment_id:
-                    from database import get_payment_channel
-                    channel_id = get_payment_channel(self.payment_id)
+                    from database_async import get_payment_channel
+                    channel_id = await get_payment_channel(self.payment_id)
                     if channel_id and channel_id > 0:
                         channel = interaction.client.get_channel(channel_id)
                         if channel:
@@ -487,14 +505,25 @@ class AprovacaoReembolsoView(discord.ui.View):
                                 timestamp=interaction.created_at
                             )
                             embed_canal_original.set_footer(text=f"ID: #{self.refund_id}")
-                            await channel.send(embed=embed_canal_original)
+                            await outbound_scheduler.send(channel, PRIORITY_CUSTOMER, embed=embed_canal_original)
             except Exception as e:
                 print(f"Erro ao notificar canal original: {e}")
             
             self.stop()
         else:
+            await release_approval("refund", self.refund_id, interaction.user.id)
             await interaction.response.send_message("❌ Erro ao rejeitar reembolso.", ephemeral=True)
 
+async def apagar_mensagens_aprovacao(client: discord.Client, kind: str, reference_id: int, manter_id: int = None):
+    """Apaga as DMs de uma aprovação (referências em approval_messages), exceto manter_id.
+
+    Todas em paralelo, por mensagem parcial: custa uma ida e volta à API.
+    """
+    from database_async import get_approval_messages
+    from utils.fanout import dm_fanout
+    refs = [ref for ref in await get_approval_messages(kind, reference_id) if ref['message_id'] != manter_id]
+    await dm_fanout.delete(client, refs)
+
 class RejeitarSaqueModal(discord.ui.Modal):
     def __init__(self, view: "AprovacaoSaqueView"):
         super().__init__(title="Rejeitar Saque")
@@ -512,27 +541,42 @@ class RejeitarSaqueModal(discord.ui.Modal):
 
 
 class AprovacaoSaqueView(discord.ui.View):
-    """View para aprovação de saques com proteção contra concorrência"""
-    # Dicionário para rastrear saques em processamento (lock)
-    _processing_withdrawals = {}
+    """View para aprovação de saques (concorrência resolvida por claim_approval no banco)"""
     # Cooldown por aprovador (5s entre ações)
     _approver_last_action = {}
-    # Armazena message_ids para cada user_id (saque)
-    _withdrawal_messages = {}
     
-    def __init__(self, user_id: int, amount: float, amount_final: float, pix_key: str, payment_handler, timeout: int = None):
+    def __init__(self, user_id: int, amount: float, amount_final: float, pix_key: str, payment_handler,
+                 timeout: int = None, withdrawal_id: int = None):
         super().__init__(timeout=timeout)
         self.user_id = user_id
         self.amount = amount
         self.amount_final = amount_final
         self.pix_key = pix_key
         self.payment_handler = payment_handler
+        self.withdrawal_id = withdrawal_id
+        # Chave de idempotência do PIX: estável enquanto o saque existir
+        self.idempotency_key = f"withdrawal-{withdrawal_id}" if withdrawal_id else f"withdrawal-{user_id}-{uuid.uuid4().hex}"
         self.processado = False
         self.message: Optional[discord.Message] = None
         
-        # Inicializar lista de mensagens para este saque
-        if user_id not in self._withdrawal_messages:
-            self._withdrawal_messages[user_id] = []
+        # custom_id estável: a view é recriada após reinícios (restaurar_aprovacoes)
+        if withdrawal_id:
+            self.aprovar.custom_id = f"saque:aprovar:{withdrawal_id}"
+            self.rejeitar.custom_id = f"saque:rejeitar:{withdrawal_id}"
+
+    async def _reivindicar(self, approver_id: int) -> bool:
+        """Reivindica o saque para o aprovador (False se outro já está processando)."""
+        if not self.withdrawal_id:
+            return True
+        from database_async import claim_approval
+        return await claim_approval("withdrawal", self.withdrawal_id, approver_id)
+
+    async def _encerrar(self, status: str, decided_by: int = None) -> bool:
+        """Encerra a aprovação no banco (False se outro aprovador já encerrou)."""
+        if not self.withdrawal_id:
+            return True
+        from database_async import finish_approval
+        return await finish_approval("withdrawal", self.withdrawal_id, status, decided_by)
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         """Aplica cooldown de 5s entre aprovações/rejeições por aprovador."""
@@ -551,9 +595,9 @@ class AprovacaoSaqueView(discord.ui.View):
         """Chamado quando o timeout expira (se houver)"""
         # Devolver saldo se expirar
         try:
-            from database import add_balance
+            from database_async import credit_balance
             if not self.processado:
-                add_balance(self.user_id, self.amount)
+                await credit_balance(self.user_id, self.amount, "Saque expirado - Saldo devolvido")
                 print(f"⏱️ Saque expirado para {self.user_id} - Saldo devolvido")
         except Exception as e:
             print(f"Erro ao devolver saldo no timeout: {e}")
@@ -579,226 +623,250 @@ class AprovacaoSaqueView(discord.ui.View):
             return
         
         try:
-            from database import get_balance, add_balance
+            from database_async import get_balance, credit_balance
             
-            # PROTEÇÃO CONTRA CONCORRÊNCIA: verificar se já está em processamento
-            if self.user_id in self._processing_withdrawals:
+            # PROTEÇÃO CONTRA CONCORRÊNCIA: reivindicação atômica no banco (vale entre processos)
+            if self.processado or not await self._reivindicar(interaction.user.id):
                 embed = discord.Embed(
                     title="⚠️ Saque em Processamento",
-                    description="Este saque já está sendo processado. Aguarde um momento.",
+                    description="Este saque já está sendo processado por outro aprovador.",
                     color=discord.Color.orange()
                 )
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
             
-            # Marcar como em processamento
-            self._processing_withdrawals[self.user_id] = True
+            # O payout pode levar bem mais que os 3s que o Discord espera pela resposta
+            await interaction.response.defer()
             
-            try:
-                # Verificar saldo antes de processar
-                saldo_atual = get_balance(self.user_id)
-                if saldo_atual < 0:
-                    # Saldo foi debitado, agora é negativo - erro raro
-                    embed = discord.Embed(
-                        title="❌ Erro no Saldo",
-                        description=f"Saldo inconsistente. Saque cancelado.",
-                        color=discord.Color.red()
+            # Verificar saldo antes de processar
+            saldo_atual = await get_balance(self.user_id)
+            if saldo_atual < 0:
+                # Saldo foi debitado, agora é negativo - erro raro
+                embed = discord.Embed(
+                    title="❌ Erro no Saldo",
+                    description=f"Saldo inconsistente. Saque cancelado.",
+                    color=discord.Color.red()
+                )
+                await interaction.edit_original_response(embed=embed, view=None)
+                # Devolver saldo
+                await credit_balance(self.user_id, self.amount, "Saque não concluído - Saldo devolvido")
+                self.processado = True
+                await self._encerrar("failed", interaction.user.id)
+                return
+            
+            # Processar saque na API MisticPay (idempotente: retomado com a mesma chave)
+            result = await self.payment_handler.payout(
+                self.idempotency_key, "withdrawal", self.withdrawal_id, self.user_id,
+                self.amount_final, self.pix_key, debited_amount=self.amount
+            )
+            
+            from misticpay_client import PAYOUT_PROCESSING
+            
+            if result and result["status"] == PAYOUT_PROCESSING:
+                # RESULTADO INCERTO: o PIX pode ter saído. Não devolve o saldo nem
+                # encerra a aprovação; o resumer conclui o payout (record_payout_result
+                # encerra a aprovação) e avisa o usuário pelo outbox
+                self.processado = True
+                
+                embed = discord.Embed(
+                    title="⏳ Saque em Processamento",
+                    description="A transferência foi enviada, mas a MisticPay ainda não confirmou o resultado.\n"
+                                "O saque será concluído automaticamente e o usuário será avisado.",
+                    color=discord.Color.orange(),
+                    timestamp=interaction.created_at
+                )
+                embed.add_field(name="👤 Solicitante", value=f"<@{self.user_id}>", inline=True)
+                embed.add_field(name="👨‍💼 Aprovado por", value=interaction.user.mention, inline=True)
+                embed.add_field(name="💸 Valor", value=f"`R$ {self.amount_final:.2f}`", inline=False)
+                embed.set_footer(text="⏳ Aguardando confirmação da MisticPay")
+                await interaction.edit_original_response(embed=embed, view=None)
+                
+                if self.withdrawal_id:
+                    await apagar_mensagens_aprovacao(
+                        interaction.client, "withdrawal", self.withdrawal_id,
+                        manter_id=interaction.message.id if interaction.message else None
                     )
-                    await interaction.response.edit_message(embed=embed, view=None)
-                    # Devolver saldo
-                    add_balance(self.user_id, self.amount)
-                    return
+                self.stop()
+            elif result:
+                # SUCESSO! Não precisa devolver saldo pois já foi debitado
+                self.processado = True
                 
-                # Processar saque na API MisticPay
-                result = self.payment_handler.create_withdrawal(self.user_id, self.amount_final, self.pix_key)
+                from embed_utils import criar_separador, formatar_valor, padronizar_embed
                 
-                if result:
-                    # SUCESSO! Não precisa devolver saldo pois já foi debitado
-                    self.processado = True
-                    
-                    from embed_utils import criar_separador, formatar_valor, padronizar_embed
-                    
-                    embed = discord.Embed(
-                        title="✅ Saque Aprovado e Processado",
-                        description=f"{criar_separador('SAQUE APROVADO')}\n@{interaction.user.mention} aprovou o saque",
+                embed = discord.Embed(
+                    title="✅ Saque Aprovado e Processado",
+                    description=f"{criar_separador('SAQUE APROVADO')}\n@{interaction.user.mention} aprovou o saque",
+                    color=discord.Color.green(),
+                    timestamp=interaction.created_at
+                )
+                
+                embed.add_field(
+                    name="👤 Solicitante",
+                    value=f"<@{self.user_id}>",
+                    inline=True
+                )
+                
+                embed.add_field(
+                    name="👨‍💼 Aprovado por",
+                    value=interaction.user.mention,
+                    inline=True
+                )
+                
+                embed.add_field(
+                    name="\u200b",
+                    value="\u200b",
+                    inline=False
+                )
+                
+                embed.add_field(
+                    name="💰 Valor Solicitado",
+                    value=f"`R$ {self.amount:.2f}`",
+                    inline=True
+                )
+                
+                embed.add_field(
+                    name="📊 Taxa de Saque",
+                    value=f"`- R$ {(self.amount - self.amount_final):.2f}`",
+                    inline=True
+                )
+                
+                embed.add_field(
+                    name="\u200b",
+                    value="\u200b",
+                    inline=False
+                )
+                
+                embed.add_field(
+                    name="💸 Valor Transferido",
+                    value=f"**{formatar_valor(self.amount_final)}**",
+                    inline=False
+                )
+                
+                embed.add_field(
+                    name="🔑 Chave PIX",
+                    value=f"`{self.pix_key}`",
+                    inline=False
+                )
+                
+                embed.add_field(
+                    name="📌 ID do Saque",
+                    value=f"`{result['payout_id']}`",
+                    inline=True
+                )
+                
+                status_saque = result.get("status", "QUEUED")
+                if str(status_saque).upper() == "QUEUED":
+                    status_saque = "Aprovado"
+                
+                embed.add_field(
+                    name="⏱️ Status",
+                    value=f"✅ {status_saque}",
+                    inline=True
+                )
+                
+                padronizar_embed(embed, interaction, icone_tipo="success")
+                await interaction.edit_original_response(embed=embed, view=None)
+                
+                # Notificar usuário com menção
+                try:
+                    embed_user = discord.Embed(
+                        title="✅ Saque Aprovado",
+                        description=f"{criar_separador('TRANSFERÊNCIA APROVADA')}\n\n<@{self.user_id}>, seu saque foi aprovado com sucesso!",
                         color=discord.Color.green(),
                         timestamp=interaction.created_at
                     )
                     
-                    embed.add_field(
-                        name="👤 Solicitante",
-                        value=f"<@{self.user_id}>",
-                        inline=True
-                    )
-                    
-                    embed.add_field(
-                        name="👨‍💼 Aprovado por",
-                        value=interaction.user.mention,
-                        inline=True
-                    )
-                    
-                    embed.add_field(
-                        name="\u200b",
-                        value="\u200b",
+                    embed_user.add_field(
+                        name="💸 Valor a Receber",
+                        value=formatar_valor(self.amount_final),
                         inline=False
                     )
                     
-                    embed.add_field(
-                        name="💰 Valor Solicitado",
-                        value=f"`R$ {self.amount:.2f}`",
-                        inline=True
-                    )
-                    
-                    embed.add_field(
-                        name="📊 Taxa de Saque",
-                        value=f"`- R$ {(self.amount - self.amount_final):.2f}`",
-                        inline=True
-                    )
-                    
-                    embed.add_field(
-                        name="\u200b",
-                        value="\u200b",
-                        inline=False
-                    )
-                    
-                    embed.add_field(
-                        name="💸 Valor Transferido",
-                        value=f"**{formatar_valor(self.amount_final)}**",
-                        inline=False
-                    )
-                    
-                    embed.add_field(
+                    embed_user.add_field(
                         name="🔑 Chave PIX",
                         value=f"`{self.pix_key}`",
                         inline=False
                     )
                     
-                    embed.add_field(
-                        name="📌 ID do Saque",
+                    embed_user.add_field(
+                        name="📌 Código de Rastreio",
                         value=f"`{result['payout_id']}`",
-                        inline=True
+                        inline=False
                     )
                     
-                    status_saque = result.get("status", "QUEUED")
-                    if str(status_saque).upper() == "QUEUED":
-                        status_saque = "Aprovado"
-                    
-                    embed.add_field(
-                        name="⏱️ Status",
-                        value=f"✅ {status_saque}",
-                        inline=True
+                    embed_user.add_field(
+                        name="⏱️ Previsão",
+                        value="O valor deve chegar em alguns minutos",
+                        inline=False
                     )
                     
-                    padronizar_embed(embed, interaction, icone_tipo="success")
-                    await interaction.response.edit_message(embed=embed, view=None)
-                    
-                    # Notificar usuário com menção
-                    try:
-                        user = await interaction.client.fetch_user(self.user_id)
-                        
-                        embed_user = discord.Embed(
-                            title="✅ Saque Aprovado",
-                            description=f"{criar_separador('TRANSFERÊNCIA APROVADA')}\n\n{user.mention}, seu saque foi aprovado com sucesso!",
-                            color=discord.Color.green(),
-                            timestamp=interaction.created_at
-                        )
-                        
-                        embed_user.add_field(
-                            name="💸 Valor a Receber",
-                            value=formatar_valor(self.amount_final),
-                            inline=False
-                        )
-                        
-                        embed_user.add_field(
-                            name="🔑 Chave PIX",
-                            value=f"`{self.pix_key}`",
-                            inline=False
-                        )
-                        
-                        embed_user.add_field(
-                            name="📌 Código de Rastreio",
-                            value=f"`{result['payout_id']}`",
-                            inline=False
-                        )
-                        
-                        embed_user.add_field(
-                            name="⏱️ Previsão",
-                            value="O valor deve chegar em alguns minutos",
-                            inline=False
-                        )
-                        
-                        padronizar_embed(embed_user, interaction, icone_tipo="success")
-                        await user.send(content=f"{user.mention}", embed=embed_user)
-                    except:
-                        pass
-                    
-                    # Deletar mensagens antigas de aprovação
-                    if self.user_id in self._withdrawal_messages:
-                        for msg_info in self._withdrawal_messages[self.user_id]:
-                            try:
-                                user_id = msg_info.get('user_id')
-                                message_id = msg_info.get('message_id')
-                                
-                                # Tentar deletar a mensagem
-                                user_owner = await interaction.client.fetch_user(user_id)
-                                channel = user_owner.dm_channel
-                                if channel:
-                                    try:
-                                        msg = await channel.fetch_message(message_id)
-                                        await msg.delete()
-                                    except:
-                                        pass
-                            except:
-                                pass
-                        
-                        # Limpar lista de mensagens
-                        del self._withdrawal_messages[self.user_id]
-                    
-                    self.stop()
-                else:
-                    # ERRO NA API: devolver saldo
-                    add_balance(self.user_id, self.amount)
-                    
-                    embed = discord.Embed(
-                        title="❌ Erro ao Processar Saque",
-                        description="Erro ao processar o saque na API MisticPay. Saldo foi devolvido ao usuário.",
-                        color=discord.Color.red(),
+                    padronizar_embed(embed_user, interaction, icone_tipo="success")
+                    await outbound_scheduler.send_dm(interaction.client, self.user_id, PRIORITY_CUSTOMER,
+                                                     content=f"<@{self.user_id}>", embed=embed_user)
+                except:
+                    pass
+                
+                # Apagar as cópias da solicitação enviadas aos outros aprovadores
+                await self._encerrar("approved", interaction.user.id)
+                if self.withdrawal_id:
+                    await apagar_mensagens_aprovacao(
+                        interaction.client, "withdrawal", self.withdrawal_id,
+                        manter_id=interaction.message.id if interaction.message else None
+                    )
+                
+                self.stop()
+            else:
+                # ERRO NA API (nada foi transferido): devolver saldo
+                await credit_balance(self.user_id, self.amount, "Saque não concluído - Saldo devolvido")
+                self.processado = True
+                await self._encerrar("failed", interaction.user.id)
+                
+                embed = discord.Embed(
+                    title="❌ Erro ao Processar Saque",
+                    description="Erro ao processar o saque na API MisticPay. Saldo foi devolvido ao usuário.",
+                    color=discord.Color.red(),
+                    timestamp=interaction.created_at
+                )
+                embed.set_footer(text="⚠️ Verifique a API e tente novamente")
+                await interaction.edit_original_response(embed=embed, view=None)
+                
+                # Notificar usuário
+                try:
+                    embed_user = discord.Embed(
+                        title="⚠️ Saque Cancelado - Erro",
+                        description=f"Seu saque de **R$ {self.amount_final:.2f}** não pode ser processado. Seu saldo foi devolvido.",
+                        color=discord.Color.orange(),
                         timestamp=interaction.created_at
                     )
-                    embed.set_footer(text="⚠️ Verifique a API e tente novamente")
-                    await interaction.response.edit_message(embed=embed, view=None)
-                    
-                    # Notificar usuário
-                    try:
-                        user = await interaction.client.fetch_user(self.user_id)
-                        embed_user = discord.Embed(
-                            title="⚠️ Saque Cancelado - Erro",
-                            description=f"Seu saque de **R$ {self.amount_final:.2f}** não pode ser processado. Seu saldo foi devolvido.",
-                            color=discord.Color.orange(),
-                            timestamp=interaction.created_at
-                        )
-                        embed_user.set_footer(text="Saldo devolvido")
-                        await user.send(embed=embed_user)
-                    except:
-                        pass
-            finally:
-                # Remover lock
-                if self.user_id in self._processing_withdrawals:
-                    del self._processing_withdrawals[self.user_id]
-        
+                    embed_user.set_footer(text="Saldo devolvido")
+                    await outbound_scheduler.send_dm(interaction.client, self.user_id, PRIORITY_CUSTOMER, embed=embed_user)
+                except:
+                    pass
+    
         except Exception as e:
             print(f"Erro ao aprovar saque: {e}")
             import traceback
             traceback.print_exc()
             
-            # Devolver saldo em caso de erro não tratado
+            # Devolver saldo em caso de erro não tratado (só se o PIX não foi enviado
+            # e a aprovação ainda era deste aprovador). O erro pode ter vindo depois
+            # do envio: com payout em 'sending'/'unknown' (ou aceito) o saldo fica
+            # com o resumer, que conclui o payout e devolve se ele falhar de vez
             try:
-                from database import add_balance
-                add_balance(self.user_id, self.amount)
+                from database_async import credit_balance, get_payout
+                payout = await get_payout(self.idempotency_key)
+                if (not self.processado and (payout is None or payout["status"] == "failed")
+                        and await self._encerrar("failed", interaction.user.id)):
+                    await credit_balance(self.user_id, self.amount, "Saque não concluído - Saldo devolvido")
+                    self.processado = True
             except:
                 pass
             
-            await interaction.response.send_message(f"❌ Erro ao aprovar saque: {str(e)}", ephemeral=True)
+            mensagem = f"❌ Erro ao aprovar saque: {str(e)}"
+            if interaction.response.is_done():
+                await interaction.followup.send(mensagem, ephemeral=True)
+            else:
+                await interaction.response.send_message(mensagem, ephemeral=True)
     
     @discord.ui.button(label="Rejeitar Saque", style=discord.ButtonStyle.red, emoji="❌")
     async def rejeitar(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -807,12 +875,20 @@ class AprovacaoSaqueView(discord.ui.View):
 
     async def _finalizar_rejeicao(self, interaction: discord.Interaction, motivo: str):
         try:
-            from database import add_balance
+            from database_async import credit_balance
 
-            if not self.processado:
-                # Devolver o saldo (foi debitado no início)
-                add_balance(self.user_id, self.amount)
-                self.processado = True
+            # Reivindicar e encerrar antes de devolver: se outro aprovador já
+            # decidiu (ou está pagando), não devolve de novo
+            if (self.processado or not await self._reivindicar(interaction.user.id)
+                    or not await self._encerrar("rejected", interaction.user.id)):
+                await interaction.response.send_message(
+                    "⚠️ Este saque já foi processado por outro aprovador.", ephemeral=True
+                )
+                return
+
+            # Devolver o saldo (foi debitado no início)
+            await credit_balance(self.user_id, self.amount, "Saque rejeitado - Saldo devolvido")
+            self.processado = True
 
             embed = discord.Embed(
                 title="❌ Saque Rejeitado",
@@ -841,14 +917,13 @@ class AprovacaoSaqueView(discord.ui.View):
             )
 
             if self.message:
-                await self.message.edit(embed=embed, view=None)
+                await outbound_scheduler.edit(self.message, PRIORITY_APPROVAL, embed=embed, view=None)
                 await interaction.response.send_message("✅ Saque rejeitado com sucesso.", ephemeral=True)
             else:
                 await interaction.response.edit_message(embed=embed, view=None)
 
             # Notificar usuário
             try:
-                user = await interaction.client.fetch_user(self.user_id)
                 embed_user = discord.Embed(
                     title="❌ Saque Rejeitado",
                     description=f"Seu saque de **R$ {self.amount:.2f}** foi rejeitado. O saldo foi devolvido à sua conta.\n\n**Motivo:** {motivo}",
@@ -856,7 +931,7 @@ class AprovacaoSaqueView(discord.ui.View):
                     timestamp=interaction.created_at
                 )
                 embed_user.set_footer(text="Saldo devolvido")
-                await user.send(embed=embed_user)
+                await outbound_scheduler.send_dm(interaction.client, self.user_id, PRIORITY_CUSTOMER, embed=embed_user)
             except:
                 pass
 
@@ -866,6 +941,106 @@ class AprovacaoSaqueView(discord.ui.View):
             await interaction.response.send_message(f"❌ Erro ao rejeitar saque: {str(e)}", ephemeral=True)
 
 
+def criar_view_aprovacao(approval: dict) -> discord.ui.View:
+    """Recria a view de uma aprovação pendente a partir do registro em approvals."""
+    if approval['kind'] == "withdrawal":
+        from misticpay_client import misticpay_client
+        return AprovacaoSaqueView(
+            approval['user_id'], approval['amount'], approval['amount_final'], approval['pix_key'],
+            misticpay_client, timeout=None, withdrawal_id=approval['reference_id']
+        )
+    return AprovacaoReembolsoView(
+        approval['reference_id'], approval['user_id'], approval['amount'], approval['pix_key'],
+        approval['reason'], approval['approver_ids'] or [], timeout=None, payment_id=approval['payment_id']
+    )
+
+async def restaurar_aprovacoes(bot: discord.Client) -> int:
+    """Registra as views persistentes de todas as aprovações pendentes (na inicialização).
+
+    Uma consulta e um add_view por aprovação: os botões das DMs enviadas antes
+    do reinício voltam a funcionar. Retorna quantas foram restauradas.
+    """
+    from database_async import get_open_approvals, release_stale_approval_claims
+    # Reivindicações de um processo que caiu antes de enviar o PIX voltam à fila
+    liberadas = await release_stale_approval_claims(APPROVAL_CLAIM_TIMEOUT)
+    if liberadas:
+        print(f"🔓 {liberadas} aprovação(ões) abandonada(s) devolvida(s) à fila")
+    aprovacoes = await get_open_approvals()
+    for approval in aprovacoes:
+        bot.add_view(criar_view_aprovacao(approval))
+    return len(aprovacoes)
+
+async def notificar_resultado_payout(client: discord.Client, payload: dict):
+    """Avisa o usuário do resultado de um payout concluído pelo resumer (EVENT_PAYOUT_RESULT)."""
+    aceito = payload['status'] == "accepted"
+    if payload['kind'] == "withdrawal":
+        if aceito:
+            embed = discord.Embed(
+                title="✅ Saque Aprovado",
+                description=f"<@{payload['user_id']}>, seu saque foi concluído!",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="💸 Valor a Receber", value=f"R$ {payload['amount']:.2f}", inline=False)
+            embed.add_field(name="🔑 Chave PIX", value=f"`{payload['pix_key']}`", inline=False)
+            embed.add_field(name="📌 Código de Rastreio", value=f"`{payload['payout_id'] or payload['idempotency_key']}`", inline=False)
+        else:
+            devolvido = "Seu saldo foi devolvido." if payload['debited_amount'] else ""
+            embed = discord.Embed(
+                title="⚠️ Saque Cancelado - Erro",
+                description=f"Seu saque de **R$ {payload['amount']:.2f}** não pode ser processado. {devolvido}",
+                color=discord.Color.orange()
+            )
+    else:
+        if aceito:
+            embed = discord.Embed(
+                title="✅ Reembolso Aprovado e Transferido",
+                description=f"Seu reembolso de **R$ {payload['amount']:.2f}** foi enviado via PIX!\n\n**Chave PIX:** `{payload['pix_key']}`\n\nO valor deve chegar em alguns minutos.",
+                color=discord.Color.green()
+            )
+        else:
+            embed = discord.Embed(
+                title="❌ Erro no Reembolso",
+                description=f"A transferência do seu reembolso de **R$ {payload['amount']:.2f}** falhou. A equipe foi avisada.",
+                color=discord.Color.red()
+            )
+    try:
+        await outbound_scheduler.send_dm(client, payload['user_id'], PRIORITY_CUSTOMER, embed=embed)
+    except discord.Forbidden:
+        # DMs fechadas: não há como entregar
+        print(f"DM do payout {payload['idempotency_key']} para {payload['user_id']} bloqueada")
+
+def registrar_notificacoes_payout(consumer, client: discord.Client):
+    """Registra no despachante do outbox o aviso dos payouts concluídos pelo resumer."""
+    from database import EVENT_PAYOUT_RESULT
+    consumer.register(EVENT_PAYOUT_RESULT, lambda payload: notificar_resultado_payout(client, payload))
+
+async def abrir_modal_reembolso(interaction: discord.Interaction, payment_id: str, amount: float, vendedor_id: int,
+                                taxa_fixa: float):
+    """Verifica a permissão (cargo /cobrar) e abre o modal da chave PIX do reembolso"""
+    from database_async import has_any_cargo_permission
+    
+    # Verificar se usuário tem permissão de cobrar
+    tem_permissao = await has_any_cargo_permission(role.id for role in interaction.user.roles)
+    
+    if not tem_permissao:
+        await interaction.response.send_message("❌ Você não tem permissão para rembolsar. Use `/add-permissao` para obter acesso.", ephemeral=True)
+        return
+    
+    # Calcular valores para mostrar no modal
+    valor_bruto = float(amount)
+    valor_liquido = valor_bruto - taxa_fixa
+    
+    # Criar e exibir modal
+    modal = ModalChavePIX(
+        payment_id=payment_id,
+        amount=valor_bruto,
+        vendedor_id=vendedor_id,
+        taxa_rembolso=taxa_fixa,
+        valor_liquido=valor_liquido
+    )
+    
+    await interaction.response.send_modal(modal)
+
 class ReebolsarPagamentoView(discord.ui.View):
     """View com botão de rembolso que abre modal para inserir chave PIX"""
     def __init__(self, payment_id: str, amount: float, vendedor_id: int, taxa_fixa: float = 1.00, timeout: int = 3600):
@@ -878,31 +1053,31 @@ class ReebolsarPagamentoView(discord.ui.View):
     @discord.ui.button(label="Rembolsar", style=discord.ButtonStyle.danger, emoji="💸")
     async def rembolsar(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Botão para rembolsar - abre modal para inserir chave PIX"""
-        # Verificar se tem permissão (cargo /cobrar)
-        from database import has_cargo_permission
-        
-        # Verificar se usuário tem permissão de cobrar
-        tem_permissao = any(has_cargo_permission(role.id) for role in interaction.user.roles)
-        
-        if not tem_permissao:
-            await interaction.response.send_message("❌ Você não tem permissão para rembolsar. Use `/add-permissao` para obter acesso.", ephemeral=True)
-            return
-        
-        # Calcular valores para mostrar no modal
-        valor_bruto = float(self.amount)
-        taxa_rembolso = self.taxa_fixa
-        valor_liquido = valor_bruto - taxa_rembolso
-        
-        # Criar e exibir modal
-        modal = ModalChavePIX(
-            payment_id=self.payment_id,
-            amount=valor_bruto,
-            vendedor_id=self.vendedor_id,
-            taxa_rembolso=taxa_rembolso,
-            valor_liquido=valor_liquido
-        )
-        
-        await interaction.response.send_modal(modal)
+        await abrir_modal_reembolso(interaction, self.payment_id, self.amount, self.vendedor_id, self.taxa_fixa)
+
+class ReebolsarResumoView(discord.ui.View):
+    """View do resumo de pagamentos (modo digest): menu com os últimos pagamentos para rembolsar"""
+    def __init__(self, pagamentos: list, taxa_fixa: float = 1.00, timeout: int = 3600):
+        """
+        Args:
+            pagamentos: Dicts com payment_id, gross_amount, receiver_id e ref (mais recentes primeiro)
+            taxa_fixa: Taxa fixa do reembolso
+        """
+        super().__init__(timeout=timeout)
+        self.taxa_fixa = taxa_fixa
+        # O Discord aceita no máximo 25 opções por menu
+        self.pagamentos = {p['payment_id']: p for p in pagamentos[:25]}
+        self.rembolsar.options = [
+            discord.SelectOption(label=f"R$ {p['gross_amount']:.2f} • {p['ref']}"[:100],
+                                 value=p['payment_id'], emoji="💸")
+            for p in self.pagamentos.values()
+        ]
+    
+    @discord.ui.select(placeholder="💸 Rembolsar um pagamento...")
+    async def rembolsar(self, interaction: discord.Interaction, select: discord.ui.Select):
+        pagamento = self.pagamentos[select.values[0]]
+        await abrir_modal_reembolso(interaction, pagamento['payment_id'], pagamento['gross_amount'],
+                                    pagamento['receiver_id'], self.taxa_fixa)
 
 
 class ModalChavePIX(discord.ui.Modal, title="💸 Chave PIX para Rembolso"):
@@ -940,10 +1115,10 @@ class ModalChavePIX(discord.ui.Modal, title="💸 Chave PIX para Rembolso"):
                 return
             
             # Criar reembolso
-            from database import create_refund
+            from database_async import create_refund
             import os
             
-            refund_id = create_refund(
+            refund_id = await create_refund(
                 user_id=self.vendedor_id,
                 amount=self.valor_liquido,
                 reason=f"Rembolso de PIX: {chave_pix} (Pagamento: {self.payment_id})",
@@ -980,6 +1155,13 @@ class ModalChavePIX(discord.ui.Modal, title="💸 Chave PIX para Rembolso"):
             from ui_components import AprovacaoReembolsoView
             view = AprovacaoReembolsoView(refund_id, self.vendedor_id, self.valor_liquido, chave_pix, "Rembolso automático", aprovadores_limpos, timeout=None, payment_id=self.payment_id)
             
+            # Persistir a aprovação (a view é recriada se o bot reiniciar)
+            from database_async import create_approval, add_approval_messages
+            approval_id = await create_approval(
+                "refund", refund_id, self.vendedor_id, self.valor_liquido, chave_pix,
+                reason="Rembolso automático", payment_id=self.payment_id, approver_ids=aprovadores_limpos
+            )
+            
             # Criar embed para aprovadores
             embed_aprovacao = discord.Embed(
                 title="📋 Solicitação de Rembolso",
@@ -990,22 +1172,13 @@ class ModalChavePIX(discord.ui.Modal, title="💸 Chave PIX para Rembolso"):
             embed_aprovacao.add_field(name="⚠️ Ação Necessária", value="Aprove ou rejeite esta solicitação usando os botões abaixo.", inline=False)
             embed_aprovacao.set_footer(text="⏳ Aguardando aprovação")
             
-            # Enviar para cada aprovador no privado
-            for aprovador_id in aprovadores_limpos:
-                try:
-                    aprovador = await interaction.client.fetch_user(aprovador_id)
-                    msg = await aprovador.send(embed=embed_aprovacao, view=view)
-                    
-                    # Registrar message_id para poder deletar depois
-                    if refund_id not in AprovacaoReembolsoView._refund_messages:
-                        AprovacaoReembolsoView._refund_messages[refund_id] = []
-                    AprovacaoReembolsoView._refund_messages[refund_id].append({
-                        'user_id': aprovador_id,
-                        'message_id': msg.id,
-                        'channel_id': msg.channel.id
-                    })
-                except Exception as e:
-                    print(f"Erro ao enviar DM para aprovador {aprovador_id}: {e}")
+            # Enviar para todos os aprovadores no privado (em paralelo)
+            from utils.fanout import dm_fanout
+            enviados = await dm_fanout.send(interaction.client, aprovadores_limpos, embed=embed_aprovacao, view=view)
+            
+            # Registrar as DMs para poder editar/deletar depois
+            if enviados:
+                await add_approval_messages(approval_id, enviados)
             
         except Exception as e:
             print(f"Erro ao processar rembolso via modal: {e}")
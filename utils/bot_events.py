@@ -0,0 +1,210 @@
+"""
+Despachante do outbox do bot (tabela bot_events)
+Roda como task no event loop do bot: reserva lotes de eventos prontos (ex.:
+notificações de pagamentos liquidados, gravadas junto com o crédito), entrega
+em paralelo pelo handler registrado para cada tipo e grava o resultado do lote
+de uma vez. Falhas voltam à fila com backoff exponencial; depois de
+max_attempts o evento vai para dead-letter (replay_webhooks.py).
+
+Cada reserva tem prazo (lease): vários processos do bot podem despachar a
+mesma fila, e os eventos de um processo que caiu voltam a ser entregues
+quando o prazo vence.
+"""
+import asyncio
+import inspect
+import os
+import time
+import traceback
+import uuid
+from typing import Awaitable, Callable, Dict
+
+import database_async
+
+class BotEventConsumer:
+    def __init__(self, poll_interval: float = 0.5, batch_size: int = 50, concurrency: int = 8,
+                 max_attempts: int = 8, backoff_base: float = 2.0, backoff_max: float = 300.0,
+                 lease: float = 60.0):
+        """
+        Inicializa o despachante
+
+        Args:
+            poll_interval: Intervalo máximo entre verificações da fila (segundos)
+            batch_size: Máximo de eventos reservados por lote
+            concurrency: Entregas simultâneas dentro de um lote
+            max_attempts: Tentativas antes de mover o evento para dead-letter
+            backoff_base: Espera (segundos) após a primeira falha; dobra a cada tentativa
+            backoff_max: Espera máxima entre tentativas
+            lease: Segundos de reserva de um evento; se o consumidor cair, outro o reserva depois disso
+        """
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.consumer_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.handlers: Dict[str, Callable[[dict], Awaitable]] = {}
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+        self._watching = set()
+        self._confirmations = []
+        self._finisher = None
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+        self.batches = 0
+
+    def register(self, kind: str, handler: Callable[[dict], Awaitable]):
+        """Registra a corrotina handler(payload) para um tipo de evento.
+
+        O handler pode retornar um awaitable de confirmação (ex.: entrada no
+        resumo de notificações): o lote segue sem esperar por ele e o evento
+        só é marcado como entregue quando ele terminar.
+        """
+        self.handlers[kind] = handler
+
+    async def start(self):
+        """Inicia o despacho no loop atual (idempotente)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run(), name="bot-events")
+
+    def notify(self):
+        """Acorda o despachante (pode ser chamado de qualquer thread, ex.: após uma liquidação)"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    async def stop(self):
+        """Para o despacho (eventos pendentes continuam no banco)"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                events = await database_async.claim_bot_events(self.consumer_id, self.batch_size, self.lease)
+            except Exception as e:
+                print(f"Erro ao ler o outbox do bot: {e}")
+                events = []
+
+            if events:
+                await self._deliver_batch(events)
+                if len(events) == self.batch_size:
+                    continue  # ainda pode haver eventos prontos
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _deliver_batch(self, events: list):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(event: dict):
+            async with semaphore:
+                return await self._deliver(event)
+
+        outcomes = await asyncio.gather(*(deliver(event) for event in events))
+
+        results = []
+        for event, (error, confirmation) in zip(events, outcomes):
+            if confirmation is not None:
+                # Confirmação adiada (ex.: resumo de notificações): o lote não espera por ela
+                self._watch(event, confirmation)
+            else:
+                results.append((event, error))
+        await self._finish(results)
+
+    def _watch(self, event: dict, confirmation):
+        future = asyncio.ensure_future(confirmation)
+        self._watching.add(future)
+        future.add_done_callback(lambda done: self._confirmed(event, done))
+
+    def _confirmed(self, event: dict, future: asyncio.Future):
+        self._watching.discard(future)
+        if future.cancelled():
+            error = "Confirmação cancelada"
+        elif future.exception() is not None:
+            error = f"{type(future.exception()).__name__}: {future.exception()}"
+        else:
+            error = None
+        # Confirmações resolvidas juntas (mesma edição do resumo) gravam numa transação só
+        self._confirmations.append((event, error))
+        if self._finisher is None or self._finisher.done():
+            self._finisher = self._loop.create_task(self._finish_confirmations())
+
+    async def _finish_confirmations(self):
+        while self._confirmations:
+            results, self._confirmations = self._confirmations, []
+            await self._finish(results)
+
+    async def _finish(self, results: list):
+        """Grava o resultado das entregas [(evento, erro ou None)] em uma transação"""
+        if not results:
+            return
+        delivered, retries, dead = [], [], []
+        for event, error in results:
+            if error is None:
+                delivered.append(event['id'])
+            elif event['attempts'] >= self.max_attempts:
+                dead.append((event['id'], error))
+                print(f"☠️ Evento #{event['id']} ({event['kind']}) movido para dead-letter após "
+                      f"{event['attempts']} tentativas: {error}")
+            else:
+                delay = min(self.backoff_base * 2 ** (event['attempts'] - 1), self.backoff_max)
+                retries.append((event['id'], error, time.time() + delay))
+                print(f"⚠️ Evento #{event['id']} ({event['kind']}) falhou (tentativa {event['attempts']}): {error}")
+
+        try:
+            await database_async.finish_bot_events(self.consumer_id, delivered, retries, dead)
+        except Exception:
+            # Os eventos ficam reservados e voltam à fila quando a reserva expira
+            traceback.print_exc()
+            return
+        self.batches += 1
+        self.delivered += len(delivered)
+        self.retried += len(retries)
+        self.dead += len(dead)
+
+    async def _deliver(self, event: dict) -> tuple:
+        """Entrega um evento; retorna (mensagem de erro ou None, confirmação pendente ou None)"""
+        handler = self.handlers.get(event['kind'])
+        if handler is None:
+            return f"Nenhum handler para '{event['kind']}'", None
+        try:
+            result = await handler(event['payload'])
+        except Exception as e:
+            return f"{type(e).__name__}: {e}", None
+        return None, result if inspect.isawaitable(result) else None
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do despachante"""
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'batches': self.batches,
+            'delivered': self.delivered,
+            'retried': self.retried,
+            'dead': self.dead
+        }
+
+# Instância global
+bot_event_consumer = BotEventConsumer(
+    poll_interval=float(os.getenv("BOT_EVENTS_POLL_INTERVAL", "0.5")),
+    batch_size=int(os.getenv("BOT_EVENTS_BATCH_SIZE", "50")),
+    concurrency=int(os.getenv("BOT_EVENTS_CONCURRENCY", "8")),
+    max_attempts=int(os.getenv("BOT_EVENTS_MAX_ATTEMPTS", "8")),
+    backoff_base=float(os.getenv("BOT_EVENTS_BACKOFF_BASE", "2")),
+    backoff_max=float(os.getenv("BOT_EVENTS_BACKOFF_MAX", "300")),
+    lease=float(os.getenv("BOT_EVENTS_LEASE", "60"))
+)
@@ -0,0 +1,131 @@
+"""
+Circuit breaker e retry com backoff exponencial (jitter)
+Protege as chamadas à MisticPay: enquanto a API estiver fora do ar as
+chamadas falham na hora, e uma chamada de teste (half-open) detecta a volta
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+# Estados do circuito
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuito está aberto"""
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """
+        Inicializa o circuit breaker
+
+        Args:
+            name: Nome do serviço protegido (aparece nos logs e estatísticas)
+            failure_threshold: Falhas seguidas que abrem o circuito
+            recovery_timeout: Tempo aberto (segundos) antes de testar de novo
+            half_open_max_calls: Chamadas de teste simultâneas no estado half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._probe_started = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self.successes = 0
+        self.total_failures = 0
+        self.last_failure = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+            print(f"🟡 Circuito {self.name}: half-open (testando recuperação)")
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Verifica se uma chamada pode ser feita agora
+
+        Returns:
+            False se o circuito estiver aberto (ou o teste half-open já estiver em andamento)
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN:
+                # Teste que nunca terminou (ex.: cancelado) não prende o circuito
+                if time.monotonic() - self._probe_started >= self.recovery_timeout:
+                    self._half_open_calls = 0
+                if self._half_open_calls < self.half_open_max_calls:
+                    self._half_open_calls += 1
+                    self._probe_started = time.monotonic()
+                    return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        """Registra uma chamada bem-sucedida (fecha o circuito se estava em teste)"""
+        with self._lock:
+            self.successes += 1
+            self._failures = 0
+            if self._state != CLOSED:
+                print(f"🟢 Circuito {self.name}: fechado (serviço recuperado)")
+            self._state = CLOSED
+
+    def record_failure(self, error: str = None):
+        """Registra uma falha; abre o circuito ao atingir o limite ou se o teste falhar"""
+        with self._lock:
+            self.total_failures += 1
+            self._failures += 1
+            self.last_failure = error
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                print(f"🔴 Circuito {self.name}: aberto após {self._failures} falha(s) - {error}")
+
+    def get_stats(self) -> dict:
+        """Retorna estado e contadores do circuito"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'successes': self.successes,
+                'failures': self.total_failures,
+                'last_failure': self.last_failure
+            }
+
+def backoff_delay(attempt: int, base: float = 0.5, maximum: float = 8.0) -> float:
+    """Espera antes da tentativa seguinte: backoff exponencial com jitter completo"""
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+async def sleep_backoff(attempt: int, base: float = 0.5, maximum: float = 8.0, minimum: float = 0.0):
+    """Aguarda o backoff da tentativa (minimum respeita um Retry-After, por exemplo)"""
+    await asyncio.sleep(max(minimum, backoff_delay(attempt, base, maximum)))
+
+# Instância global (chamadas à API MisticPay)
+misticpay_breaker = CircuitBreaker(
+    "misticpay",
+    failure_threshold=int(os.getenv("MISTICPAY_BREAKER_THRESHOLD", "5")),
+    recovery_timeout=float(os.getenv("MISTICPAY_BREAKER_RECOVERY", "30"))
+)
@@ -0,0 +1,108 @@
+"""
+Envio de DMs para vários aprovadores em paralelo (com limite)
+Envia, edita e apaga mensagens pelas referências guardadas (canal + mensagem)
+usando mensagens parciais: nenhum fetch_user/fetch_message antes da ação.
+As chamadas passam pelo agendador de saída com prioridade de aprovação.
+"""
+import asyncio
+import os
+from typing import Iterable, List
+
+import discord
+
+from utils.outbound_scheduler import PRIORITY_APPROVAL, outbound_scheduler
+
+class DmFanout:
+    def __init__(self, max_concurrency: int = 8):
+        """
+        Inicializa o fan-out
+
+        Args:
+            max_concurrency: Máximo de chamadas simultâneas à API do Discord
+        """
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.sent = 0
+        self.edited = 0
+        self.deleted = 0
+        self.failed = 0
+
+    async def _limited(self, coro):
+        async with self._semaphore:
+            return await coro
+
+    async def _gather(self, coros) -> list:
+        """Executa em paralelo (até max_concurrency); exceções voltam como resultado"""
+        return await asyncio.gather(*(self._limited(c) for c in coros), return_exceptions=True)
+
+    async def send(self, client: discord.Client, recipient_ids: Iterable[int],
+                   priority: int = PRIORITY_APPROVAL, **kwargs) -> List[dict]:
+        """
+        Envia a mesma DM (embed, view, ...) para todos os destinatários
+
+        Args:
+            client: Bot
+            recipient_ids: IDs dos usuários (duplicados são ignorados)
+            priority: Classe de prioridade no agendador de saída
+            **kwargs: Argumentos de Messageable.send
+
+        Returns:
+            Lista de dicts (recipient_id, channel_id, message_id, message) dos envios
+            bem-sucedidos, na ordem dos destinatários
+        """
+        recipients = list(dict.fromkeys(recipient_ids))
+        # create_dm usa o canal em cache quando existe; senão, uma chamada (sem fetch_user)
+        results = await self._gather(outbound_scheduler.send_dm(client, rid, priority, **kwargs)
+                                     for rid in recipients)
+        sent = []
+        for recipient_id, result in zip(recipients, results):
+            if isinstance(result, BaseException):
+                self.failed += 1
+                print(f"⚠️ Erro ao enviar DM para {recipient_id}: {result}")
+                continue
+            self.sent += 1
+            sent.append({
+                'recipient_id': recipient_id,
+                'channel_id': result.channel.id,
+                'message_id': result.id,
+                'message': result
+            })
+        return sent
+
+    @staticmethod
+    def _partial(client: discord.Client, ref: dict) -> discord.PartialMessage:
+        # Mensagem parcial: funciona sem cache (ex.: após reinício do bot)
+        return client.get_partial_messageable(ref['channel_id']).get_partial_message(ref['message_id'])
+
+    async def edit(self, client: discord.Client, refs: Iterable[dict], **kwargs) -> int:
+        """Edita as mensagens referenciadas (channel_id, message_id); retorna quantas foram editadas"""
+        results = await self._gather(outbound_scheduler.edit(self._partial(client, ref), PRIORITY_APPROVAL, **kwargs)
+                                     for ref in refs)
+        ok = sum(1 for r in results if not isinstance(r, BaseException))
+        self.edited += ok
+        self.failed += len(results) - ok
+        return ok
+
+    async def delete(self, client: discord.Client, refs: Iterable[dict]) -> int:
+        """Apaga as mensagens referenciadas (channel_id, message_id); retorna quantas foram apagadas"""
+        results = await self._gather(outbound_scheduler.delete(self._partial(client, ref), PRIORITY_APPROVAL)
+                                     for ref in refs)
+        ok = sum(1 for r in results if not isinstance(r, BaseException))
+        self.deleted += ok
+        # Mensagem já apagada (404) não conta como falha
+        self.failed += sum(1 for r in results
+                           if isinstance(r, BaseException) and not isinstance(r, discord.NotFound))
+        return ok
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do fan-out"""
+        return {
+            'max_concurrency': self.max_concurrency,
+            'sent': self.sent,
+            'edited': self.edited,
+            'deleted': self.deleted,
+            'failed': self.failed
+        }
+
+# Instância global
+dm_fanout = DmFanout(max_concurrency=int(os.getenv("DM_FANOUT_CONCURRENCY", "8")))
@@ -0,0 +1,87 @@
+"""
+Gerador de IDs de transação monotônicos e ordenáveis
+Inteiro de 63 bits: milissegundos desde a época (41) + nó (10) + sequência (12).
+Até 4096 IDs por milissegundo por processo, sem colisão entre processos com nós diferentes
+"""
+import hashlib
+import os
+import socket
+import threading
+import time
+
+# 2024-01-01 00:00:00 UTC em milissegundos (41 bits duram ~69 anos a partir daqui)
+EPOCH_MS = 1704067200000
+
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+def default_node_id() -> int:
+    """
+    Nó do processo: ID_NODE (0-1023) se definido, senão derivado de host + PID
+
+    Em implantações com vários processos/máquinas, defina ID_NODE distinto
+    em cada um para garantir IDs sem colisão.
+    """
+    configured = os.getenv("ID_NODE")
+    if configured:
+        return int(configured) & MAX_NODE
+    digest = hashlib.blake2b(f"{socket.gethostname()}:{os.getpid()}".encode(), digest_size=2).digest()
+    return int.from_bytes(digest, "big") & MAX_NODE
+
+class IdGenerator:
+    def __init__(self, node_id: int = None):
+        """
+        Inicializa o gerador
+
+        Args:
+            node_id: Identificador do processo (0-1023); padrão em default_node_id()
+        """
+        self.node_id = (default_node_id() if node_id is None else node_id) & MAX_NODE
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+        self._pid = os.getpid()
+
+    def _now_ms(self) -> int:
+        return time.time_ns() // 1_000_000 - EPOCH_MS
+
+    def next_id(self) -> int:
+        """Retorna o próximo ID (estritamente crescente dentro do processo)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processo filho (fork): outro nó, senão repetiria a sequência do pai
+                self._pid = os.getpid()
+                self.node_id = default_node_id()
+                self._last_ms, self._sequence = -1, 0
+
+            now = self._now_ms()
+            if now < self._last_ms:
+                # Relógio voltou: continua no último milissegundo usado
+                now = self._last_ms
+
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequência esgotada neste milissegundo: espera o próximo
+                    while now <= self._last_ms:
+                        time.sleep(0.0001)
+                        now = self._now_ms()
+            else:
+                self._sequence = 0
+
+            self._last_ms = now
+            return (now << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+    def next_payment_id(self, prefix: str = "discord") -> str:
+        """ID de cobrança: prefixo + 16 dígitos hex (ordem alfabética = ordem de criação)"""
+        return f"{prefix}_{self.next_id():016x}"
+
+    @staticmethod
+    def timestamp_of(value: int) -> float:
+        """Unix timestamp (segundos) em que o ID foi gerado"""
+        return ((value >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000
+
+# Instância global
+id_generator = IdGenerator()
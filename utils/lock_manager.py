@@ -0,0 +1,96 @@
+"""
+Locks por conta (lock striping)
+Substitui o lock global de transações: operações em contas diferentes
+não se bloqueiam, e o mesmo lock funciona em threads e em corrotinas
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+class StripedLockManager:
+    def __init__(self, stripes: int = 256):
+        # Cada user_id cai sempre na mesma "faixa"; contas diferentes
+        # raramente compartilham o lock e nunca dependem de um lock global
+        self.stripes = stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self.contended = 0
+        self.acquired = 0
+
+    def _indexes(self, keys) -> list:
+        """Faixas únicas e ordenadas: a ordem fixa impede deadlock entre transferências."""
+        return sorted({hash(key) % self.stripes for key in keys})
+
+    @contextmanager
+    def acquire(self, *keys, timeout: float = -1):
+        """
+        Adquire (bloqueando a thread) os locks das contas informadas
+
+        Uso em threads (Flask, escritor do ledger, scripts):
+            with account_locks.acquire(user_a, user_b):
+                ...
+        """
+        held = []
+        try:
+            for index in self._indexes(keys):
+                lock = self._locks[index]
+                if not lock.acquire(blocking=False):
+                    self.contended += 1
+                    if not lock.acquire(timeout=timeout):
+                        raise TimeoutError(f"Timeout aguardando lock da conta (faixa {index})")
+                held.append(lock)
+            self.acquired += 1
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+    @asynccontextmanager
+    async def acquire_async(self, *keys, timeout: float = None):
+        """
+        Adquire os mesmos locks sem bloquear o event loop
+
+        Tenta sem bloquear e, se a faixa estiver ocupada, cede o loop com
+        espera crescente (até 5ms). Cancelamento é seguro: nenhum lock
+        fica preso, pois só é registrado depois de adquirido.
+
+        Uso em corrotinas (cogs e views):
+            async with account_locks.acquire_async(user_id):
+                ...
+        """
+        held = []
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            for index in self._indexes(keys):
+                lock = self._locks[index]
+                delay = 0.0005
+                if not lock.acquire(blocking=False):
+                    self.contended += 1
+                    while not lock.acquire(blocking=False):
+                        if deadline is not None and time.monotonic() >= deadline:
+                            raise TimeoutError(f"Timeout aguardando lock da conta (faixa {index})")
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, 0.005)
+                held.append(lock)
+            self.acquired += 1
+            yield
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+    def is_locked(self, key) -> bool:
+        """Verifica se a faixa da conta está ocupada (debug)"""
+        return self._locks[hash(key) % self.stripes].locked()
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas de uso dos locks"""
+        return {
+            'stripes': self.stripes,
+            'locked_stripes': sum(1 for lock in self._locks if lock.locked()),
+            'acquired': self.acquired,
+            'contended': self.contended
+        }
+
+# Instância global
+account_locks = StripedLockManager(int(os.getenv("ACCOUNT_LOCK_STRIPES", "256")))
@@ -0,0 +1,200 @@
+"""
+Modo resumo (digest) das notificações de pagamento
+Conta as liquidações de cada canal/vendedor numa janela deslizante; acima do
+limite, em vez de uma mensagem por pagamento, mantém uma mensagem de resumo
+que é editada periodicamente com os novos pagamentos. Abaixo do limite nada
+muda (mensagens individuais). O resumo se encerra depois de uma janela sem
+liquidações; a próxima rajada abre uma mensagem nova.
+
+Cada pagamento só é confirmado depois de aparecer numa edição bem-sucedida:
+o handler do outbox devolve a confirmação pendente (submit) e o despachante
+marca o evento como entregue quando ela resolve, sem segurar o lote.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+import discord
+
+from utils.outbound_scheduler import PRIORITY_NOTIFICATION, outbound_scheduler
+
+SCOPE_CHANNEL = "channel"
+SCOPE_SELLER = "seller"
+
+class _Digest:
+    __slots__ = ('render', 'send', 'message', 'view', 'shown', 'pending', 'last_edit', 'last_entry', 'wakeup')
+
+    def __init__(self, render: Callable[[list], dict], send: Callable[[dict], Awaitable]):
+        self.render = render
+        self.send = send
+        self.message = None
+        self.view = None
+        self.shown = []        # pagamentos já exibidos na mensagem (mais recentes primeiro)
+        self.pending = []      # (pagamento, future) aguardando a próxima edição
+        self.last_edit = 0.0
+        self.last_entry = time.monotonic()
+        self.wakeup = asyncio.Event()
+
+class NotificationDigest:
+    def __init__(self, scopes: tuple = (), window: float = 60, threshold: int = 10, edit_interval: float = 5,
+                 max_entries: int = 100):
+        """
+        Inicializa o modo resumo
+
+        Args:
+            scopes: Onde resumir: SCOPE_CHANNEL (canal da cobrança) e/ou SCOPE_SELLER (DM do vendedor)
+            window: Janela (segundos) da contagem; o resumo fecha após uma janela sem pagamentos
+            threshold: Pagamentos na janela acima dos quais o resumo substitui as mensagens individuais
+            edit_interval: Intervalo mínimo (segundos) entre edições da mensagem de resumo
+            max_entries: Pagamentos por mensagem de resumo antes de abrir outra
+        """
+        self.scopes = set(scopes)
+        self.window = window
+        self.threshold = threshold
+        self.edit_interval = edit_interval
+        self.max_entries = max_entries
+        self._recent: Dict[tuple, tuple] = {}   # (deque de (instante, payment_id), payment_ids na janela)
+        self._digests: Dict[tuple, _Digest] = {}
+        self.digested = 0
+        self.messages = 0
+        self.edits = 0
+        self.failed = 0
+
+    def submit(self, scope: str, key: int, entry: dict, render: Callable[[list], dict],
+               send: Callable[[dict], Awaitable]) -> Optional[asyncio.Future]:
+        """
+        Registra um pagamento liquidado no resumo do canal/vendedor
+
+        Args:
+            scope: SCOPE_CHANNEL ou SCOPE_SELLER
+            key: ID do canal ou do vendedor
+            entry: Dados do pagamento (payload do outbox, com payment_id)
+            render: Monta os argumentos da mensagem (embed, view) a partir dos pagamentos
+            send: Envia a primeira mensagem do resumo e retorna a discord.Message
+
+        Returns:
+            None se o pagamento deve ser notificado individualmente (modo desligado ou
+            abaixo do limite); senão, um future resolvido quando o pagamento aparecer
+            no resumo (com a exceção da edição, se ela falhar)
+        """
+        if scope not in self.scopes:
+            return None
+
+        now = time.monotonic()
+        digest_key = (scope, key)
+        # Só o primeiro envio de cada pagamento conta: reentregas do outbox não empurram o limite
+        recent, seen = self._recent.setdefault(digest_key, (deque(), set()))
+        while recent and now - recent[0][0] > self.window:
+            seen.discard(recent.popleft()[1])
+        if entry['payment_id'] not in seen:
+            recent.append((now, entry['payment_id']))
+            seen.add(entry['payment_id'])
+
+        digest = self._digests.get(digest_key)
+        if digest is None:
+            if len(recent) <= self.threshold:
+                return None
+            digest = self._digests[digest_key] = _Digest(render, send)
+            asyncio.get_running_loop().create_task(self._run(digest_key, digest), name=f"digest-{scope}-{key}")
+
+        # Reentrega do outbox de um pagamento que já está no resumo (ou a caminho)
+        for pending_entry, pending_future in digest.pending:
+            if pending_entry['payment_id'] == entry['payment_id']:
+                return pending_future
+        future = asyncio.get_running_loop().create_future()
+        if any(shown['payment_id'] == entry['payment_id'] for shown in digest.shown):
+            future.set_result(True)
+            return future
+
+        digest.pending.append((entry, future))
+        digest.last_entry = now
+        digest.wakeup.set()
+        self.digested += 1
+        return future
+
+    async def _run(self, digest_key: tuple, digest: _Digest):
+        while True:
+            now = time.monotonic()
+            if digest.pending:
+                wait = digest.last_edit + self.edit_interval - now
+                if wait <= 0:
+                    await self._flush(digest)
+                else:
+                    await asyncio.sleep(wait)
+                continue
+
+            idle = now - digest.last_entry
+            if idle >= self.window:
+                del self._digests[digest_key]
+                return
+            digest.wakeup.clear()
+            try:
+                await asyncio.wait_for(digest.wakeup.wait(), self.window - idle)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush(self, digest: _Digest):
+        batch, digest.pending = digest.pending, []
+        if len(digest.shown) >= self.max_entries:
+            # Resumo cheio: os próximos pagamentos vão para uma mensagem nova
+            # (o menu da mensagem antiga continua valendo até o timeout)
+            digest.message, digest.view, digest.shown = None, None, []
+        entries = [entry for entry, _ in reversed(batch)] + digest.shown
+
+        try:
+            kwargs = digest.render(entries)
+            if digest.message is None:
+                digest.message = await digest.send(kwargs)
+                self.messages += 1
+            else:
+                await outbound_scheduler.edit(digest.message, PRIORITY_NOTIFICATION, **kwargs)
+                self.edits += 1
+        except Exception as e:
+            self.failed += len(batch)
+            if isinstance(e, discord.NotFound):
+                # Mensagem de resumo apagada: a próxima tentativa abre outra
+                digest.message, digest.view, digest.shown = None, None, []
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            digest.shown = entries
+            # A view anterior (menu de reembolso) deixa de receber interações
+            if digest.view is not None and digest.view is not kwargs.get('view'):
+                digest.view.stop()
+            digest.view = kwargs.get('view')
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(True)
+        finally:
+            digest.last_edit = time.monotonic()
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do modo resumo"""
+        return {
+            'scopes': sorted(self.scopes),
+            'active': len(self._digests),
+            'digested': self.digested,
+            'messages': self.messages,
+            'edits': self.edits,
+            'failed': self.failed
+        }
+
+def _scopes_from_env(value: str) -> tuple:
+    value = value.strip().lower()
+    if value in ("", "off", "0", "false"):
+        return ()
+    if value in ("both", "all", "on", "1", "true"):
+        return (SCOPE_CHANNEL, SCOPE_SELLER)
+    return tuple(scope.strip() for scope in value.split(",") if scope.strip() in (SCOPE_CHANNEL, SCOPE_SELLER))
+
+# Instância global
+notification_digest = NotificationDigest(
+    scopes=_scopes_from_env(os.getenv("NOTIFICATION_DIGEST", "off")),
+    window=float(os.getenv("NOTIFICATION_DIGEST_WINDOW", "60")),
+    threshold=int(os.getenv("NOTIFICATION_DIGEST_THRESHOLD", "10")),
+    edit_interval=float(os.getenv("NOTIFICATION_DIGEST_EDIT_INTERVAL", "5")),
+    max_entries=int(os.getenv("NOTIFICATION_DIGEST_MAX_ENTRIES", "100"))
+)
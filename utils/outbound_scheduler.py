@@ -0,0 +1,406 @@
+"""
+Agendador central das mensagens enviadas pelo bot (canais, DMs, edições e exclusões)
+Cada envio entra numa fila com prioridade (aprovações > clientes > notificações)
+e só sai quando o bucket da rota no Discord tem vaga. Os buckets começam com
+limites conservadores e são corrigidos pelos cabeçalhos X-RateLimit-* das
+respostas (trace_config no cliente do bot); um 429 pausa a rota (ou tudo, se
+for global) pelo Retry-After. Com a rota saturada, notificações pendentes para
+o mesmo canal são enviadas juntas em uma única mensagem.
+"""
+import asyncio
+import bisect
+import copy
+import itertools
+import os
+import re
+import time
+from typing import Awaitable, Callable, Dict
+
+import discord
+
+PRIORITY_APPROVAL = 0
+PRIORITY_CUSTOMER = 1
+PRIORITY_NOTIFICATION = 2
+
+_PRIORITY_NAMES = {PRIORITY_APPROVAL: 'approval', PRIORITY_CUSTOMER: 'customer',
+                   PRIORITY_NOTIFICATION: 'notification'}
+
+# Limites do Discord para uma mensagem
+_MAX_EMBEDS = 10
+_MAX_CONTENT = 2000
+_MAX_COMPONENTS = 25
+
+_MESSAGE_PATH = re.compile(r"/channels/(\d+)/messages(/\d+)?$")
+
+def _embeds(kwargs: dict) -> list:
+    return [embed for embed in (kwargs.get('embeds') or [kwargs.get('embed')]) if embed is not None]
+
+def _components(kwargs: dict) -> int:
+    return len(kwargs['view'].children) if kwargs.get('view') is not None else 0
+
+def _copy_item(item: discord.ui.Item, number: int) -> discord.ui.Item:
+    """Cópia de um item para a mensagem agrupada; o callback continua ligado à view original"""
+    if isinstance(item, discord.ui.Button):
+        clone = discord.ui.Button(style=item.style, label=f"{item.label} {number}" if item.label else None,
+                                  disabled=item.disabled, custom_id=item.custom_id, url=item.url, emoji=item.emoji)
+        clone.callback = item.callback
+    else:
+        clone = copy.copy(item)
+        clone.row = None
+    return clone
+
+def _route(method: str, channel_id: int, message: bool = False) -> str:
+    """Chave da rota no mesmo formato do Discord (método + caminho com o parâmetro principal)"""
+    return f"{method} /channels/{channel_id}/messages" + ("/{message_id}" if message else "")
+
+class _Bucket:
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def wait(self, now: float) -> float:
+        """Segundos até a rota aceitar mais um envio (0: pode enviar)"""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+        return 0.0 if self.remaining > 0 else self.reset_at - now
+
+    def consume(self, now: float):
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        self.remaining -= 1
+
+class _Job:
+    __slots__ = ('priority', 'seq', 'route', 'factory', 'future', 'target', 'kwargs', 'user_id')
+
+    def __init__(self, priority: int, seq: int, route: str, factory: Callable[[], Awaitable],
+                 target=None, kwargs: dict = None, user_id: int = None):
+        self.priority = priority
+        self.seq = seq
+        self.route = route
+        self.factory = factory
+        self.future = asyncio.get_running_loop().create_future()
+        self.target = target        # canal, quando o envio pode ser agrupado
+        self.kwargs = kwargs
+        self.user_id = user_id      # DM: destinatário (o canal é descoberto no primeiro envio)
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class OutboundScheduler:
+    def __init__(self, global_rate: float = 50, route_limit: int = 5, route_window: float = 5.0,
+                 max_concurrency: int = 8):
+        """
+        Inicializa o agendador
+
+        Args:
+            global_rate: Máximo de requisições por segundo do bot inteiro
+            route_limit: Envios por rota até o primeiro cabeçalho de rate limit chegar
+            route_window: Janela (segundos) desse limite inicial
+            max_concurrency: Máximo de requisições em andamento
+        """
+        self.global_rate = global_rate
+        self.route_limit = route_limit
+        self.route_window = route_window
+        self.max_concurrency = max_concurrency
+        # Rajada curta: o limite global do Discord é contado em janelas de 1s
+        self._burst = max(1.0, global_rate / 10)
+        self._buckets: Dict[str, _Bucket] = {}
+        self._dm_channels: Dict[int, int] = {}
+        self._seq = itertools.count()
+        self._loop = None
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.global_pauses = 0
+
+    # ─── Fila ────────────────────────────────────────────────────────────────
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and not self._task.done():
+            return
+        self._loop = loop
+        self._queue = []
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._tokens = self._burst
+        self._tokens_at = time.monotonic()
+        self._global_until = 0.0
+        self._task = loop.create_task(self._run(), name="outbound-scheduler")
+
+    def _bucket(self, route: str) -> _Bucket:
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = self._buckets[route] = _Bucket(self.route_limit, self.route_window)
+        return bucket
+
+    async def _submit(self, job: _Job):
+        bisect.insort(self._queue, job)
+        self._wakeup.set()
+        return await job.future
+
+    def _global_wait(self, now: float) -> float:
+        if now < self._global_until:
+            return self._global_until - now
+        self._tokens = min(self._burst, self._tokens + (now - self._tokens_at) * self.global_rate)
+        self._tokens_at = now
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.global_rate
+
+    def _next_ready(self, now: float):
+        """Primeiro job (por prioridade) cuja rota tem vaga; senão, quanto esperar"""
+        wait = None
+        for index, job in enumerate(self._queue):
+            route_wait = self._bucket(job.route).wait(now)
+            if route_wait <= 0:
+                return self._queue.pop(index), 0.0
+            wait = route_wait if wait is None else min(wait, route_wait)
+        return None, wait
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            job = None
+            while job is None:
+                now = time.monotonic()
+                wait = self._global_wait(now)
+                if wait <= 0:
+                    job, wait = self._next_ready(now)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+
+            self._tokens -= 1
+            bucket = self._bucket(job.route)
+            batch = [job]
+            if job.target is not None:
+                batch += self._coalescible(job, bucket.remaining)
+            bucket.consume(time.monotonic())
+            self._loop.create_task(self._execute(batch))
+
+    def _coalescible(self, job: _Job, remaining: int) -> list:
+        """Notificações pendentes para o mesmo canal que cabem na mesma mensagem.
+
+        Só agrupa com a rota saturada: mais envios na fila do que vagas no bucket.
+        """
+        pending = [other for other in self._queue if other.route == job.route and other.target is not None]
+        if len(pending) < remaining:
+            return []
+        embeds = len(_embeds(job.kwargs))
+        content = len(job.kwargs.get('content') or "")
+        components = _components(job.kwargs)
+        batch = []
+        for other in pending:
+            embeds += len(_embeds(other.kwargs))
+            content += len(other.kwargs.get('content') or "") + 1
+            components += _components(other.kwargs)
+            if embeds > _MAX_EMBEDS or content > _MAX_CONTENT or components > _MAX_COMPONENTS:
+                break
+            batch.append(other)
+        for other in batch:
+            self._queue.remove(other)
+        return batch
+
+    async def _execute(self, batch: list):
+        try:
+            factory = batch[0].factory if len(batch) == 1 else self._merged_send(batch)
+            result = await factory()
+        except Exception as e:
+            self.failed += len(batch)
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+        else:
+            self.sent += 1
+            self.coalesced += len(batch) - 1
+            job = batch[0]
+            if job.user_id is not None and isinstance(result, discord.Message):
+                self._dm_channels[job.user_id] = result.channel.id
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_result(result)
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+    @staticmethod
+    def _merged_send(batch: list) -> Callable[[], Awaitable]:
+        """Uma mensagem com os textos, embeds e botões de todas as notificações (numerados)
+
+        Monta cópias: os embeds e views de cada envio ficam intactos caso o
+        envio agrupado falhe e o chamador tente de novo.
+        """
+        contents, embeds, items, timeout = [], [], [], None
+        for number, job in enumerate(batch, start=1):
+            kwargs = job.kwargs
+            if kwargs.get('content'):
+                contents.append(kwargs['content'])
+            for embed in _embeds(kwargs):
+                embed = embed.copy()
+                embed.title = f"{number}. {embed.title}" if embed.title else f"{number}."
+                embeds.append(embed)
+            view = kwargs.get('view')
+            if view is not None:
+                items += [_copy_item(item, number) for item in view.children]
+                if view.timeout is not None:
+                    timeout = max(timeout or 0, view.timeout)
+
+        merged = {'content': "\n".join(contents) or None, 'embeds': embeds}
+        if items:
+            merged_view = discord.ui.View(timeout=timeout)
+            for item in items:
+                merged_view.add_item(item)
+            merged['view'] = merged_view
+        target = batch[0].target
+        return lambda: target.send(**merged)
+
+    # ─── API ─────────────────────────────────────────────────────────────────
+
+    async def run(self, route: str, factory: Callable[[], Awaitable], priority: int = PRIORITY_NOTIFICATION):
+        """
+        Executa uma chamada à API do Discord quando a rota tiver vaga
+
+        Args:
+            route: Chave da rota (ex.: "POST /channels/123/messages")
+            factory: Função sem argumentos que retorna a corrotina da chamada
+            priority: PRIORITY_APPROVAL, PRIORITY_CUSTOMER ou PRIORITY_NOTIFICATION
+
+        Returns:
+            O resultado da chamada (exceções são propagadas)
+        """
+        self._ensure_started()
+        return await self._submit(_Job(priority, next(self._seq), route, factory))
+
+    async def send(self, channel: discord.abc.Messageable, priority: int = PRIORITY_NOTIFICATION,
+                   coalesce: bool = False, **kwargs) -> discord.Message:
+        """
+        Envia uma mensagem em um canal
+
+        Args:
+            channel: Canal de texto (ou parcial)
+            priority: Classe de prioridade
+            coalesce: Pode ser agrupada com outras do mesmo canal quando a rota saturar
+                      (só notificações; não vale para envios com arquivos)
+            **kwargs: Argumentos de Messageable.send
+
+        Returns:
+            A mensagem enviada (a mesma para envios agrupados)
+        """
+        self._ensure_started()
+        route = _route("POST", channel.id)
+        groupable = (coalesce and priority == PRIORITY_NOTIFICATION
+                     and not kwargs.get('file') and not kwargs.get('files'))
+        job = _Job(priority, next(self._seq), route, lambda: channel.send(**kwargs),
+                   target=channel if groupable else None, kwargs=kwargs)
+        return await self._submit(job)
+
+    async def send_dm(self, client: discord.Client, user, priority: int = PRIORITY_CUSTOMER,
+                      **kwargs) -> discord.Message:
+        """
+        Envia uma DM (sem fetch_user: o canal vem do cache ou de uma chamada create_dm)
+
+        Args:
+            client: Bot
+            user: Usuário ou ID do usuário
+            priority: Classe de prioridade
+            **kwargs: Argumentos de Messageable.send
+        """
+        self._ensure_started()
+        user_id = user if isinstance(user, int) else user.id
+        channel_id = self._dm_channels.get(user_id)
+        route = _route("POST", channel_id) if channel_id else f"DM {user_id}"
+
+        async def factory():
+            channel = await client.create_dm(discord.Object(id=user_id))
+            return await channel.send(**kwargs)
+
+        return await self._submit(_Job(priority, next(self._seq), route, factory, user_id=user_id))
+
+    async def edit(self, message, priority: int = PRIORITY_APPROVAL, **kwargs):
+        """Edita uma mensagem (completa ou parcial)"""
+        self._ensure_started()
+        route = _route("PATCH", message.channel.id, message=True)
+        return await self._submit(_Job(priority, next(self._seq), route, lambda: message.edit(**kwargs)))
+
+    async def delete(self, message, priority: int = PRIORITY_APPROVAL):
+        """Apaga uma mensagem (completa ou parcial)"""
+        self._ensure_started()
+        route = _route("DELETE", message.channel.id, message=True)
+        return await self._submit(_Job(priority, next(self._seq), route, lambda: message.delete()))
+
+    # ─── Cabeçalhos de rate limit ────────────────────────────────────────────
+
+    def observe(self, route: str, status: int, headers):
+        """
+        Ajusta os buckets com os cabeçalhos de uma resposta do Discord
+
+        Args:
+            route: Chave da rota (mesmo formato de run)
+            status: Status HTTP
+            headers: Cabeçalhos da resposta
+        """
+        now = time.monotonic()
+        if status == 429:
+            self.rate_limited += 1
+            retry_after = float(headers.get('Retry-After') or headers.get('X-RateLimit-Reset-After') or 1)
+            if headers.get('X-RateLimit-Global') or headers.get('X-RateLimit-Scope') == 'global':
+                self.global_pauses += 1
+                self._global_until = max(self._global_until, now + retry_after)
+                return
+            bucket = self._bucket(route)
+            bucket.remaining = 0
+            bucket.reset_at = now + retry_after
+            return
+
+        if 'X-RateLimit-Remaining' not in headers:
+            return
+        bucket = self._bucket(route)
+        bucket.limit = int(headers.get('X-RateLimit-Limit', bucket.limit))
+        bucket.remaining = min(bucket.remaining, int(headers['X-RateLimit-Remaining']))
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        if reset_after is not None:
+            bucket.reset_at = now + float(reset_after)
+
+    def trace_config(self):
+        """TraceConfig do aiohttp para o cliente do bot: commands.Bot(..., http_trace=...)"""
+        import aiohttp
+
+        async def on_request_end(session, context, params):
+            match = _MESSAGE_PATH.search(params.url.path)
+            if match is None:
+                return
+            route = _route(params.method, int(match.group(1)), message=match.group(2) is not None)
+            self.observe(route, params.response.status, params.response.headers)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do agendador"""
+        queued = {name: 0 for name in _PRIORITY_NAMES.values()}
+        for job in getattr(self, '_queue', []):
+            queued[_PRIORITY_NAMES[job.priority]] += 1
+        return {
+            'queued': queued,
+            'sent': self.sent,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'rate_limited': self.rate_limited,
+            'global_pauses': self.global_pauses,
+            'routes': len(self._buckets)
+        }
+
+# Instância global
+outbound_scheduler = OutboundScheduler(
+    global_rate=float(os.getenv("OUTBOUND_GLOBAL_RATE", "50")),
+    route_limit=int(os.getenv("OUTBOUND_ROUTE_LIMIT", "5")),
+    route_window=float(os.getenv("OUTBOUND_ROUTE_WINDOW", "5")),
+    max_concurrency=int(os.getenv("OUTBOUND_CONCURRENCY", "8"))
+)
@@ -0,0 +1,217 @@
+"""
+Cache de QR Codes PIX (PNG) endereçado pelo conteúdo
+A chave é o SHA-256 do código copia e cola: o mesmo PIX sempre gera o mesmo
+PNG. Renderização (qrcode/Pillow) e decodificação do base64 da MisticPay
+rodam em um pool fora do event loop; o resultado fica em um LRU limitado em
+bytes e, opcionalmente, em disco (sobrevive a reinícios do bot).
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import qrcode
+
+def render_png(data: str) -> bytes:
+    """Gera o PNG do QR Code (função de módulo para rodar também em outro processo)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def decode_base64_png(value: str) -> bytes:
+    """Decodifica o qrCodeBase64 da MisticPay (aceita o prefixo data:image/png;base64,)"""
+    if value.startswith("data:image"):
+        value = value.split(",", 1)[1]
+    return base64.b64decode(value, validate=True)
+
+class QrCodeCache:
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, disk_dir: str = None,
+                 workers: int = 2, use_processes: bool = False):
+        """
+        Inicializa o cache
+
+        Args:
+            max_bytes: Limite de memória dos PNGs mantidos (LRU)
+            disk_dir: Diretório do cache em disco (None desativa)
+            workers: Tamanho do pool de renderização
+            use_processes: Renderiza em processos (não disputa o GIL com o bot)
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.workers = workers
+        self.use_processes = use_processes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._executor = None
+        self._render_executor = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.decodes = 0
+
+    @staticmethod
+    def key_for(pix_code: str) -> str:
+        """Chave do cache: SHA-256 do código copia e cola"""
+        return hashlib.sha256(pix_code.encode()).hexdigest()
+
+    # ── Memória (LRU) ──
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+            return png
+
+    def _put_memory(self, key: str, png: bytes):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = png
+            self._size += len(png)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+
+    # ── Disco ──
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.png")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, png: bytes):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, path)  # Leitores nunca veem um arquivo pela metade
+        except OSError as e:
+            print(f"⚠️ Falha ao gravar QR Code em disco: {e}")
+
+    # ── Carregamento (fora do event loop) ──
+
+    def _load(self, key: str, pix_code: str, qr_base64: str = None) -> bytes:
+        """Disco -> base64 da MisticPay -> renderização local (roda no pool de threads)"""
+        if self.disk_dir:
+            png = self._read_disk(key)
+            if png:
+                self.disk_hits += 1
+                return png
+
+        png = None
+        if qr_base64:
+            try:
+                png = decode_base64_png(qr_base64)
+                self.decodes += 1
+            except ValueError as e:
+                print(f"⚠️ qrCodeBase64 inválido, gerando QR Code localmente: {e}")
+        if png is None:
+            if self._render_executor is not None:
+                png = self._render_executor.submit(render_png, pix_code).result()
+            else:
+                png = render_png(pix_code)
+            self.renders += 1
+
+        if self.disk_dir:
+            self._write_disk(key, png)
+        return png
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qr")
+            if self.use_processes:
+                self._render_executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def get_png(self, pix_code: str, qr_base64: str = None) -> bytes:
+        """
+        Retorna o PNG do QR Code do PIX
+
+        Args:
+            pix_code: Código PIX copia e cola (define a chave do cache)
+            qr_base64: QR Code enviado pela MisticPay, se houver (evita renderizar)
+
+        Returns:
+            Bytes do PNG
+        """
+        key = self.key_for(pix_code)
+        png = self._get_memory(key)
+        if png is not None:
+            self.hits += 1
+            return png
+
+        # Cliques simultâneos no mesmo PIX aguardam uma única carga
+        future = self._inflight.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), self._load, key, pix_code, qr_base64
+            )
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._loaded(key, f))
+        # shield: um clique cancelado não cancela a carga dos demais
+        return await asyncio.shield(future)
+
+    def _loaded(self, key: str, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self._put_memory(key, future.result())
+
+    def warm(self, pix_code: str, qr_base64: str = None):
+        """Agenda a carga do QR Code em segundo plano (ex.: logo após criar a cobrança)"""
+        task = asyncio.get_running_loop().create_task(self.get_png(pix_code, qr_base64))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do cache"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'renders': self.renders,
+            'decodes': self.decodes,
+            'disk_dir': self.disk_dir
+        }
+
+    def shutdown(self):
+        """Encerra os pools de renderização"""
+        for executor in (self._executor, self._render_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._render_executor = None
+
+# Instância global
+qr_cache = QrCodeCache(
+    max_bytes=int(os.getenv("QR_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    disk_dir=os.getenv("QR_CACHE_DIR") or None,
+    workers=int(os.getenv("QR_RENDER_WORKERS", "2")),
+    use_processes=os.getenv("QR_RENDER_POOL", "thread").lower() == "process"
+)
@@ -0,0 +1,62 @@
+"""
+Deduplicação de webhooks MisticPay
+Cache em memória dos IDs de transação já processados (caminho rápido).
+A garantia definitiva é a restrição única de webhook_events no banco.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+class RecentIdCache:
+    def __init__(self, capacity: int = 10000):
+        """
+        Inicializa o cache LRU de IDs recentes
+
+        Args:
+            capacity: Quantidade máxima de IDs mantidos em memória
+        """
+        self.capacity = capacity
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def seen(self, key: str) -> bool:
+        """
+        Verifica se o ID já foi processado (e o marca como recente)
+
+        Returns:
+            True se é uma entrega repetida
+        """
+        with self._lock:
+            if key in self._ids:
+                self._ids.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, key: str):
+        """Registra um ID processado, descartando o mais antigo se cheio"""
+        with self._lock:
+            self._ids[key] = True
+            self._ids.move_to_end(key)
+            while len(self._ids) > self.capacity:
+                self._ids.popitem(last=False)
+
+    def clear(self):
+        """Esvazia o cache (o banco continua deduplicando)"""
+        with self._lock:
+            self._ids.clear()
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do cache"""
+        return {
+            'size': len(self._ids),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+# Instância global
+webhook_dedupe = RecentIdCache(int(os.getenv("WEBHOOK_DEDUPE_CACHE_SIZE", "10000")))
@@ -0,0 +1,405 @@
+"""
+Caixa de entrada durável dos webhooks MisticPay
+O endpoint só grava o corpo e os headers em webhook_inbox e responde 200;
+um pool de workers processa a fila em ordem, com retry, backoff e dead-letter.
+Os workers são threads (servidor Flask) ou tasks no event loop do bot
+(servidor aiohttp, com o banco assíncrono).
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+
+import database
+import database_async
+
+# Status de uma entrada da caixa
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+DEAD = "dead"
+
+# Comandos compartilhados pelos caminhos síncrono e assíncrono
+_APPEND_SQL = """
+    INSERT INTO webhook_inbox (body, headers, status, next_attempt_at)
+    VALUES (?, ?, ?, 0)
+"""
+_CLAIM_SQL = """
+    UPDATE webhook_inbox
+    SET status = ?, locked_by = ?, attempts = attempts + 1, next_attempt_at = ?
+    WHERE id = (
+        SELECT id FROM webhook_inbox
+        WHERE status IN (?, ?) AND next_attempt_at <= ?
+        ORDER BY id LIMIT 1
+    )
+    RETURNING id, body, headers, attempts
+"""
+_COMPLETE_SQL = """
+    UPDATE webhook_inbox SET status = ?, last_error = NULL, processed_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND status = ? AND locked_by = ?
+"""
+_DEAD_SQL = """
+    UPDATE webhook_inbox SET status = ?, last_error = ?, processed_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND status = ? AND locked_by = ?
+"""
+_RETRY_SQL = """
+    UPDATE webhook_inbox SET status = ?, last_error = ?, next_attempt_at = ?
+    WHERE id = ? AND status = ? AND locked_by = ?
+"""
+
+def _entry(row) -> dict:
+    if not row:
+        return None
+    return {"id": row[0], "body": row[1], "headers": json.loads(row[2] or "{}"), "attempts": row[3]}
+
+class WebhookInbox:
+    def __init__(self, max_attempts: int = 8, backoff_base: float = 2.0, backoff_max: float = 300.0,
+                 lease: float = 120.0):
+        """
+        Inicializa a caixa de entrada
+
+        Args:
+            max_attempts: Tentativas antes de mover a entrada para dead-letter
+            backoff_base: Espera (segundos) após a primeira falha; dobra a cada tentativa
+            backoff_max: Espera máxima entre tentativas
+            lease: Validade (segundos) da reserva de um worker; vencida, outro
+                   worker (de qualquer processo) pode reservar a entrada de novo
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        # Acorda os workers assim que algo é gravado (sem esperar o polling)
+        self.new_item = threading.Event()
+
+    def append(self, body: str, headers: dict = None) -> int:
+        """Grava um webhook recebido e retorna o ID da entrada"""
+        cursor = database.get_connection().execute(_APPEND_SQL, (body, json.dumps(headers or {}), PENDING))
+        self.new_item.set()
+        return cursor.lastrowid
+
+    async def append_async(self, body: str, headers: dict = None) -> int:
+        """Como append, pela conexão de escrita do banco assíncrono (no event loop)"""
+        cursor = await database_async._execute(_APPEND_SQL, (body, json.dumps(headers or {}), PENDING))
+        self.new_item.set()
+        return cursor.lastrowid
+
+    def _claim_params(self, worker_id: str) -> tuple:
+        now = time.time()
+        return (PROCESSING, worker_id, now + self.lease, PENDING, PROCESSING, now)
+
+    def claim(self, worker_id: str) -> dict:
+        """
+        Reserva a próxima entrada pronta (a mais antiga primeiro)
+
+        A reserva é um único UPDATE ... RETURNING, então dois workers (ou
+        dois processos) nunca pegam a mesma entrada. Ela vale por `lease`
+        segundos (em next_attempt_at): se o worker morrer no meio, a entrada
+        volta a ser reservável quando a reserva vence, sem que um processo
+        recém-iniciado tome as entradas dos workers vivos.
+
+        Returns:
+            Dict com id, body, headers e attempts, ou None se a fila estiver vazia
+        """
+        with database.transaction() as cursor:
+            row = cursor.execute(_CLAIM_SQL, self._claim_params(worker_id)).fetchone()
+        return _entry(row)
+
+    async def claim_async(self, worker_id: str) -> dict:
+        """Como claim, pelo banco assíncrono"""
+        async with database_async.transaction() as conn:
+            async with conn.execute(_CLAIM_SQL, self._claim_params(worker_id)) as cursor:
+                row = await cursor.fetchone()
+        return _entry(row)
+
+    def complete(self, entry_id: int, worker_id: str) -> bool:
+        """
+        Marca a entrada como processada
+
+        Só vale enquanto a entrada ainda estiver reservada por este worker;
+        se a reserva venceu e outro worker a pegou, a conclusão é ignorada.
+
+        Returns:
+            True se a entrada foi concluída
+        """
+        cursor = database.get_connection().execute(_COMPLETE_SQL, (DONE, entry_id, PROCESSING, worker_id))
+        return cursor.rowcount > 0
+
+    async def complete_async(self, entry_id: int, worker_id: str) -> bool:
+        """Como complete, pelo banco assíncrono"""
+        cursor = await database_async._execute(_COMPLETE_SQL, (DONE, entry_id, PROCESSING, worker_id))
+        return cursor.rowcount > 0
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    def _fail_command(self, entry_id: int, worker_id: str, attempts: int, error: str) -> tuple:
+        if attempts >= self.max_attempts:
+            return DEAD, _DEAD_SQL, (DEAD, error, entry_id, PROCESSING, worker_id)
+        next_attempt = time.time() + self._retry_delay(attempts)
+        return PENDING, _RETRY_SQL, (PENDING, error, next_attempt, entry_id, PROCESSING, worker_id)
+
+    def fail(self, entry_id: int, worker_id: str, attempts: int, error: str) -> str:
+        """
+        Registra uma falha: agenda nova tentativa com backoff ou move para dead-letter
+
+        Como complete, só vale enquanto a entrada estiver reservada por este worker.
+
+        Returns:
+            Novo status da entrada, ou None se a reserva já não era deste worker
+        """
+        status, sql, params = self._fail_command(entry_id, worker_id, attempts, error)
+        cursor = database.get_connection().execute(sql, params)
+        return status if cursor.rowcount else None
+
+    async def fail_async(self, entry_id: int, worker_id: str, attempts: int, error: str) -> str:
+        """Como fail, pelo banco assíncrono"""
+        status, sql, params = self._fail_command(entry_id, worker_id, attempts, error)
+        cursor = await database_async._execute(sql, params)
+        return status if cursor.rowcount else None
+
+    def list_dead(self, limit: int = 50) -> list:
+        """Lista as entradas em dead-letter (mais recentes primeiro)"""
+        return database.get_connection().execute("""
+            SELECT id, attempts, last_error, received_at, body FROM webhook_inbox
+            WHERE status = ? ORDER BY id DESC LIMIT ?
+        """, (DEAD, limit)).fetchall()
+
+    def replay_dead(self, entry_ids: list = None) -> int:
+        """
+        Devolve entradas em dead-letter para a fila, com as tentativas zeradas
+
+        Args:
+            entry_ids: IDs a reenviar; None reenvia todas
+
+        Returns:
+            Quantidade de entradas reenviadas
+        """
+        conn = database.get_connection()
+        if entry_ids:
+            placeholders = ",".join("?" for _ in entry_ids)
+            cursor = conn.execute(f"""
+                UPDATE webhook_inbox SET status = ?, attempts = 0, next_attempt_at = 0
+                WHERE status = ? AND id IN ({placeholders})
+            """, (PENDING, DEAD, *entry_ids))
+        else:
+            cursor = conn.execute("""
+                UPDATE webhook_inbox SET status = ?, attempts = 0, next_attempt_at = 0 WHERE status = ?
+            """, (PENDING, DEAD))
+        self.new_item.set()
+        return cursor.rowcount
+
+    def get_stats(self) -> dict:
+        """Retorna a quantidade de entradas por status"""
+        rows = database.get_connection().execute(
+            "SELECT status, COUNT(*) FROM webhook_inbox GROUP BY status"
+        ).fetchall()
+        stats = {PENDING: 0, PROCESSING: 0, DONE: 0, DEAD: 0}
+        stats.update(dict(rows))
+        return stats
+
+class InboxWorkerPool:
+    def __init__(self, inbox: WebhookInbox, workers: int = 4, poll_interval: float = 1.0):
+        """
+        Inicializa o pool de workers da caixa de entrada
+
+        Args:
+            inbox: Caixa de entrada a ser drenada
+            workers: Quantidade de threads processando
+            poll_interval: Intervalo máximo entre verificações da fila (segundos)
+        """
+        self.inbox = inbox
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.handler = None
+        self._threads = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.processed = 0
+        self.failed = 0
+
+    def start(self, handler):
+        """
+        Inicia os workers (idempotente)
+
+        Args:
+            handler: Função handler(data: dict, headers: dict); uma exceção
+                     conta como falha e agenda nova tentativa
+        """
+        self.handler = handler
+        if self._threads and self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._start_lock:
+            if self._threads and self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run, args=(f"{os.getpid()}-{uuid.uuid4().hex[:6]}-{i}",),
+                                 name=f"webhook-inbox-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Para os workers (as entradas pendentes continuam no banco)"""
+        self._stop.set()
+        self.inbox.new_item.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                entry = self.inbox.claim(worker_id)
+            except Exception as e:
+                print(f"Erro ao ler a caixa de webhooks: {e}")
+                entry = None
+
+            if entry is None:
+                self.inbox.new_item.wait(self.poll_interval)
+                self.inbox.new_item.clear()
+                continue
+
+            self._process(worker_id, entry)
+
+    def _process(self, worker_id: str, entry: dict):
+        try:
+            self.handler(json.loads(entry["body"]), entry["headers"])
+        except Exception as e:
+            self.failed += 1
+            error = f"{type(e).__name__}: {e}"
+            try:
+                status = self.inbox.fail(entry["id"], worker_id, entry["attempts"], error)
+            except Exception:
+                traceback.print_exc()
+                return
+            if status == DEAD:
+                print(f"☠️ Webhook #{entry['id']} movido para dead-letter após {entry['attempts']} tentativas: {error}")
+            else:
+                print(f"⚠️ Webhook #{entry['id']} falhou (tentativa {entry['attempts']}): {error}")
+            return
+
+        self.processed += 1
+        if not self.inbox.complete(entry["id"], worker_id):
+            print(f"⚠️ Webhook #{entry['id']} concluído após a reserva vencer (já retomado por outro worker)")
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do pool"""
+        return {
+            'workers': sum(1 for t in self._threads if t.is_alive()),
+            'processed': self.processed,
+            'failed': self.failed
+        }
+
+class AsyncInboxWorkerPool:
+    def __init__(self, inbox: WebhookInbox, workers: int = 4, poll_interval: float = 1.0):
+        """
+        Inicializa o pool de workers assíncronos (tasks no event loop do bot)
+
+        Args:
+            inbox: Caixa de entrada a ser drenada
+            workers: Quantidade de tasks processando
+            poll_interval: Intervalo máximo entre verificações da fila (segundos)
+        """
+        self.inbox = inbox
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.handler = None
+        self._tasks = []
+        self._wakeup = None
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self, handler):
+        """
+        Inicia os workers no loop atual (idempotente)
+
+        Args:
+            handler: Corrotina handler(data: dict, headers: dict); uma exceção
+                     conta como falha e agenda nova tentativa
+        """
+        self.handler = handler
+        if self._tasks and all(not t.done() for t in self._tasks):
+            return
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._run(f"{os.getpid()}-{uuid.uuid4().hex[:6]}-a{i}"), name=f"webhook-inbox-{i}")
+            for i in range(self.workers)
+        ]
+
+    def notify(self):
+        """Acorda os workers (chamar no loop, logo após gravar uma entrada)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        """Para os workers (as entradas pendentes continuam no banco)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: str):
+        while True:
+            try:
+                entry = await self.inbox.claim_async(worker_id)
+            except Exception as e:
+                print(f"Erro ao ler a caixa de webhooks: {e}")
+                entry = None
+
+            if entry is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            await self._process(worker_id, entry)
+
+    async def _process(self, worker_id: str, entry: dict):
+        try:
+            await self.handler(json.loads(entry["body"]), entry["headers"])
+        except Exception as e:
+            self.failed += 1
+            error = f"{type(e).__name__}: {e}"
+            try:
+                status = await self.inbox.fail_async(entry["id"], worker_id, entry["attempts"], error)
+            except Exception:
+                traceback.print_exc()
+                return
+            if status == DEAD:
+                print(f"☠️ Webhook #{entry['id']} movido para dead-letter após {entry['attempts']} tentativas: {error}")
+            else:
+                print(f"⚠️ Webhook #{entry['id']} falhou (tentativa {entry['attempts']}): {error}")
+            return
+
+        self.processed += 1
+        if not await self.inbox.complete_async(entry["id"], worker_id):
+            print(f"⚠️ Webhook #{entry['id']} concluído após a reserva vencer (já retomado por outro worker)")
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do pool"""
+        return {
+            'workers': sum(1 for t in self._tasks if not t.done()),
+            'processed': self.processed,
+            'failed': self.failed
+        }
+
+# Instâncias globais
+webhook_inbox = WebhookInbox(
+    max_attempts=int(os.getenv("WEBHOOK_INBOX_MAX_ATTEMPTS", "8")),
+    backoff_base=float(os.getenv("WEBHOOK_INBOX_BACKOFF_BASE", "2")),
+    backoff_max=float(os.getenv("WEBHOOK_INBOX_BACKOFF_MAX", "300")),
+    lease=float(os.getenv("WEBHOOK_INBOX_LEASE", "120"))
+)
+inbox_workers = InboxWorkerPool(webhook_inbox, workers=int(os.getenv("WEBHOOK_INBOX_WORKERS", "4")))
+async_inbox_workers = AsyncInboxWorkerPool(webhook_inbox, workers=int(os.getenv("WEBHOOK_INBOX_WORKERS", "4")))
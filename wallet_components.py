@@ -208,3 +208,40 @@ def criar_embed_notificacao_pagamento(
     
     embed.set_footer(text="Saldo atualizado automaticamente")
     return embed
+
+def criar_embed_resumo_pagamentos(
+    pagamentos: list,
+    mostrar_vendedor: bool = True,
+    emoji_sucesso: str = "✅",
+    max_linhas: int = 20
+) -> discord.Embed:
+    """Cria o embed do resumo de pagamentos (modo digest), mais recentes primeiro."""
+    
+    total = sum(p["amount"] for p in pagamentos)
+    linhas = []
+    for p in pagamentos[:max_linhas]:
+        quem = f"<@{p['receiver_id']}>" if mostrar_vendedor else f"`{p['payment_id']}`"
+        linhas.append(f"{emoji_sucesso} **R$ {p['amount']:.2f}** • {quem} • `{p['ref']}`")
+    if len(pagamentos) > max_linhas:
+        linhas.append(f"… e mais {len(pagamentos) - max_linhas} pagamento(s)")
+    
+    embed = discord.Embed(
+        title=f"{emoji_sucesso} Vendas Aprovadas",
+        description="\n".join(linhas),
+        color=discord.Color.green()
+    )
+    
+    embed.add_field(
+        name="🧾 Pagamentos",
+        value=str(len(pagamentos)),
+        inline=True
+    )
+    
+    embed.add_field(
+        name="💰 Total Líquido",
+        value=f"**R$ {total:.2f}**",
+        inline=True
+    )
+    
+    embed.set_footer(text="Resumo atualizado automaticamente")
+    return embed
@@ -1,17 +1,25 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from aiohttp import web
 import os
 from dotenv import load_dotenv
 from payment_handler import MisticPayHandler
-from database import add_balance, get_payment_channel, add_transaction_history, safe_add_balance
+from database import settle_payment
+import database_async
 import hmac
 import hashlib
+import json
 import discord
 from discord.ext import commands
-import asyncio
 import threading
-from wallet_components import criar_embed_notificacao_pagamento
+from wallet_components import criar_embed_notificacao_pagamento, criar_embed_resumo_pagamentos
 from utils.webhook_validator import webhook_validator
+from utils.webhook_dedupe import webhook_dedupe
+from utils.circuit_breaker import misticpay_breaker
+from utils.webhook_inbox import webhook_inbox, inbox_workers, async_inbox_workers
+from utils.bot_events import bot_event_consumer
+from utils.outbound_scheduler import PRIORITY_NOTIFICATION, outbound_scheduler
+from utils.notification_digest import SCOPE_CHANNEL, SCOPE_SELLER, notification_digest
 from utils.logger import setup_logger
 
 load_dotenv()
@@ -20,6 +28,8 @@ app = Flask(__name__)
 CORS(app)
 payment_handler = MisticPayHandler()
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "5000"))
 
 # Logger
 logger = None  # Será setado pelo main.py
@@ -48,84 +58,26 @@ def webhook_test():
 
 @app.route("/webhook", methods=["POST"])
 def misticpay_webhook():
-    """Webhook para receber notificações de pagamento MisticPay."""
+    """Recebe o webhook MisticPay, grava na caixa de entrada durável e responde na hora.
+    
+    O processamento (liquidação e notificação) fica com os workers da caixa
+    de entrada, com retry, backoff e dead-letter (ver utils/webhook_inbox.py).
+    """
     
     try:
         # Obter dados
         data = request.get_json()
-        payload = request.get_data().decode('utf-8')
-        signature = request.headers.get("X-Signature", "")
-        
-        # Log DETALHADO do webhook recebido
-        event_type = data.get('event', 'unknown') if data else 'unknown'
-        if logger:
-            logger.info(f"🔔 [WEBHOOK] Evento recebido: {event_type}")
-            logger.info(f"📨 [WEBHOOK] Payload completo: {data}")
-            logger.info(f"📋 [WEBHOOK] Data field: {data.get('data', {}) if data else 'Nenhum'}")
         
-        print(f"\n{'='*80}")
-        print(f"[Webhook Server] ⏰ {__import__('datetime').datetime.now().isoformat()}")
-        print(f"[Webhook Server] 📨 Payload completo:")
-        print(f"{data}")
-        print(f"[Webhook Server] 🔍 Event type: {event_type}")
-        print(f"[Webhook Server] 📋 Data field: {data.get('data', {}) if data else 'Nenhum'}")
-        print(f"{'='*80}\n")
+        # Caminho rápido: entrega repetida de um transactionId já processado
+        result = payment_handler.parse_webhook(data)
+        if result and webhook_dedupe.seen(result["event_id"]):
+            return jsonify({"status": "duplicate", "payment_id": result["payment_id"]}), 200
         
-        # Validar webhook com sistema de segurança (DESABILITADO TEMPORARIAMENTE)
-        # if not webhook_validator.validate_webhook(payload, signature, data):
-        #     if logger:
-        #         logger.warning("Webhook rejeitado: validação falhou")
-        #     return jsonify({"status": "invalid"}), 401
+        # Gravar corpo e headers originais antes de responder
+        inbox_id = webhook_inbox.append(request.get_data(as_text=True), dict(request.headers))
+        inbox_workers.start(processar_webhook)
         
-        # Processar webhook
-        result = payment_handler.verify_webhook(data)
-        
-        if result and result["status"] == "completed":
-            receiver_id = result["receiver_id"]
-            amount = result["amount"]
-            payment_id = result["payment_id"]
-            
-            # Extrair ref do MisticPay
-            ref = data.get("data", {}).get("id", payment_id)
-            gross_amount = amount
-            
-            # Log da transação
-            if logger:
-                logger.info(f"Pagamento confirmado: UserID {receiver_id} | R$ {amount:.2f} | ID {payment_id}")
-            
-            # Adiciona saldo ao vendedor COM SEGURANÇA (evita race conditions)
-            safe_add_balance(
-                receiver_id, 
-                amount, 
-                f"Pagamento recebido - PIX"
-            )
-            
-            # Adicionar ao histórico detalhado
-            add_transaction_history(
-                receiver_id,
-                "payment",
-                amount,
-                f"Pagamento recebido",
-                gross_amount=gross_amount,
-                misticpay_ref=ref
-            )
-            
-            # Notificar no Discord via bot
-            if bot_instance:
-                asyncio.run_coroutine_threadsafe(
-                    notificar_pagamento(receiver_id, amount, payment_id, ref, gross_amount),
-                    bot_instance.loop
-                )
-            
-            return jsonify({
-                "status": "success",
-                "receiver_id": receiver_id,
-                "amount": amount,
-                "payment_id": payment_id,
-                "ref": ref
-            }), 200
-        
-        return jsonify({"status": "no_action"}), 200
+        return jsonify({"status": "queued", "inbox_id": inbox_id}), 200
         
     except Exception as e:
         if logger:
@@ -133,84 +85,332 @@ def misticpay_webhook():
         print(f"Erro no webhook: {e}")
         return jsonify({"status": "error", "message": str(e)}), 400
 
-async def notificar_pagamento(receiver_id: int, amount: float, payment_id: str, ref: str, gross_amount: float):
-    """Notifica o pagamento no canal e envia DM ao usuário"""
+def _registrar_recebimento(data: dict, headers: dict):
+    """Loga o webhook recebido (mesma saída nos dois servidores)."""
+    payload = json.dumps(data)
+    signature = headers.get("X-Signature", "")
+    
+    # Log DETALHADO do webhook recebido
+    event_type = data.get('event', 'unknown') if data else 'unknown'
+    if logger:
+        logger.info(f"🔔 [WEBHOOK] Evento recebido: {event_type}")
+        logger.info(f"📨 [WEBHOOK] Payload completo: {data}")
+        logger.info(f"📋 [WEBHOOK] Data field: {data.get('data', {}) if data else 'Nenhum'}")
+    
+    print(f"\n{'='*80}")
+    print(f"[Webhook Server] ⏰ {__import__('datetime').datetime.now().isoformat()}")
+    print(f"[Webhook Server] 📨 Payload completo:")
+    print(f"{data}")
+    print(f"[Webhook Server] 🔍 Event type: {event_type}")
+    print(f"[Webhook Server] 📋 Data field: {data.get('data', {}) if data else 'Nenhum'}")
+    print(f"{'='*80}\n")
+    
+    # Validar webhook com sistema de segurança (DESABILITADO TEMPORARIAMENTE)
+    # if not webhook_validator.validate_webhook(payload, signature, data):
+    #     if logger:
+    #         logger.warning("Webhook rejeitado: validação falhou")
+    #     return {"status": "invalid"}
+
+def _resultado_liquidacao(result: dict, settlement: dict) -> dict:
+    """Traduz o resultado de settle_payment na resposta do processamento.
+    
+    Pagamento ainda não registrado levanta LookupError (nova tentativa).
+    """
+    if not settlement:
+        # O webhook pode chegar antes de a cobrança ser registrada: tentar de novo depois
+        if logger:
+            logger.warning(f"Pagamento não encontrado: ID {result['payment_id']}")
+        raise LookupError(f"Pagamento não encontrado: '{result['payment_id']}'")
+    
+    receiver_id = settlement["receiver_id"]
+    amount = settlement["amount"]
+    payment_id = settlement["payment_id"]
+    ref = settlement["ref"]
+    webhook_dedupe.add(result["event_id"])
+    
+    if settlement["duplicate"]:
+        return {"status": "duplicate", "payment_id": payment_id}
+    
+    if not settlement["settled"]:
+        # Pagamento já liquidado (webhook reenviado): nada a creditar nem notificar
+        if logger:
+            logger.info(f"Pagamento já liquidado: ID {payment_id}")
+        return {"status": "already_processed", "payment_id": payment_id}
+    
+    # Log da transação
+    if logger:
+        logger.info(f"Pagamento confirmado: UserID {receiver_id} | R$ {amount:.2f} | ID {payment_id}")
+    
+    return {
+        "status": "success",
+        "receiver_id": receiver_id,
+        "amount": amount,
+        "payment_id": payment_id,
+        "ref": ref
+    }
+
+def processar_webhook(data: dict, headers: dict = None) -> dict:
+    """Processa um webhook da caixa de entrada (roda nos workers em thread).
+    
+    Uma exceção faz o worker agendar nova tentativa com backoff.
+    """
+    _registrar_recebimento(data, headers or {})
+    
+    # Processar webhook
+    result = payment_handler.parse_webhook(data)
+    if not result:
+        return {"status": "no_action"}
+    
+    # Liquidação em uma única transação: resolve o pagamento, registra o
+    # event_id (restrição única), marca como 'completed', credita o
+    # vendedor, grava o histórico e as notificações no outbox do bot
+    settlement = settle_payment(result["payment_id"], result["amount"], result["ref"], result["event_id"])
+    resposta = _resultado_liquidacao(result, settlement)
+    
+    # As notificações saem pelo despachante do outbox (utils/bot_events.py)
+    if resposta["status"] == "success":
+        bot_event_consumer.notify()
+    
+    return resposta
+
+async def processar_webhook_async(data: dict, headers: dict = None) -> dict:
+    """Como processar_webhook, nos workers assíncronos (event loop do bot).
+    
+    Liquida pelo banco assíncrono, sem troca de thread.
+    """
+    _registrar_recebimento(data, headers or {})
+    
+    result = payment_handler.parse_webhook(data)
+    if not result:
+        return {"status": "no_action"}
+    
+    settlement = await database_async.settle_payment(
+        result["payment_id"], result["amount"], result["ref"], result["event_id"]
+    )
+    resposta = _resultado_liquidacao(result, settlement)
+    
+    if resposta["status"] == "success":
+        bot_event_consumer.notify()
+    
+    return resposta
+
+async def _usuario(user_id: int) -> discord.User:
+    return bot_instance.get_user(user_id) or await bot_instance.fetch_user(user_id)
+
+def _exigir_bot():
+    # Antes do login (ou sem bot neste processo) a entrega fica para a próxima tentativa
+    if bot_instance is None or not bot_instance.is_ready():
+        raise RuntimeError("Bot ainda não está conectado")
+
+def _resumo_canal(pagamentos: list) -> dict:
+    """Mensagem de resumo do canal: lista dos pagamentos + menu de rembolso"""
+    from ui_components import ReebolsarResumoView
+    return {
+        "embed": criar_embed_resumo_pagamentos(pagamentos),
+        "view": ReebolsarResumoView(pagamentos, taxa_fixa=TAXA_REEMBOLSO_FIXA)
+    }
+
+def _resumo_vendedor(pagamentos: list) -> dict:
+    """Mensagem de resumo na DM do vendedor"""
+    return {"embed": criar_embed_resumo_pagamentos(pagamentos, mostrar_vendedor=False)}
+
+async def enviar_notificacao_canal(payload: dict):
+    """Posta a confirmação do pagamento (com o botão de rembolso) no canal da cobrança.
+    
+    Roda no despachante do outbox: uma exceção agenda nova tentativa. Canal
+    apagado ou sem permissão não tem como ser entregue e é descartado. Com o
+    modo resumo ligado e o canal movimentado, o pagamento entra na mensagem de
+    resumo e a confirmação pendente é devolvida ao despachante.
+    """
+    _exigir_bot()
+    receiver_id = payload["receiver_id"]
+    
     try:
-        # Buscar usuário que recebeu o pagamento
-        user = await bot_instance.fetch_user(receiver_id)
-        user_mention = f"<@{receiver_id}>"
-        
-        # Buscar canal onde foi criada a cobrança
-        channel_id = get_payment_channel(payment_id)
-        
-        # Enviar mensagem no canal se houver
-        if channel_id and bot_instance:
-            try:
-                channel = bot_instance.get_channel(channel_id)
-                if channel:
-                    # Importar a View de rembolso
-                    from ui_components import ReebolsarPagamentoView
-                    
-                    # Criar embed com nova notificação
-                    embed = criar_embed_notificacao_pagamento(
-                        cliente=user_mention,  # Usar mention do usuário que recebeu
-                        vendedor=user.name,
-                        valor=amount,
-                        valor_bruto=gross_amount,
-                        ref=ref,
-                        emoji_sucesso="✅"  # Usar emoji padrão em vez do configurado que pode estar quebrado
-                    )
-                    
-                    # Criar view com botão de rembolso
-                    view = ReebolsarPagamentoView(
-                        payment_id=payment_id,
-                        amount=gross_amount,
-                        vendedor_id=receiver_id,
-                        taxa_fixa=TAXA_REEMBOLSO_FIXA
-                    )
-                    
-                    await channel.send(embed=embed, view=view)
-            except Exception as e:
-                print(f"Erro ao enviar notificação no canal: {e}")
-        
-        # Também enviar DM para o usuário
-        embed = discord.Embed(
-            title="✅ Pagamento Recebido",
-            color=discord.Color.green()
-        )
-        
-        embed.add_field(
-            name="💰 Valor",
-            value=f"R$ {amount:.2f}",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="📌 ID",
-            value=f"`{payment_id}`",
-            inline=True
-        )
-        
-        embed.add_field(
-            name="🔗 Referência",
-            value=f"`{ref}`",
-            inline=False
-        )
-        await user.send(embed=embed)
+        channel = bot_instance.get_channel(payload["channel_id"]) or \
+            await bot_instance.fetch_channel(payload["channel_id"])
+    except (discord.NotFound, discord.Forbidden) as e:
+        print(f"Canal da cobrança {payload['payment_id']} indisponível: {e}")
+        return
     
-    except Exception as e:
-        print(f"Erro ao notificar pagamento: {e}")
+    confirmacao = notification_digest.submit(
+        SCOPE_CHANNEL, channel.id, payload, _resumo_canal,
+        lambda kwargs: outbound_scheduler.send(channel, PRIORITY_NOTIFICATION, **kwargs)
+    )
+    if confirmacao is not None:
+        return confirmacao
+    
+    user = await _usuario(receiver_id)
+    
+    # Importar a View de rembolso
+    from ui_components import ReebolsarPagamentoView
+    
+    # Criar embed com nova notificação
+    embed = criar_embed_notificacao_pagamento(
+        cliente=f"<@{receiver_id}>",  # Usar mention do usuário que recebeu
+        vendedor=user.name,
+        valor=payload["amount"],
+        valor_bruto=payload["gross_amount"],
+        ref=payload["ref"],
+        emoji_sucesso="✅"  # Usar emoji padrão em vez do configurado que pode estar quebrado
+    )
+    
+    # Criar view com botão de rembolso
+    view = ReebolsarPagamentoView(
+        payment_id=payload["payment_id"],
+        amount=payload["gross_amount"],
+        vendedor_id=receiver_id,
+        taxa_fixa=TAXA_REEMBOLSO_FIXA
+    )
+    
+    try:
+        # Baixa prioridade; com o canal saturado, vira uma mensagem só com as outras notificações
+        await outbound_scheduler.send(channel, PRIORITY_NOTIFICATION, coalesce=True, embed=embed, view=view)
+    except discord.Forbidden as e:
+        print(f"Sem permissão para notificar no canal {payload['channel_id']}: {e}")
+
+async def enviar_dm_pagamento(payload: dict):
+    """Envia a DM de pagamento recebido ao vendedor (despachante do outbox, com modo resumo)."""
+    _exigir_bot()
+    
+    receiver_id = payload["receiver_id"]
+    confirmacao = notification_digest.submit(
+        SCOPE_SELLER, receiver_id, payload, _resumo_vendedor,
+        lambda kwargs: outbound_scheduler.send_dm(bot_instance, receiver_id, PRIORITY_NOTIFICATION, **kwargs)
+    )
+    if confirmacao is not None:
+        return confirmacao
+    
+    embed = discord.Embed(
+        title="✅ Pagamento Recebido",
+        color=discord.Color.green()
+    )
+    
+    embed.add_field(
+        name="💰 Valor",
+        value=f"R$ {payload['amount']:.2f}",
+        inline=True
+    )
+    
+    embed.add_field(
+        name="📌 ID",
+        value=f"`{payload['payment_id']}`",
+        inline=True
+    )
+    
+    embed.add_field(
+        name="🔗 Referência",
+        value=f"`{payload['ref']}`",
+        inline=False
+    )
+    try:
+        await outbound_scheduler.send_dm(bot_instance, payload["receiver_id"], PRIORITY_NOTIFICATION, embed=embed)
+    except discord.Forbidden:
+        # DMs fechadas: não há como entregar
+        print(f"DM de pagamento para {payload['receiver_id']} bloqueada")
+
+async def notificar_pagamento(receiver_id: int, amount: float, payment_id: str, ref: str, gross_amount: float,
+                              channel_id: int = None):
+    """Notifica o pagamento no canal (se houver) e por DM ao usuário"""
+    payload = {"receiver_id": receiver_id, "amount": amount, "payment_id": payment_id, "ref": ref,
+               "gross_amount": gross_amount, "channel_id": channel_id}
+    confirmacoes = []
+    if channel_id:
+        confirmacoes.append(await enviar_notificacao_canal(payload))
+    confirmacoes.append(await enviar_dm_pagamento(payload))
+    # Modo resumo: espera os pagamentos aparecerem nas mensagens de resumo
+    for confirmacao in confirmacoes:
+        if confirmacao is not None:
+            await confirmacao
+
+def registrar_notificacoes(consumer):
+    """Registra no despachante do outbox os handlers das notificações de pagamento."""
+    from database import EVENT_PAYMENT_CHANNEL, EVENT_PAYMENT_DM
+    consumer.register(EVENT_PAYMENT_CHANNEL, enviar_notificacao_canal)
+    consumer.register(EVENT_PAYMENT_DM, enviar_dm_pagamento)
 
 @app.route("/health", methods=["GET"])
 def health():
-    """Verifica se o webhook está rodando."""
-    return jsonify({"status": "online", "service": "MisticPay Webhook"}), 200
+    """Verifica se o webhook está rodando (inclui o circuit breaker da MisticPay)."""
+    return jsonify({
+        "status": "online",
+        "service": "MisticPay Webhook",
+        "misticpay": misticpay_breaker.get_stats()
+    }), 200
 
 def run_webhook():
     """Roda o servidor Flask em thread separada"""
-    app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
+    inbox_workers.start(processar_webhook)
+    app.run(host=WEBHOOK_HOST, port=WEBHOOK_PORT, debug=False, use_reloader=False)
 
-if __name__ == "__main__":
-    run_webhook()
+# ════════════════════════════════════════════════════════════════════════════
+# SERVIDOR AIOHTTP (NO EVENT LOOP DO BOT)
+# ════════════════════════════════════════════════════════════════════════════
+
+async def aio_webhook_test(request: web.Request) -> web.Response:
+    """Rota de teste para verificar se o webhook está acessível."""
+    return web.json_response({
+        "status": "online",
+        "message": "Webhook endpoint está funcionando! Use POST para enviar webhooks.",
+        "timestamp": __import__('datetime').datetime.now().isoformat()
+    }, status=200)
 
+async def aio_webhook(request: web.Request) -> web.Response:
+    """Mesmo contrato do POST /webhook do Flask: grava na caixa de entrada e responde na hora."""
+    try:
+        body = await request.text()
+        data = json.loads(body)
+        
+        # Caminho rápido: entrega repetida de um transactionId já processado
+        result = payment_handler.parse_webhook(data)
+        if result and webhook_dedupe.seen(result["event_id"]):
+            return web.json_response({"status": "duplicate", "payment_id": result["payment_id"]}, status=200)
+        
+        # Headers no formato do werkzeug (X-Signature), como o worker espera
+        headers = {key.title(): value for key, value in request.headers.items()}
+        inbox_id = await webhook_inbox.append_async(body, headers)
+        async_inbox_workers.notify()
+        
+        return web.json_response({"status": "queued", "inbox_id": inbox_id}, status=200)
+    
+    except Exception as e:
+        if logger:
+            logger.error(f"Erro no webhook: {e}")
+        print(f"Erro no webhook: {e}")
+        return web.json_response({"status": "error", "message": str(e)}, status=400)
+
+async def aio_health(request: web.Request) -> web.Response:
+    """Verifica se o webhook está rodando (inclui o circuit breaker da MisticPay)."""
+    return web.json_response({
+        "status": "online",
+        "service": "MisticPay Webhook",
+        "misticpay": misticpay_breaker.get_stats()
+    }, status=200)
+
+def make_aiohttp_app() -> web.Application:
+    """Aplicação aiohttp com as rotas /webhook e /health"""
+    aio_app = web.Application()
+    aio_app.router.add_get("/webhook", aio_webhook_test)
+    aio_app.router.add_post("/webhook", aio_webhook)
+    aio_app.router.add_get("/health", aio_health)
+    return aio_app
 
+async def start_aiohttp_webhook(host: str = None, port: int = None, reuse_port: bool = False) -> web.AppRunner:
+    """
+    Sobe o servidor de webhook no event loop atual (o do bot)
+    
+    Args:
+        host: Interface (padrão WEBHOOK_HOST)
+        port: Porta (padrão WEBHOOK_PORT)
+        reuse_port: SO_REUSEPORT, para vários processos na mesma porta (webhook_service.py)
+    
+    Returns:
+        AppRunner (chamar cleanup() para encerrar)
+    """
+    await async_inbox_workers.start(processar_webhook_async)
+    runner = web.AppRunner(make_aiohttp_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host or WEBHOOK_HOST, port or WEBHOOK_PORT, reuse_port=reuse_port or None).start()
+    return runner
+
+if __name__ == "__main__":
+    run_webhook()
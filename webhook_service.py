@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Serviço de webhook MisticPay em processo separado (vários workers)
+
+Cada worker é um processo com o servidor aiohttp do webhook_server, todos na
+mesma porta (SO_REUSEPORT), cada um drenando a caixa de entrada durável com
+seus próprios workers assíncronos (a reserva das entradas é atômica entre
+processos). Cada liquidação grava as notificações no outbox (bot_events) na
+mesma transação do crédito; o bot as entrega no Discord (utils/bot_events.py).
+
+Assim a ingestão escala sozinha e o bot pode reiniciar sem perder webhooks.
+
+No .env do bot:
+    WEBHOOK_SERVER=service   (o bot não sobe servidor; só entrega as notificações)
+
+Uso:
+    python webhook_service.py [--workers 4] [--host 0.0.0.0] [--port 5000]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import database
+
+def _worker(host: str, port: int, index: int):
+    """Processo worker: servidor aiohttp + caixa de entrada (notificações vão para o outbox)"""
+    import webhook_server
+
+    async def serve():
+        await webhook_server.start_aiohttp_webhook(host, port, reuse_port=True)
+        print(f"🌐 Worker {index} (pid {os.getpid()}) em http://{host}:{port}")
+        await asyncio.Event().wait()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(serve())
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+class WebhookService:
+    def __init__(self, host: str, port: int, workers: int = 4):
+        """
+        Inicializa o supervisor dos workers
+
+        Args:
+            host: Interface de escuta
+            port: Porta compartilhada pelos workers
+            workers: Quantidade de processos
+        """
+        if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+            print("⚠️ SO_REUSEPORT indisponível nesta plataforma: usando 1 worker")
+            workers = 1
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self._processes = {}
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        process = multiprocessing.Process(target=_worker, args=(self.host, self.port, index),
+                                          name=f"webhook-worker-{index}")
+        process.start()
+        self._processes[index] = process
+
+    def run(self):
+        """Aplica as migrações, sobe os workers e os reinicia se algum cair"""
+        database.init_db()
+        database.close_connection()  # cada worker abre as próprias conexões
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        print(f"🚀 Serviço de webhook: {self.workers} worker(s) na porta {self.port}")
+        for index in range(self.workers):
+            self._spawn(index)
+
+        while not self._stopping:
+            for index, process in list(self._processes.items()):
+                if not process.is_alive() and not self._stopping:
+                    print(f"⚠️ Worker {index} saiu (código {process.exitcode}); reiniciando")
+                    self._spawn(index)
+            time.sleep(1)
+
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=10)
+        print("👋 Serviço de webhook encerrado")
+
+    def _stop(self, *_):
+        self._stopping = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de webhook MisticPay (multi-processo)")
+    parser.add_argument("--host", default=os.getenv("WEBHOOK_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WEBHOOK_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEBHOOK_SERVICE_WORKERS", "4")))
+    args = parser.parse_args()
+
+    WebhookService(args.host, args.port, args.workers).run()
+
+if __name__ == "__main__":
+    main()